@@ -40,6 +40,11 @@ class Command(BaseCommand):
             action='store_true',
             help='Skip generating evaluation plots',
         )
+        parser.add_argument(
+            '--sync-plots',
+            action='store_true',
+            help='Render evaluation plots in this process instead of a background one',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('=' * 70))
@@ -74,16 +79,24 @@ class Command(BaseCommand):
             suite.train()
             self.stdout.write(self.style.SUCCESS('✅ Model trained successfully'))
             
-            # Generate evaluation plots
+            # Generate evaluation plots (rendered in a background process)
+            report = None
             if not options['skip_plots']:
-                self.stdout.write('\n📈 Generating evaluation plots...')
-                suite.evaluate_and_plot()
-                self.stdout.write(self.style.SUCCESS('✅ Plots generated'))
+                self.stdout.write('\n📈 Generating evaluation plots in background...')
+                report = suite.evaluate_and_plot(background=not options['sync_plots'])
             
             # Save model
             self.stdout.write('\n💾 Saving model...')
             suite.save_model()
             self.stdout.write(self.style.SUCCESS('✅ Model saved'))
+
+            if report is not None:
+                self.stdout.write('\n⏳ Waiting for evaluation plots...')
+                report.join()
+            if report is not None and report.exitcode != 0:
+                self.stdout.write(self.style.WARNING(f'⚠️ Plot rendering failed (exit code {report.exitcode})'))
+            elif not options['skip_plots']:
+                self.stdout.write(self.style.SUCCESS('✅ Plots generated'))
             
             self.stdout.write(self.style.SUCCESS('\n' + '=' * 70))
             self.stdout.write(self.style.SUCCESS('  TRAINING COMPLETE'))
@@ -0,0 +1,97 @@
+"""
+Evaluation reporting for the Water AI Suite.
+
+Plotting libraries are only imported here, inside the render function, so the
+web process (which imports WaterAISuite to load the model) never pays for
+matplotlib/seaborn. Plots are rendered headless (Agg backend) in a separate
+process so training is not blocked by figure rendering.
+"""
+import multiprocessing
+import os
+
+import numpy as np
+
+
+def render_evaluation_plots(figures_dir, feature_names, importances, y_test, preds):
+    """Render feature importance, actual-vs-predicted and residual plots to PNG"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    os.makedirs(figures_dir, exist_ok=True)
+
+    feature_names = np.asarray(feature_names)
+    importances = np.asarray(importances)
+    y_test = np.asarray(y_test)
+    preds = np.asarray(preds)
+
+    # Feature Importance
+    plt.figure(figsize=(10, 6))
+    indices = np.argsort(importances)[::-1]
+
+    sns.barplot(x=importances[indices], y=feature_names[indices], palette="viridis")
+    plt.title("What Drives Soil Moisture? (Feature Importance)")
+    plt.xlabel("Relative Importance")
+    plt.tight_layout()
+    plt.savefig(os.path.join(figures_dir, "feature_importance.png"))
+    print(f"       Saved: {os.path.join(figures_dir, 'feature_importance.png')}")
+
+    # Actual vs Predicted
+    plt.figure(figsize=(8, 8))
+    sns.scatterplot(x=y_test, y=preds, alpha=0.3, color="blue", edgecolor=None)
+    plt.plot(
+        [y_test.min(), y_test.max()],
+        [y_test.min(), y_test.max()],
+        "r--",
+        lw=2,
+    )
+    plt.xlabel("Actual Tomorrow Humidity (%)")
+    plt.ylabel("AI Predicted Humidity (%)")
+    plt.title("Accuracy Check: Prediction vs Reality")
+    plt.tight_layout()
+    plt.savefig(os.path.join(figures_dir, "actual_vs_pred.png"))
+    print(f"       Saved: {os.path.join(figures_dir, 'actual_vs_pred.png')}")
+
+    # Residuals
+    plt.figure(figsize=(10, 6))
+    residuals = y_test - preds
+    sns.histplot(residuals, bins=50, kde=True, color="purple")
+    plt.axvline(x=0, color="k", linestyle="--")
+    plt.title("Error Distribution (Residuals)")
+    plt.xlabel("Error (Actual - Predicted)")
+    plt.tight_layout()
+    plt.savefig(os.path.join(figures_dir, "residuals.png"))
+    print(f"       Saved: {os.path.join(figures_dir, 'residuals.png')}")
+
+    plt.close('all')  # Clean up
+
+
+def start_evaluation_report(figures_dir, feature_names, importances, y_test, preds, background=True):
+    """
+    Render evaluation plots, by default in a spawned background process.
+
+    Only plain NumPy arrays and strings are sent to the child, so it never
+    has to unpickle the model or set up Django.
+
+    Returns:
+        multiprocessing.Process or None: the running process (join() it to
+        wait for the figures), or None when rendered synchronously.
+    """
+    args = (
+        str(figures_dir),
+        [str(name) for name in feature_names],
+        np.asarray(importances, dtype=float),
+        np.asarray(y_test, dtype=float),
+        np.asarray(preds, dtype=float),
+    )
+
+    if not background:
+        render_evaluation_plots(*args)
+        return None
+
+    # "spawn" keeps the child clean of the parent's threads and loaded models
+    ctx = multiprocessing.get_context("spawn")
+    process = ctx.Process(target=render_evaluation_plots, args=args, name="water-ai-report")
+    process.start()
+    return process
@@ -4,8 +4,6 @@ Adapted from task_1_model_dataset.py for Django integration
 """
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
@@ -284,8 +282,12 @@ class WaterAISuite:
 
         return future
 
-    def evaluate_and_plot(self):
-        """Generate evaluation metrics and plots"""
+    def evaluate_and_plot(self, background=True):
+        """
+        Print evaluation metrics and render evaluation plots.
+
+        Returns the background plotting process (or None when background=False).
+        """
         print(" [4/5] Generating Analytics & Plots...")
 
         if self.preds is None:
@@ -299,53 +301,19 @@ class WaterAISuite:
         print(f"   RMSE (Root Mean Sq Error):  ±{rmse:.2f} %")
         print(f"   R^2   (Variance Explained):  {r2*100:.1f} %")
 
-        # Create figures directory
+        # Plotting lives in a separate module so matplotlib/seaborn are never
+        # imported by the web process; figures are rendered in the background
+        from .reporting import start_evaluation_report
+
         figures_dir = Path(settings.BASE_DIR) / 'agronomy' / 'figures'
-        figures_dir.mkdir(parents=True, exist_ok=True)
-
-        # Feature Importance
-        plt.figure(figsize=(10, 6))
-        importances = self.model.feature_importances_
-        feat_names = self.X_train.columns
-        indices = np.argsort(importances)[::-1]
-
-        sns.barplot(x=importances[indices], y=feat_names[indices], palette="viridis")
-        plt.title("What Drives Soil Moisture? (Feature Importance)")
-        plt.xlabel("Relative Importance")
-        plt.tight_layout()
-        plt.savefig(figures_dir / "feature_importance.png")
-        print(f"       Saved: {figures_dir / 'feature_importance.png'}")
-
-        # Actual vs Predicted
-        plt.figure(figsize=(8, 8))
-        sns.scatterplot(
-            x=self.y_test, y=self.preds, alpha=0.3, color="blue", edgecolor=None
-        )
-        plt.plot(
-            [self.y_test.min(), self.y_test.max()],
-            [self.y_test.min(), self.y_test.max()],
-            "r--",
-            lw=2,
+        return start_evaluation_report(
+            figures_dir,
+            self.X_train.columns,
+            self.model.feature_importances_,
+            self.y_test,
+            self.preds,
+            background=background,
         )
-        plt.xlabel("Actual Tomorrow Humidity (%)")
-        plt.ylabel("AI Predicted Humidity (%)")
-        plt.title("Accuracy Check: Prediction vs Reality")
-        plt.tight_layout()
-        plt.savefig(figures_dir / "actual_vs_pred.png")
-        print(f"       Saved: {figures_dir / 'actual_vs_pred.png'}")
-
-        # Residuals
-        plt.figure(figsize=(10, 6))
-        residuals = self.y_test - self.preds
-        sns.histplot(residuals, bins=50, kde=True, color="purple")
-        plt.axvline(x=0, color="k", linestyle="--")
-        plt.title("Error Distribution (Residuals)")
-        plt.xlabel("Error (Actual - Predicted)")
-        plt.tight_layout()
-        plt.savefig(figures_dir / "residuals.png")
-        print(f"       Saved: {figures_dir / 'residuals.png'}")
-
-        plt.close('all')  # Clean up
 
     def save_model(self, filepath=None):
         """Save trained model to disk"""
@@ -1,9 +1,7 @@
-import joblib
-import pandas as pd
-import numpy as np
-from pathlib import Path
-from datetime import datetime, timedelta
+import os
+from datetime import date, timedelta
 from django.conf import settings
+from factory.ml_service import LazyModel
 
 def analyze_water_needs(moisture, temp):
     """
@@ -32,18 +30,14 @@ def analyze_water_needs(moisture, temp):
 
     return False, "Анализ завершен"
 
-import os
-import joblib
-import pandas as pd
-from datetime import date, timedelta
-from django.conf import settings
-from .models import SensorReading, IrrigationPrediction, Field
-from .ml_models.water_prediction_suite import WaterAISuite
-
 class WaterManagementService:
     """Enhanced service for water management predictions using WaterAISuite"""
     
     def __init__(self):
+        # Imported here so django.setup() (which loads signals -> services)
+        # does not pay for pandas/scikit-learn
+        from .ml_models.water_prediction_suite import WaterAISuite
+
         model_path = os.path.join(settings.BASE_DIR, 'agronomy', 'ml_models', 'Irrigation_Model.pkl')
         try:
             self.suite = WaterAISuite()
@@ -72,6 +66,8 @@ class WaterManagementService:
     
     def predict_humidity(self, sensor_data: dict) -> dict:
         """Predict tomorrow's humidity for given sensor data"""
+        import pandas as pd
+
         if not self.model:
             raise ValueError("Model not loaded. Please train the model first.")
         
@@ -117,6 +113,8 @@ class WaterManagementService:
     
     def simulate_future(self, base_data: dict, days_ahead: int = 7) -> list:
         """Simulate future predictions for multiple days"""
+        import pandas as pd
+
         if not self.model:
             raise ValueError("Model not loaded")
         
@@ -204,3 +202,19 @@ class WaterManagementService:
             predictions.append(prediction)
         
         return predictions
+
+
+# Shared instance: the Random Forest is loaded once per worker instead of per request
+water_service = LazyModel(WaterManagementService, 'irrigation')
+
+
+def get_water_service():
+    """
+    Return the shared WaterManagementService.
+
+    If the model file was missing when it was first loaded (model not trained
+    yet), try loading it again so a freshly trained model is picked up.
+    """
+    if water_service.is_loaded and water_service.model is None:
+        water_service.reload()
+    return water_service
@@ -5,7 +5,7 @@ from rest_framework.response import Response
 from .models import Field, SensorLog, SeedVariety, SensorReading, IrrigationPrediction
 from .serializers import FieldSerializer, SensorLogSerializer, SeedVarietySerializer, IrrigationPredictionSerializer
 from users.permissions import IsFarmer  # Импортируем, если нужно проверять роль
-from .services import WaterManagementService
+from .services import get_water_service
 from datetime import datetime, timedelta, date
 from django.db import models
 import logging
@@ -16,7 +16,7 @@ logger = logging.getLogger(__name__)
 @permission_classes([AllowAny])
 def predict_irrigation(request):
     """Predict irrigation needs for a specific location"""
-    service = WaterManagementService()
+    service = get_water_service()
     
     try:
         result = service.predict_humidity(request.data)
@@ -28,7 +28,7 @@ def predict_irrigation(request):
 @permission_classes([AllowAny])
 def simulate_future_irrigation(request):
     """Simulate future irrigation needs"""
-    service = WaterManagementService()
+    service = get_water_service()
     days_ahead = request.data.get('days_ahead', 7)
     
     try:
@@ -41,7 +41,7 @@ def simulate_future_irrigation(request):
 @permission_classes([AllowAny])
 def field_irrigation_map(request, field_id):
     """Get irrigation predictions map for a field"""
-    service = WaterManagementService()
+    service = get_water_service()
     prediction_date = request.GET.get('date', date.today().isoformat())
     
     try:
@@ -170,7 +170,7 @@ def bulk_generate_predictions(request):
     if not field_id:
         return Response({'error': 'field_id is required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    service = WaterManagementService()
+    service = get_water_service()
     
     try:
         from datetime import date
@@ -1,12 +1,16 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import json
-import requests
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import plotly.graph_objects as go
 import openmeteo_requests
 import requests_cache
 from retry_requests import retry
 
+from geo_cache import GeoCache
+
 # --- КОНФИГУРАЦИЯ ---
 st.set_page_config(page_title="Seed & Yield AI", page_icon="🌱", layout="wide")
 
@@ -24,6 +28,14 @@ cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
 retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
 openmeteo = openmeteo_requests.Client(session=retry_session)
 
+WEATHER_START, WEATHER_END = "2020-04-01", "2023-10-30"
+
+
+@st.cache_resource
+def get_geo_cache():
+    """Общий для процессов кэш погоды и pH на диске (см. geo_cache.py)"""
+    return GeoCache(period=f"{WEATHER_START}..{WEATHER_END}")
+
 # --- 3. ПОЛУЧЕНИЕ ДАННЫХ ---
 
 # А) SOILGRIDS (pH Почвы)
@@ -32,7 +44,7 @@ def get_real_soil_ph(lat, lon):
         url = f"https://rest.isric.org/soilgrids/v2.0/properties/query?lon={lon}&lat={lat}&property=phh2o&depth=0-5cm"
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0.4472.124 Safari/537.36'}
         # Короткий таймаут, чтобы сайт не вис, если API лежит
-        response = requests.get(url, headers=headers, timeout=2)
+        response = cache_session.get(url, headers=headers, timeout=2)
         
         if response.status_code == 200:
             data = response.json()
@@ -43,15 +55,24 @@ def get_real_soil_ph(lat, lon):
         pass
     return None
 
+def get_soil_ph(lat, lon, cache=None):
+    """pH из кэша на диске по ячейке сетки, при промахе - SoilGrids"""
+    return (cache or get_geo_cache()).soil_ph(lat, lon, get_real_soil_ph)
+
+
 # Б) OPEN-METEO (Погода + Спутник)
-@st.cache_data
-def get_satellite_data(lat, lon):
+def get_satellite_data(lat, lon, cache=None):
+    """Погода из кэша на диске по ячейке сетки, при промахе - Open-Meteo"""
+    return (cache or get_geo_cache()).weather(lat, lon, fetch_satellite_data)
+
+
+def fetch_satellite_data(lat, lon):
     url = "https://archive-api.open-meteo.com/v1/archive"
     params = {
         "latitude": lat,
         "longitude": lon,
-        "start_date": "2020-04-01",
-        "end_date": "2023-10-30",
+        "start_date": WEATHER_START,
+        "end_date": WEATHER_END,
         "daily": ["temperature_2m_max", "temperature_2m_min", "precipitation_sum",
                   "soil_temperature_0_to_7cm_mean", "soil_moisture_0_to_7cm_mean"]
     }
@@ -76,9 +97,59 @@ def get_satellite_data(lat, lon):
     except Exception:
         return pd.DataFrame()
 
-def analyze_soil_condition(df, lat, lon):
-    # 1. Пробуем взять реальный pH из API
-    real_ph = get_real_soil_ph(lat, lon)
+# В) ЛОКАЛЬНОЕ ХРАНИЛИЩЕ (офлайн прогоны и повторные расчеты без сети)
+FIXTURES_DIR = os.getenv('SEED_APP_FIXTURES', 'data/fixtures')
+
+
+def _fixture_path(lat, lon, kind):
+    return os.path.join(FIXTURES_DIR, f"{lat:.4f}_{lon:.4f}.{kind}")
+
+
+def load_fixture(lat, lon):
+    """(погода, pH) из хранилища; None, если локации там нет"""
+    weather_path = _fixture_path(lat, lon, 'weather.csv')
+    if not os.path.exists(weather_path):
+        return None
+    df = pd.read_csv(weather_path, parse_dates=['date'])
+    ph = None
+    soil_path = _fixture_path(lat, lon, 'soil.json')
+    if os.path.exists(soil_path):
+        with open(soil_path, 'r', encoding='utf-8') as f:
+            ph = json.load(f).get('ph')
+    return df, ph
+
+
+def save_fixture(lat, lon, df, ph):
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    df.to_csv(_fixture_path(lat, lon, 'weather.csv'), index=False)
+    with open(_fixture_path(lat, lon, 'soil.json'), 'w', encoding='utf-8') as f:
+        json.dump({'lat': lat, 'lon': lon, 'ph': ph}, f)
+
+
+def load_plot_data(lat, lon, offline=False, record=False, cache=None):
+    """
+    Погода и pH одной локации: из хранилища (offline) или из API
+    (через кэш на диске), record=True сохраняет ответ в хранилище
+    """
+    if offline:
+        fixture = load_fixture(lat, lon)
+        if fixture is None:
+            raise FileNotFoundError(f"нет данных для {lat:.4f}, {lon:.4f} в {FIXTURES_DIR}")
+        return fixture
+
+    df = get_satellite_data(lat, lon, cache)
+    if df.empty:
+        raise RuntimeError("Open-Meteo не ответил")
+    ph = get_soil_ph(lat, lon, cache)
+    if record:
+        save_fixture(lat, lon, df, ph)
+    return df, ph
+
+
+def analyze_soil_condition(df, lat, lon, real_ph=None, fetch_ph=True):
+    # 1. Пробуем взять реальный pH из API (в пакетном режиме он уже получен)
+    if real_ph is None and fetch_ph:
+        real_ph = get_soil_ph(lat, lon)
     
     # 2. Фолбэк (Заглушка), если API не отвечает
     is_estimated = False
@@ -120,61 +191,243 @@ def analyze_soil_condition(df, lat, lon):
     return soil_status
 
 # --- 4. МАТЕМАТИКА ---
-def calculate_yield_score(variety, weather_df, soil_status):
-    current_yield = variety['max_yield']
-    years = weather_df['date'].dt.year.unique()
-    yearly_yields = []
-    
-    for year in years:
-        year_df = weather_df[weather_df['date'].dt.year == year]
-        
-        # 1. ТЕПЛО (GDD)
-        year_df['mean_temp'] = (year_df['t_max'] + year_df['t_min']) / 2
-        year_df['gdd'] = year_df['mean_temp'] - 12.0
-        gdd_sum = year_df[year_df['gdd'] > 0]['gdd'].sum()
-        
-        if gdd_sum < 800: 
-            yearly_yields.append(0)
-            continue
-            
-        gdd_deficit = variety['gdd_needed'] - gdd_sum
-        year_penalty = 0
-        if gdd_deficit > 0:
-            year_penalty += current_yield * (gdd_deficit / variety['gdd_needed'] * 2.0)
-            
-        # 2. ДОЖДИ (Лето+, Осень-)
-        summer_rain = year_df[year_df['date'].dt.month.isin([5, 6, 7, 8])]['rain'].sum()
-        if 300 <= summer_rain <= 700:
-            year_penalty -= current_yield * 0.10 
-        elif summer_rain < 100:
-            year_penalty += current_yield * 0.15 
-
-        harvest_rain = year_df[year_df['date'].dt.month.isin([9, 10])]['rain'].sum()
-        if harvest_rain > 80:
-            year_penalty += current_yield * 0.20 
-        
-        # 3. ЖАРА
-        hot_days = len(year_df[year_df['t_max'] > 40])
-        heat_k = 0.2 if variety['heat_tolerance']=='high' else 0.5
-        year_penalty += (hot_days * heat_k)
-        
-        yearly_yields.append(max(0, current_yield - year_penalty))
+SUMMER_MONTHS = [5, 6, 7, 8]
+HARVEST_MONTHS = [9, 10]
+GDD_BASE_TEMP = 12.0
+MIN_SEASON_GDD = 800      # холоднее - хлопок не вызревает, урожай 0
+HOT_DAY_T_MAX = 40.0
+HEAT_PENALTY = {'high': 0.2}          # ц/га за жаркий день, остальные сорта 0.5
+SALINITY_PENALTY = {'low': 0.40, 'medium': 0.15}  # доля урожая на солончаке
 
-    if not yearly_yields: return 0.0
 
-    avg_yield = sum(yearly_yields) / len(yearly_yields)
-    
+def yearly_weather_features(weather_df):
+    """
+    Погодные признаки по годам одним groupby (одинаковы для всех сортов):
+    сумма GDD, дожди лета и сбора урожая, число жарких дней
+    """
+    if weather_df.empty:
+        return pd.DataFrame(columns=['gdd_sum', 'summer_rain', 'harvest_rain', 'hot_days'])
+
+    month = weather_df['date'].dt.month
+    gdd = (weather_df['t_max'] + weather_df['t_min']) / 2 - GDD_BASE_TEMP
+    daily = pd.DataFrame({
+        'gdd_sum': gdd.where(gdd > 0, 0.0),
+        'summer_rain': weather_df['rain'].where(month.isin(SUMMER_MONTHS), 0.0),
+        'harvest_rain': weather_df['rain'].where(month.isin(HARVEST_MONTHS), 0.0),
+        'hot_days': (weather_df['t_max'] > HOT_DAY_T_MAX).astype(int),
+    })
+    return daily.groupby(weather_df['date'].dt.year, sort=False).sum()
+
+
+def variety_arrays(varieties):
+    """Параметры сортов как векторы NumPy (V,)"""
+    return {
+        'max_yield': np.array([v['max_yield'] for v in varieties], dtype=float),
+        'gdd_needed': np.array([v['gdd_needed'] for v in varieties], dtype=float),
+        'heat_k': np.array([HEAT_PENALTY.get(v['heat_tolerance'], 0.5) for v in varieties]),
+        'salinity_k': np.array([SALINITY_PENALTY.get(v['salinity_tolerance'], 0.0) for v in varieties]),
+    }
+
+
+def score_varieties(varieties, features, soil_status):
+    """
+    Прогноз урожайности всех сортов сразу: штрафы считаются как матрица
+    годы x сорта (broadcast признаков года по векторам сортов).
+
+    Args:
+        varieties: список сортов или результат variety_arrays
+        features: результат yearly_weather_features
+        soil_status: результат analyze_soil_condition
+
+    Returns:
+        np.ndarray: прогноз (ц/га) на каждый сорт, в порядке varieties
+    """
+    v = varieties if isinstance(varieties, dict) else variety_arrays(varieties)
+    max_yield = v['max_yield']
+    if features.empty:
+        return np.zeros_like(max_yield)
+
+    # (Y, 1) против (V,) -> (Y, V)
+    gdd_sum = features['gdd_sum'].to_numpy(dtype=float)[:, None]
+    summer_rain = features['summer_rain'].to_numpy(dtype=float)[:, None]
+    harvest_rain = features['harvest_rain'].to_numpy(dtype=float)[:, None]
+    hot_days = features['hot_days'].to_numpy(dtype=float)[:, None]
+
+    # 1. ТЕПЛО (GDD)
+    gdd_deficit = np.maximum(v['gdd_needed'] - gdd_sum, 0.0)
+    penalty = max_yield * (gdd_deficit / v['gdd_needed'] * 2.0)
+
+    # 2. ДОЖДИ (Лето+, Осень-): доля от потенциала сорта
+    summer_k = np.where((summer_rain >= 300) & (summer_rain <= 700), -0.10,
+                        np.where(summer_rain < 100, 0.15, 0.0))
+    penalty = penalty + max_yield * summer_k
+    penalty = penalty + max_yield * np.where(harvest_rain > 80, 0.20, 0.0)
+
+    # 3. ЖАРА
+    penalty = penalty + hot_days * v['heat_k']
+
+    yearly = np.where(gdd_sum < MIN_SEASON_GDD, 0.0, np.maximum(max_yield - penalty, 0.0))
+    avg_yield = yearly.mean(axis=0)
+
     # 4. ПОЧВА (Штраф за pH)
-    soil_penalty = 0
     if soil_status['is_salty']:
-        if variety['salinity_tolerance'] == 'low':
-            soil_penalty = avg_yield * 0.40
-        elif variety['salinity_tolerance'] == 'medium':
-            soil_penalty = avg_yield * 0.15
-            
-    return round(max(0, avg_yield - soil_penalty), 1)
+        avg_yield = avg_yield - avg_yield * v['salinity_k']
+
+    # Штрафы кратны 0.1-0.5 ц/га, поэтому средние часто ровно x.x5: округляем
+    # встроенным round, как раньше (np.round решает такие половинки иначе)
+    return np.array([round(float(y), 1) for y in np.maximum(avg_yield, 0.0)])
+
+
+def calculate_yield_score(variety, weather_df, soil_status):
+    """Прогноз для одного сорта (для массового расчета - score_varieties)"""
+    return float(score_varieties([variety], yearly_weather_features(weather_df), soil_status)[0])
+
+# --- 5. ПАКЕТНЫЙ СКРИНИНГ УЧАСТКОВ ---
+BATCH_WORKERS = int(os.getenv('SEED_APP_WORKERS', '8'))
+
+
+def read_plots_csv(file):
+    """CSV участков: lat, lon и необязательное name (регистр колонок не важен)"""
+    plots = pd.read_csv(file)
+    plots.columns = plots.columns.str.strip().str.lower()
+    plots = plots.rename(columns={'latitude': 'lat', 'longitude': 'lon', 'lng': 'lon', 'plot': 'name'})
+    missing = {'lat', 'lon'} - set(plots.columns)
+    if missing:
+        raise ValueError(f"В CSV нет колонок: {', '.join(sorted(missing))}")
+
+    plots['lat'] = pd.to_numeric(plots['lat'], errors='coerce')
+    plots['lon'] = pd.to_numeric(plots['lon'], errors='coerce')
+    plots = plots.dropna(subset=['lat', 'lon']).reset_index(drop=True)
+    if 'name' not in plots.columns:
+        plots['name'] = [f"Участок {i + 1}" for i in range(len(plots))]
+    plots['name'] = plots['name'].astype(str)
+    return plots[['name', 'lat', 'lon']]
+
+
+def screen_plots(plots, varieties, offline=False, record=False, workers=BATCH_WORKERS, on_progress=None):
+    """
+    Прогноз для всех участков x сортов.
+
+    Погода и pH грузятся параллельно в пуле потоков (кэш на диске общий,
+    так что повторные ячейки сетки не идут в сеть); признаки по годам и оценка
+    всех сортов считаются векторно на каждый участок.
+
+    Returns:
+        (ranking, scores): рейтинг участков по лучшему сорту и полная
+        таблица участок x сорт
+    """
+    v = variety_arrays(varieties)
+    names = [var['name'] for var in varieties]
+    # st.cache_resource берем в основном потоке скрипта, не в пуле
+    cache = None if offline else get_geo_cache()
+    rows = [None] * len(plots)
+    score_rows = []
+
+    def job(i):
+        plot = plots.iloc[i]
+        df, ph = load_plot_data(float(plot['lat']), float(plot['lon']), offline=offline, record=record, cache=cache)
+        return df, analyze_soil_condition(df, plot['lat'], plot['lon'], real_ph=ph, fetch_ph=False)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(job, i): i for i in range(len(plots))}
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            plot = plots.iloc[i]
+            row = {'name': plot['name'], 'lat': plot['lat'], 'lon': plot['lon']}
+            try:
+                df, soil_status = future.result()
+            except Exception as e:
+                rows[i] = {**row, 'error': str(e)}
+            else:
+                scores = score_varieties(v, yearly_weather_features(df), soil_status)
+                order = np.argsort(-scores, kind='stable')
+                rows[i] = {
+                    **row,
+                    'best_variety': names[order[0]] if len(order) else None,
+                    'predicted': float(scores[order[0]]) if len(order) else None,
+                    'top3': ", ".join(names[j] for j in order[:3]),
+                    'ph': soil_status['ph_val'],
+                    'ph_estimated': soil_status['is_estimated'],
+                    'summer_rain': round(float(soil_status['summer_rain']), 1),
+                    'harvest_rain': round(float(soil_status['harvest_rain']), 1),
+                    'error': None,
+                }
+                score_rows.append(pd.DataFrame({
+                    'name': plot['name'], 'lat': plot['lat'], 'lon': plot['lon'],
+                    'variety': names, 'predicted': scores,
+                }))
+            if on_progress:
+                on_progress(done, len(plots))
+
+    ranking = pd.DataFrame(rows)
+    if 'predicted' in ranking.columns:
+        ranking = ranking.sort_values('predicted', ascending=False, na_position='last', kind='stable')
+    ranking = ranking.reset_index(drop=True)
+    ranking.insert(0, 'rank', range(1, len(ranking) + 1))
+
+    scores = pd.concat(score_rows, ignore_index=True) if score_rows else pd.DataFrame(
+        columns=['name', 'lat', 'lon', 'variety', 'predicted'])
+    scores = scores.sort_values(['predicted'], ascending=False, kind='stable').reset_index(drop=True)
+    return ranking, scores
+
+
+def render_batch_mode():
+    st.header("🗺️ Скрининг участков")
+    st.caption("CSV с колонками lat, lon и (необязательно) name - по строке на участок")
+    uploaded = st.file_uploader("Файл участков (CSV)", type=['csv'])
+    offline = st.sidebar.checkbox("Офлайн (только локальное хранилище)", value=False,
+                                  help=f"Данные из {FIXTURES_DIR} без обращения к API")
+    record = st.sidebar.checkbox("Сохранять ответы API в хранилище", value=False, disabled=offline)
+
+    if uploaded is None or not st.button("🚀 Рассчитать для всех участков", type="primary"):
+        return
+
+    try:
+        plots = read_plots_csv(uploaded)
+    except Exception as e:
+        st.error(f"Не могу прочитать CSV: {e}")
+        return
+    varieties = load_varieties()
+    if plots.empty or not varieties:
+        st.error("Нет участков или базы сортов.")
+        return
+
+    progress = st.progress(0.0, text="Загрузка погоды и почвы...")
+    ranking, scores = screen_plots(
+        plots, varieties, offline=offline, record=record,
+        on_progress=lambda done, total: progress.progress(done / total, text=f"Участков: {done}/{total}"),
+    )
+    progress.empty()
+
+    failed = ranking['error'].notna().sum()
+    if failed:
+        st.warning(f"Без данных: {failed} из {len(ranking)} участков")
+
+    st.subheader("🏆 Рейтинг участков")
+    st.dataframe(ranking, use_container_width=True, hide_index=True)
+    ok = ranking.dropna(subset=['predicted']) if 'predicted' in ranking.columns else ranking.iloc[:0]
+    if not ok.empty:
+        st.map(ok[['lat', 'lon']], zoom=4)
+
+    c1, c2 = st.columns(2)
+    c1.download_button("⬇️ Рейтинг (CSV)", ranking.to_csv(index=False).encode('utf-8'),
+                       file_name="plots_ranking.csv", mime="text/csv")
+    c2.download_button("⬇️ Все участки x сорта (CSV)", scores.to_csv(index=False).encode('utf-8'),
+                       file_name="plots_varieties.csv", mime="text/csv")
+
+
+# --- 6. ИНТЕРФЕЙС ---
+mode = st.sidebar.radio("Режим", ["Одно поле", "Пакет участков (CSV)"])
+cache_stats = get_geo_cache().stats()
+st.sidebar.caption(" | ".join(
+    f"Кэш {label}: {cache_stats[kind]['entries']} ячеек, попаданий "
+    + (f"{cache_stats[kind]['hit_rate']:.0%}" if cache_stats[kind]['hit_rate'] is not None else "—")
+    for kind, label in (('weather', 'погоды'), ('soil', 'pH'))
+))
+if mode == "Пакет участков (CSV)":
+    render_batch_mode()
+    st.stop()
 
-# --- 5. ИНТЕРФЕЙС ---
 st.sidebar.header("📍 Локация поля")
 LOCATIONS = {
     "🇰🇿 Юг (Махтаарал)": (40.8500, 68.6500),
@@ -230,10 +483,8 @@ if st.button("🚀 Рассчитать прогноз", type="primary"):
         st.markdown("---")
         
         varieties = load_varieties()
-        results = []
-        for v in varieties:
-            yld = calculate_yield_score(v, df, soil_status)
-            results.append({**v, "predicted": yld})
+        scores = score_varieties(varieties, yearly_weather_features(df), soil_status)
+        results = [{**v, "predicted": float(yld)} for v, yld in zip(varieties, scores)]
             
         results.sort(key=lambda x: x['predicted'], reverse=True)
         top = results[:3]
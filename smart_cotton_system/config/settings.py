@@ -179,3 +179,59 @@ REST_FRAMEWORK = {
 }
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+# Startup budget (seconds) for django.setup(); enforced by factory.tests.
+# ML models and heavy libraries (TensorFlow, yfinance, cv2) must load lazily.
+STARTUP_TIME_BUDGET = float(os.getenv('STARTUP_TIME_BUDGET', '2.0'))
+
+# Load and warm up ML models in a background thread when a web worker boots
+# (see factory/warmup.py and /health/ready/)
+ML_WARMUP_ON_BOOT = os.getenv('ML_WARMUP_ON_BOOT', 'True') == 'True'
+
+# Micro-batching of concurrent cotton image classifications (factory/batching.py)
+VISION_BATCH_MAX_SIZE = int(os.getenv('VISION_BATCH_MAX_SIZE', '32'))
+VISION_BATCH_WAIT_MS = float(os.getenv('VISION_BATCH_WAIT_MS', '5'))
+
+# Background CV analysis of batch photos (factory/cv_jobs.py): worker threads,
+# photos per model call, and whether web workers run the pool themselves
+# (turn off when a separate `manage.py cv_worker` process is deployed)
+CV_WORKERS = int(os.getenv('CV_WORKERS', '2'))
+CV_WORKER_BATCH_SIZE = int(os.getenv('CV_WORKER_BATCH_SIZE', '16'))
+CV_WORKERS_IN_PROCESS = os.getenv('CV_WORKERS_IN_PROCESS', 'True') == 'True'
+# Seconds before a RUNNING job is considered abandoned, and how often it is retried
+CV_JOB_TIMEOUT = int(os.getenv('CV_JOB_TIMEOUT', '300'))
+CV_JOB_MAX_ATTEMPTS = int(os.getenv('CV_JOB_MAX_ATTEMPTS', '3'))
+
+# GeoIP for the agronomy map (factory/services.py): LRU + TTL cache per /24
+# subnet, optional offline CSV of IP ranges (network,lat,lon,region) checked
+# before ip-api.com, and the agronomy forecast cache per map grid cell
+GEOIP_CACHE_SIZE = int(os.getenv('GEOIP_CACHE_SIZE', '10000'))
+GEOIP_CACHE_TTL = int(os.getenv('GEOIP_CACHE_TTL', str(24 * 3600)))
+GEOIP_FAILURE_TTL = int(os.getenv('GEOIP_FAILURE_TTL', '300'))
+GEOIP_LOOKUP_TIMEOUT = float(os.getenv('GEOIP_LOOKUP_TIMEOUT', '3'))
+GEOIP_RANGES_FILE = os.getenv('GEOIP_RANGES_FILE', str(BASE_DIR / 'data' / 'geoip_ranges.csv'))
+AGRONOMY_FORECAST_TTL = int(os.getenv('AGRONOMY_FORECAST_TTL', '3600'))
+
+# Route optimization backend: "ors" (OpenRouteService API) or "local"
+# (logistics/vrp.py, no network); requests may override it with "solver"
+ROUTE_SOLVER = os.getenv('ROUTE_SOLVER', 'ors')
+ROUTE_SOLVER_TIME_LIMIT = float(os.getenv('ROUTE_SOLVER_TIME_LIMIT', '5'))
+# Travel matrices (logistics/matrix.py) for the local solver and the
+# feasibility check: "haversine" estimates or the "ors" road network matrix
+ROUTE_MATRIX_PROVIDER = os.getenv('ROUTE_MATRIX_PROVIDER', 'haversine')
+
+# optimize_routes results (logistics/result_cache.py): identical requests are
+# answered from memory / the OptimizationJob table for ROUTE_RESULT_CACHE_TTL
+# seconds; a worker waits up to ROUTE_RESULT_WAIT seconds for an identical
+# request running in another worker
+ROUTE_RESULT_CACHE_SIZE = int(os.getenv('ROUTE_RESULT_CACHE_SIZE', '256'))
+ROUTE_RESULT_CACHE_TTL = int(os.getenv('ROUTE_RESULT_CACHE_TTL', '3600'))
+ROUTE_RESULT_WAIT = int(os.getenv('ROUTE_RESULT_WAIT', '60'))
+
+# Asynchronous optimize requests (logistics/jobs.py): solved on a thread pool
+# of ROUTE_JOB_WORKERS threads per web process; "async": true per request or
+# ROUTE_OPTIMIZE_ASYNC for all. Jobs unfinished after ROUTE_JOB_TIMEOUT
+# seconds are reported as failed
+ROUTE_OPTIMIZE_ASYNC = os.getenv('ROUTE_OPTIMIZE_ASYNC', 'False') == 'True'
+ROUTE_JOB_WORKERS = int(os.getenv('ROUTE_JOB_WORKERS', '2'))
+ROUTE_JOB_TIMEOUT = int(os.getenv('ROUTE_JOB_TIMEOUT', '900'))
@@ -7,7 +7,7 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
 # --- ВАЖНО: Импортируем наши новые views для Дашборда ---
-from factory.views import dashboard_view, api_agronomy_predict
+from factory.views import dashboard_view, api_agronomy_predict, health_ready
 
 schema_view = get_schema_view(
     openapi.Info(title="Smart Cotton API", default_version='v1'),
@@ -38,4 +38,7 @@ urlpatterns = [
                   path('api/agronomy_predict/', api_agronomy_predict, name='api_agro'),
                   # API для JS (получение погоды/семян)
 
+                  # Readiness probe (прогрев ML моделей)
+                  path('health/ready/', health_ready, name='health-ready'),
+
               ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Load ML models in the background so the first requests don't pay for it
+from factory.warmup import start_warmup  # noqa: E402
+from factory.cv_jobs import start_cv_workers  # noqa: E402
+
+start_warmup()
+# Background CV analysis of uploaded batch photos
+start_cv_workers()
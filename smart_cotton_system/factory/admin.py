@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.utils.html import mark_safe
-from .models import CottonBatch, Machine, MaintenanceLog
+from .models import (
+    CottonBatch, CVAnalysisJob, Machine, MachineHealthState, MachineTelemetry, MaintenanceLog,
+)
 
 
 @admin.register(CottonBatch)
@@ -63,6 +65,24 @@ class MachineAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 
+@admin.register(MachineTelemetry)
+class MachineTelemetryAdmin(admin.ModelAdmin):
+    list_display = ('machine', 'timestamp', 'temperature', 'vibration', 'humidity', 'motor_load')
+    list_filter = ('machine',)
+    date_hierarchy = 'timestamp'
+    # Без COUNT(*) по всей таблице телеметрии на каждой странице
+    show_full_result_count = False
+
+
+@admin.register(MachineHealthState)
+class MachineHealthStateAdmin(admin.ModelAdmin):
+    list_display = ('machine', 'alarm', 'probability_failure', 'failure_risk', 'samples', 'last_timestamp', 'scored_at')
+    list_filter = ('alarm',)
+    # Состояние ведут только детектор и модель
+    readonly_fields = ('state', 'samples', 'last_timestamp', 'alarm', 'probability_failure',
+                       'failure_risk', 'scored_at', 'updated_at')
+
+
 @admin.register(MaintenanceLog)
 class MaintenanceLogAdmin(admin.ModelAdmin):
     list_display = (
@@ -77,4 +97,11 @@ class MaintenanceLogAdmin(admin.ModelAdmin):
     list_filter = ('is_prediction', 'machine', 'timestamp')
 
     # readonly, чтобы историю нельзя было подделать вручную
-    readonly_fields = ('timestamp', 'temperature', 'vibration', 'probability_failure', 'is_prediction')
\ No newline at end of file
+    readonly_fields = ('timestamp', 'temperature', 'vibration', 'probability_failure', 'is_prediction')
+
+@admin.register(CVAnalysisJob)
+class CVAnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ('batch', 'status', 'attempts', 'latency_ms', 'created_at', 'finished_at', 'worker')
+    list_filter = ('status',)
+    search_fields = ('batch__batch_code',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'latency_ms', 'worker', 'attempts')
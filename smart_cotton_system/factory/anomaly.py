@@ -0,0 +1,368 @@
+"""
+Streaming anomaly detection for machine telemetry.
+
+Every machine keeps a constant-size state per sensor (MachineHealthState):
+an exponentially weighted mean and variance, a two-sided CUSUM of the
+standardised reading and the last value. Each telemetry batch updates the
+state with NumPy: machines with a long run of new readings are updated over
+time in one call each (StreamingDetector.run), the rest together - step k
+feeds the k-th new reading of all of them (StreamingDetector.step). The
+cost is O(readings) with no history queries.
+
+A machine raises an alarm when
+- CUSUM crosses CUSUM_H (a sustained drift away from its own baseline),
+- a reading jumps by more than JUMP_Z standard deviations and faster than
+  RATE_LIMITS per minute (a sudden change), or
+- the absolute limits of analyze_machine_health are breached.
+Only the transition into alarm writes a MaintenanceLog prediction, so a
+machine that stays hot produces one entry, not one per reading; the alarm
+clears once the risk drops below CLEAR_PROBABILITY.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .services import TELEMETRY_FIELDS, analyze_machine_health
+
+logger = logging.getLogger(__name__)
+
+METRICS = TELEMETRY_FIELDS
+TEMPERATURE, VIBRATION, HUMIDITY, MOTOR_LOAD = range(len(METRICS))
+
+# State layout per metric: [mean, var, cusum_hi, cusum_lo, last]
+MEAN, VAR, CUSUM_HI, CUSUM_LO, LAST = range(5)
+
+EWMA_ALPHA = 0.01      # ~100-reading memory: slow enough that drifts stand out
+WARMUP_SAMPLES = 100   # no alarms until the baseline has settled
+CUSUM_K = 0.5          # slack, in standard deviations
+CUSUM_H = 10.0         # decision threshold, in standard deviations
+JUMP_Z = 6.0           # reading-to-reading change that counts as a jump
+Z_CLIP = 4.0           # single outliers are the jump detector's job, not CUSUM's
+CLEAR_PROBABILITY = 25.0  # alarm is cleared once the risk falls below this
+RUN_MIN_READINGS = 32  # machines with this many new readings go through run()
+
+# Floor for the standard deviation so perfectly steady sensors don't turn
+# noise-level changes into huge z-scores
+MIN_STD = (0.5, 0.01, 1.0, 1.0)
+# Largest plausible change per minute: temperature °C, vibration, humidity %, motor load %
+RATE_LIMITS = (5.0, 0.2, 20.0, 30.0)
+
+METRIC_NAMES = {
+    'temperature': 'температуры',
+    'vibration': 'вибрации',
+    'humidity': 'влажности',
+    'motor_load': 'нагрузки мотора',
+}
+
+
+def rule_risk(values):
+    """analyze_machine_health thresholds for an (N, metrics) array -> (N,) risk 0..100"""
+    import numpy as np
+
+    temp = values[:, TEMPERATURE]
+    risk = np.where(temp > 90, 50, np.where(temp > 75, 20, 0))
+    risk = risk + np.where(values[:, VIBRATION] > 0.5, 40, 0)
+    risk = risk + np.where(values[:, MOTOR_LOAD] > 95, 30, 0)
+    return np.minimum(risk, 100).astype(float)
+
+
+class StreamingDetector:
+    """
+    Vectorised EWMA / CUSUM / rate-of-change update over many machines.
+
+    Arrays are indexed by machine slot; state has shape (machines, metrics, 5).
+    """
+
+    def __init__(self, state, samples, last_ts, alarm):
+        import numpy as np
+
+        self.state = np.asarray(state, dtype=float)
+        self.samples = np.asarray(samples, dtype=float)
+        self.last_ts = np.asarray(last_ts, dtype=float)  # epoch seconds, nan if none
+        self.alarm = np.asarray(alarm, dtype=bool)
+        self.probability = np.zeros(len(self.samples))
+        self.min_std = np.array(MIN_STD)
+        self.rate_limits = np.array(RATE_LIMITS)
+
+    def step(self, slots, ts, x):
+        """
+        Feed one reading to each machine in `slots`.
+
+        Args:
+            slots: (A,) machine slots, each at most once
+            ts: (A,) epoch seconds
+            x: (A, metrics) readings (nan = sensor missing)
+
+        Returns:
+            list: (slot, probability, cusum_score, rate_score, rising) for
+            machines that entered the alarm state on this reading
+        """
+        import numpy as np
+
+        s = self.state[slots]
+        n = self.samples[slots][:, None]
+        present = ~np.isnan(x)
+        x = np.where(present, x, s[:, :, MEAN])
+        warm = (n >= WARMUP_SAMPLES) & present
+
+        # Scores use the baseline *before* this reading; the EWMA variance
+        # starts at 0, so it is bias-corrected for the first readings
+        settled = 1.0 - (1.0 - EWMA_ALPHA) ** np.maximum(n - 1, 1)
+        std = np.maximum(np.sqrt(s[:, :, VAR] / settled), self.min_std)
+        z = np.clip((x - s[:, :, MEAN]) / std, -Z_CLIP, Z_CLIP)
+        # Capped at 2*H so the alarm can clear soon after a drift stops
+        hi = np.where(warm, np.clip(s[:, :, CUSUM_HI] + z - CUSUM_K, 0.0, 2 * CUSUM_H), 0.0)
+        lo = np.where(warm, np.clip(s[:, :, CUSUM_LO] - z - CUSUM_K, 0.0, 2 * CUSUM_H), 0.0)
+        cusum_score = np.maximum(hi, lo) / CUSUM_H
+
+        # A jump must beat both the sensor noise and the plausible rate for the gap
+        minutes = np.maximum(ts - self.last_ts[slots], 1.0)[:, None] / 60.0
+        allowed = np.maximum(self.rate_limits * minutes, JUMP_Z * std)
+        rate_score = np.where(warm, np.abs(x - s[:, :, LAST]) / allowed, 0.0)
+        rate_score = np.nan_to_num(rate_score)
+
+        # EWMA mean/variance update (first reading initialises the baseline)
+        first = n == 0
+        diff = x - s[:, :, MEAN]
+        incr = EWMA_ALPHA * diff
+        mean = np.where(first, x, s[:, :, MEAN] + incr)
+        var = np.where(first, 0.0, (1 - EWMA_ALPHA) * (s[:, :, VAR] + diff * incr))
+        # A missing sensor leaves its state untouched
+        mean = np.where(present, mean, s[:, :, MEAN])
+        var = np.where(present, var, s[:, :, VAR])
+        last = np.where(present, x, s[:, :, LAST])
+
+        # Combine: crossing either threshold means a 50% risk, twice over it ~100%
+        score = np.maximum(cusum_score, rate_score).max(axis=1)
+        probability = np.clip(np.maximum(rule_risk(x), 50.0 * score), 0.0, 99.0)
+        triggered = (score >= 1.0) | (probability >= 50.0)
+
+        was_alarm = self.alarm[slots]
+        entered = triggered & ~was_alarm
+        alarm = np.where(triggered, True, np.where(probability < CLEAR_PROBABILITY, False, was_alarm))
+
+        self.state[slots] = np.stack([mean, var, hi, lo, last], axis=2)
+        self.samples[slots] += 1
+        self.last_ts[slots] = ts
+        self.alarm[slots] = alarm
+        self.probability[slots] = probability
+
+        return [
+            (slots[i], probability[i], cusum_score[i], rate_score[i], hi[i] >= lo[i])
+            for i in np.flatnonzero(entered)
+        ]
+
+    def run(self, slot, ts, x):
+        """
+        Feed a whole sequence of readings of one machine, vectorised over time.
+
+        Gives the same result as calling step() once per reading: the EWMA
+        mean and variance are linear recurrences (scipy.signal.lfilter), only
+        the clipped CUSUM is a scalar loop, and the alarm state is a forward
+        fill of trigger/clear events.
+
+        Args:
+            slot: machine slot
+            ts: (T,) epoch seconds, increasing
+            x: (T, metrics) readings without missing values
+
+        Returns:
+            list: (index, probability, cusum_score, rate_score, rising) for
+            the readings that entered the alarm state
+        """
+        import numpy as np
+        from scipy.signal import lfilter
+
+        T = len(ts)
+        s = self.state[slot]
+        n0 = self.samples[slot]
+        n = n0 + np.arange(T, dtype=float)[:, None]
+
+        # Baseline before every reading; the first reading of a new machine
+        # initialises it (mean = x, var = 0) exactly as in step()
+        mean0 = x[0] if n0 == 0 else s[:, MEAN]
+        a = [1.0, -(1.0 - EWMA_ALPHA)]
+        mean_after = lfilter([EWMA_ALPHA], a, x, axis=0, zi=((1.0 - EWMA_ALPHA) * mean0)[None, :])[0]
+        mean = np.vstack([mean0[None, :], mean_after[:-1]])
+        diff = x - mean
+        var_after = lfilter([1.0], a, (1.0 - EWMA_ALPHA) * EWMA_ALPHA * diff ** 2, axis=0,
+                            zi=((1.0 - EWMA_ALPHA) * s[:, VAR])[None, :])[0]
+        var = np.vstack([s[None, :, VAR], var_after[:-1]])
+
+        warm = np.broadcast_to(n >= WARMUP_SAMPLES, x.shape)
+        settled = 1.0 - (1.0 - EWMA_ALPHA) ** np.maximum(n - 1, 1)
+        std = np.maximum(np.sqrt(var / settled), self.min_std)
+        z = np.clip(diff / std, -Z_CLIP, Z_CLIP)
+
+        # CUSUM is clipped, so it stays a recurrence; warm readings are a suffix
+        hi = np.zeros_like(x)
+        lo = np.zeros_like(x)
+        first_warm = int(np.argmax(warm[:, 0])) if warm[-1, 0] else T
+        for m in range(x.shape[1]):
+            c_hi = s[m, CUSUM_HI] if first_warm == 0 else 0.0
+            c_lo = s[m, CUSUM_LO] if first_warm == 0 else 0.0
+            for t, zt in enumerate(z[first_warm:, m].tolist(), start=first_warm):
+                c_hi = min(max(c_hi + zt - CUSUM_K, 0.0), 2 * CUSUM_H)
+                c_lo = min(max(c_lo - zt - CUSUM_K, 0.0), 2 * CUSUM_H)
+                hi[t, m] = c_hi
+                lo[t, m] = c_lo
+        cusum_score = np.maximum(hi, lo) / CUSUM_H
+
+        previous_ts = np.concatenate([[self.last_ts[slot]], ts[:-1]])
+        minutes = np.maximum(ts - previous_ts, 1.0)[:, None] / 60.0
+        allowed = np.maximum(self.rate_limits * minutes, JUMP_Z * std)
+        last = np.vstack([s[None, :, LAST], x[:-1]])
+        rate_score = np.nan_to_num(np.where(warm, np.abs(x - last) / allowed, 0.0))
+
+        score = np.maximum(cusum_score, rate_score).max(axis=1)
+        probability = np.clip(np.maximum(rule_risk(x), 50.0 * score), 0.0, 99.0)
+        triggered = (score >= 1.0) | (probability >= 50.0)
+
+        # Alarm: set by a trigger, cleared by a low risk, otherwise carried over
+        event = triggered | (probability < CLEAR_PROBABILITY)
+        last_event = np.maximum.accumulate(np.where(event, np.arange(T), -1))
+        alarm = np.where(last_event >= 0, triggered[np.maximum(last_event, 0)], self.alarm[slot])
+        was_alarm = np.concatenate([[self.alarm[slot]], alarm[:-1]])
+        entered = triggered & ~was_alarm
+
+        self.state[slot] = np.stack([mean_after[-1], var_after[-1], hi[-1], lo[-1], x[-1]], axis=1)
+        self.samples[slot] += T
+        self.last_ts[slot] = ts[-1]
+        self.alarm[slot] = alarm[-1]
+        self.probability[slot] = probability[-1]
+
+        return [
+            (i, probability[i], cusum_score[i], rate_score[i], hi[i] >= lo[i])
+            for i in np.flatnonzero(entered)
+        ]
+
+
+def _describe(values, cusum_score, rate_score, rising):
+    """Human-readable reason for a MaintenanceLog entry"""
+    reasons = []
+    for idx, metric in enumerate(METRICS):
+        name = METRIC_NAMES[metric]
+        if cusum_score[idx] >= 1.0:
+            reasons.append(f"Устойчивый {'рост' if rising[idx] else 'спад'} {name}")
+        if rate_score[idx] >= 1.0:
+            reasons.append(f"Резкое изменение {name}")
+    risk, issues = analyze_machine_health(
+        None, values[TEMPERATURE], values[VIBRATION], values[MOTOR_LOAD]
+    )
+    if risk:
+        reasons.append(issues)
+    return "AI: " + ", ".join(reasons)
+
+
+def _arrays(readings):
+    """(epoch seconds, (N, metrics) values with nan for missing) of MachineTelemetry rows"""
+    import numpy as np
+
+    ts = np.array([r.timestamp.timestamp() for r in readings])
+    x = np.array([[np.nan if getattr(r, m) is None else getattr(r, m) for m in METRICS]
+                  for r in readings], dtype=float).reshape(len(readings), len(METRICS))
+    return ts, x
+
+
+@transaction.atomic
+def detect_anomalies(readings):
+    """
+    Update the streaming state with new telemetry and log alarms.
+
+    Runs in the transaction that stores the readings (see ingest_telemetry);
+    machine states are locked for the update so concurrent batches for the
+    same machine are applied one after another.
+
+    Args:
+        readings: iterable of MachineTelemetry (unsaved instances are fine)
+
+    Returns:
+        list: MaintenanceLog prediction entries created
+    """
+    import numpy as np
+    from .models import MachineHealthState, MaintenanceLog
+
+    by_machine = {}
+    for r in readings:
+        by_machine.setdefault(r.machine_id, []).append(r)
+    if not by_machine:
+        return []
+
+    machine_ids = sorted(by_machine)
+    MachineHealthState.objects.bulk_create(
+        [MachineHealthState(machine_id=m) for m in machine_ids], ignore_conflicts=True
+    )
+    states = list(MachineHealthState.objects.select_for_update().filter(machine_id__in=machine_ids)
+                  .order_by('machine_id'))
+
+    empty = [[0.0] * 5 for _ in METRICS]
+    detector = StreamingDetector(
+        state=[[st.state.get(m, empty[i]) for i, m in enumerate(METRICS)] for st in states],
+        samples=[st.samples for st in states],
+        last_ts=[st.last_timestamp.timestamp() if st.last_timestamp else np.nan for st in states],
+        alarm=[st.alarm for st in states],
+    )
+
+    # Readings per machine in time order; ones older than the state are skipped
+    sequences = []
+    for st in states:
+        rows = sorted(by_machine[st.machine_id], key=lambda r: r.timestamp)
+        if st.last_timestamp:
+            rows = [r for r in rows if r.timestamp > st.last_timestamp]
+        sequences.append(rows)
+
+    # Long sequences without gaps: one run() per machine, vectorised over time
+    alarms = []
+    stepped = []
+    for slot, rows in enumerate(sequences):
+        if len(rows) < RUN_MIN_READINGS:
+            stepped.append(slot)
+            continue
+        ts, x = _arrays(rows)
+        if np.isnan(x).any():
+            # Пропуски датчиков обрабатывает только step()
+            stepped.append(slot)
+            continue
+        alarms += [(slot, *alarm) for alarm in detector.run(slot, ts, x)]
+
+    # The rest: step k feeds the k-th new reading of all those machines at once
+    for k in range(max((len(sequences[slot]) for slot in stepped), default=0)):
+        slots = np.array([slot for slot in stepped if k < len(sequences[slot])])
+        ts, x = _arrays([sequences[slot][k] for slot in slots])
+        alarms += [(int(alarm[0]), k, *alarm[1:]) for alarm in detector.step(slots, ts, x)]
+
+    logs = []
+    for slot, k, probability, cusum_score, rate_score, rising in sorted(alarms, key=lambda a: a[:2]):
+        reading = sequences[slot][k]
+        values = [getattr(reading, m) or 0.0 for m in METRICS]
+        logs.append(MaintenanceLog(
+            machine_id=states[slot].machine_id,
+            timestamp=reading.timestamp,
+            description=_describe(values, cusum_score, rate_score, rising),
+            temperature=values[TEMPERATURE],
+            vibration=values[VIBRATION],
+            is_prediction=True,
+            probability_failure=round(float(probability), 1),
+        ))
+
+    now = timezone.now()
+    for slot, st in enumerate(states):
+        st.state = {m: detector.state[slot, i].tolist() for i, m in enumerate(METRICS)}
+        st.samples = int(detector.samples[slot])
+        if sequences[slot]:
+            st.last_timestamp = sequences[slot][-1].timestamp
+            st.probability_failure = round(float(detector.probability[slot]), 1)
+        st.alarm = bool(detector.alarm[slot])
+        st.updated_at = now
+
+    # Upsert instead of bulk_update: one INSERT .. ON CONFLICT rather than a CASE per row
+    MachineHealthState.objects.bulk_create(
+        states, update_conflicts=True, unique_fields=['machine'],
+        update_fields=['state', 'samples', 'last_timestamp', 'alarm', 'probability_failure', 'updated_at'],
+    )
+    MaintenanceLog.objects.bulk_create(logs)
+
+    if logs:
+        logger.info(f"Anomaly detector: {len(logs)} new alarms")
+    return logs
@@ -0,0 +1,107 @@
+"""
+Micro-batching for model inference.
+
+Concurrent requests each submit one input; a single worker thread collects
+whatever arrives within a short window (or until the batch is full) and runs
+the model once for the whole batch. For Keras models the per-call overhead
+dominates small inputs, so one batch of N is much cheaper than N batches of 1.
+
+Batching only pays off when requests are actually concurrent: threaded
+workers (gunicorn --threads / gthread), ASGI, or background analysis jobs.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collect single inputs from many threads and run them as one batch.
+
+    Args:
+        batch_fn: callable taking a list of inputs and returning a list of
+            results in the same order
+        max_batch_size (int): upper bound on inputs per batch_fn call
+        max_wait_ms (float): how long to wait for more inputs after the first
+            one arrives before running a partial batch
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5.0, name='micro-batcher'):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Counters for monitoring (batches run and inputs processed)
+        self.batches = 0
+        self.items = 0
+        self._last_size = 0
+
+    def submit(self, item):
+        """Queue one input; returns a Future resolving to its result"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item, timeout=None):
+        """Run one input through the batcher and wait for its result"""
+        return self.submit(item).result(timeout=timeout)
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def _collect(self):
+        """Block for the first input, then gather more until full or the window closes"""
+        batch = [self._queue.get()]
+
+        # Under light load (last batch was a single input and nothing else is
+        # queued) waiting would only add latency, so run immediately
+        if self._last_size <= 1 and self._queue.empty():
+            return batch
+
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self._last_size = len(batch)
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+
+            try:
+                results = self.batch_fn(items)
+            except Exception as e:
+                logger.error(f"{self.name}: batch of {len(items)} failed: {e}")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(items)
+            for future, result in zip(futures, results):
+                future.set_result(result)
@@ -0,0 +1,330 @@
+"""
+Background CV analysis of CottonBatch photos.
+
+Saving a batch with a photo only records a CVAnalysisJob (see signals.py);
+the request returns immediately. A bounded pool of worker threads claims
+pending jobs in batches and classifies each batch of photos with one
+vision model call, so a backlog of uploads is drained in parallel.
+
+The job table is the queue: jobs survive restarts, and a job whose worker
+died is claimed again after CV_JOB_TIMEOUT seconds (up to
+CV_JOB_MAX_ATTEMPTS times). FAILED is for images the model cannot
+classify: while the vision model is not loaded no jobs are claimed, and a
+batch whose model call fails goes back to PENDING for another attempt. The pool runs inside web workers
+(start_cv_workers() from config/wsgi.py and config/asgi.py, when
+CV_WORKERS_IN_PROCESS is on) or standalone via `manage.py cv_worker`.
+"""
+import logging
+import os
+import socket
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Set when a job is queued so idle workers pick it up without waiting for the poll
+_wakeup = threading.Event()
+_pool = None
+_pool_lock = threading.Lock()
+
+MODEL_RETRY_INTERVAL = 60.0   # seconds between attempts to load a missing vision model
+_model_lock = threading.Lock()
+_model_retry_at = None
+
+
+def notify():
+    _wakeup.set()
+
+
+def enqueue_cv_analysis(batch):
+    """Queue CV analysis of a batch photo (no-op if a job is already pending/running)"""
+    from .models import CVAnalysisJob
+
+    active = CVAnalysisJob.objects.filter(
+        batch=batch, status__in=[CVAnalysisJob.PENDING, CVAnalysisJob.RUNNING]
+    )
+    if active.exists():
+        return None
+
+    job = CVAnalysisJob.objects.create(batch=batch)
+    transaction.on_commit(notify)
+    return job
+
+
+def vision_model_ready():
+    """
+    Whether the vision model is loaded. A missing model (e.g. no
+    cotton_model.keras yet) is loaded again at most every MODEL_RETRY_INTERVAL
+    seconds; until then workers leave the queue alone.
+    """
+    global _model_retry_at
+    from .ml_service import vision_classifier
+
+    with _model_lock:
+        if vision_classifier.model is not None:
+            return True
+        now = time.monotonic()
+        if _model_retry_at is not None and now < _model_retry_at:
+            return False
+        if _model_retry_at is not None:
+            vision_classifier.load_model()
+        if vision_classifier.model is None:
+            _model_retry_at = now + MODEL_RETRY_INTERVAL
+            logger.warning("Vision model not loaded: CV jobs stay queued")
+            return False
+        return True
+
+
+def claim_jobs(worker, limit):
+    """
+    Atomically take up to `limit` jobs for `worker`.
+
+    Claiming is a conditional UPDATE (status still claimable), so concurrent
+    workers in any process never get the same job, on SQLite and PostgreSQL.
+    """
+    from .models import CVAnalysisJob
+
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.CV_JOB_TIMEOUT)
+    max_attempts = settings.CV_JOB_MAX_ATTEMPTS
+
+    # Jobs whose worker died after the last allowed attempt are given up
+    CVAnalysisJob.objects.filter(
+        status=CVAnalysisJob.RUNNING, started_at__lt=stale, attempts__gte=max_attempts
+    ).update(status=CVAnalysisJob.FAILED, error='Timed out', finished_at=now)
+
+    claimable = Q(status=CVAnalysisJob.PENDING) | Q(
+        status=CVAnalysisJob.RUNNING, started_at__lt=stale, attempts__lt=max_attempts
+    )
+    ids = list(
+        CVAnalysisJob.objects.filter(claimable)
+        .order_by('created_at')
+        .values_list('pk', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+
+    CVAnalysisJob.objects.filter(claimable, pk__in=ids).update(
+        status=CVAnalysisJob.RUNNING,
+        worker=worker,
+        started_at=now,
+        attempts=F('attempts') + 1,
+    )
+    return list(
+        CVAnalysisJob.objects.filter(
+            pk__in=ids, status=CVAnalysisJob.RUNNING, worker=worker, started_at=now
+        ).select_related('batch')
+    )
+
+
+def process_jobs(jobs):
+    """
+    Classify the photos of claimed jobs with one batched model call and
+    store cv_status/cv_confidence on the batches.
+
+    If the model call itself fails, the jobs go back to PENDING (FAILED once
+    they have used CV_JOB_MAX_ATTEMPTS); only per-image errors fail a job
+    right away.
+
+    Returns:
+        tuple: (done, failed) job counts
+    """
+    from .models import CottonBatch, CVAnalysisJob
+    from .services import classify_cotton_images
+
+    todo = []
+    for job in jobs:
+        if not job.batch.cotton_image:
+            job.status, job.error = CVAnalysisJob.FAILED, 'Batch has no image'
+        elif job.batch.cv_status:
+            job.status = CVAnalysisJob.DONE
+        else:
+            todo.append(job)
+
+    analyzed = []
+    if todo:
+        start = time.perf_counter()
+        try:
+            results = classify_cotton_images([job.batch.cotton_image.path for job in todo])
+        except Exception as e:
+            logger.error(f"CV analysis of {len(todo)} images failed: {e}")
+            results = None
+            for job in todo:
+                # Ошибка модели, а не фото: задача вернется в очередь
+                retry = job.attempts < settings.CV_JOB_MAX_ATTEMPTS
+                job.status = CVAnalysisJob.PENDING if retry else CVAnalysisJob.FAILED
+                job.error = str(e)
+        # Per-image share of decoding + the batched model call
+        latency_ms = (time.perf_counter() - start) * 1000 / len(todo)
+
+        for job, result in zip(todo, results or []):
+            job.latency_ms = latency_ms
+            if isinstance(result, dict):
+                job.status, job.error = CVAnalysisJob.FAILED, result['error']
+            else:
+                job.batch.cv_status, job.batch.cv_confidence = result
+                job.status, job.error = CVAnalysisJob.DONE, ''
+                analyzed.append(job.batch)
+
+    finished_at = timezone.now()
+    for job in jobs:
+        job.finished_at = None if job.status == CVAnalysisJob.PENDING else finished_at
+
+    with transaction.atomic():
+        if analyzed:
+            CottonBatch.objects.bulk_update(analyzed, ['cv_status', 'cv_confidence'])
+        CVAnalysisJob.objects.bulk_update(jobs, ['status', 'error', 'finished_at', 'latency_ms'])
+
+    done = sum(1 for job in jobs if job.status == CVAnalysisJob.DONE)
+    failed = sum(1 for job in jobs if job.status == CVAnalysisJob.FAILED)
+    return done, failed
+
+
+class CVWorkerPool:
+    """
+    Fixed number of threads, each claiming up to batch_size jobs at a time.
+
+    Args:
+        workers (int): worker threads (parallel batches)
+        batch_size (int): photos per vision model call
+        poll_interval (float): seconds an idle worker sleeps before polling
+            the job table again (jobs queued in this process wake it at once)
+    """
+
+    def __init__(self, workers=2, batch_size=16, poll_interval=5.0):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+        self._prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, args=(f'{self._prefix}:{i}',),
+                                      name=f'cv-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        _wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run_once(self, worker=None):
+        """
+        Claim and process one batch of jobs; returns the number of jobs
+        finished (jobs put back in the queue don't count, so the worker
+        waits before trying again)
+        """
+        if not vision_model_ready():
+            return 0
+        jobs = claim_jobs(worker or f'{self._prefix}:main', self.batch_size)
+        if not jobs:
+            return 0
+        done, failed = process_jobs(jobs)
+        logger.info(f"CV worker {worker}: {done} analyzed, {failed} failed, "
+                    f"{len(jobs) - done - failed} re-queued")
+        return done + failed
+
+    def drain(self):
+        """Process jobs until the queue is empty (used by `cv_worker --once`)"""
+        total = 0
+        while True:
+            handled = self.run_once()
+            if not handled:
+                return total
+            total += handled
+
+    def _loop(self, worker):
+        while not self._stop.is_set():
+            close_old_connections()
+            try:
+                handled = self.run_once(worker)
+            except Exception as e:
+                logger.error(f"CV worker {worker} failed: {e}")
+                handled = 0
+            if not handled:
+                _wakeup.wait(self.poll_interval)
+                _wakeup.clear()
+        close_old_connections()
+
+
+def start_cv_workers():
+    """Start the in-process worker pool (once per process, if enabled)"""
+    global _pool
+
+    if not getattr(settings, 'CV_WORKERS_IN_PROCESS', True):
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = CVWorkerPool(
+                workers=settings.CV_WORKERS,
+                batch_size=settings.CV_WORKER_BATCH_SIZE,
+            ).start()
+    return _pool
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * q))], 1)
+
+
+def queue_stats(recent=200):
+    """
+    Queue depth and latency of recently finished jobs.
+
+    Returns:
+        dict: {
+            'queue_depth': int (pending + running),
+            'counts': {status: int},
+            'oldest_pending_s': float | None,
+            'image_latency_ms': {'p50', 'p95', 'mean'},   # per-image processing
+            'end_to_end_ms': {'p50', 'p95', 'mean'},      # upload -> result
+        }
+    """
+    from .models import CVAnalysisJob
+
+    counts = {status: 0 for status, _ in CVAnalysisJob.STATUS_CHOICES}
+    counts.update(CVAnalysisJob.objects.values_list('status').annotate(n=Count('pk')))
+
+    oldest = (
+        CVAnalysisJob.objects.filter(status=CVAnalysisJob.PENDING)
+        .order_by('created_at')
+        .values_list('created_at', flat=True)
+        .first()
+    )
+
+    finished = list(
+        CVAnalysisJob.objects.filter(status=CVAnalysisJob.DONE, latency_ms__isnull=False)
+        .order_by('-finished_at')
+        .values_list('latency_ms', 'created_at', 'finished_at')[:recent]
+    )
+    image_ms = [latency for latency, _, _ in finished]
+    total_ms = [(end - start).total_seconds() * 1000 for _, start, end in finished]
+
+    def summary(values):
+        return {
+            'p50': _percentile(values, 0.5),
+            'p95': _percentile(values, 0.95),
+            'mean': round(statistics.fmean(values), 1) if values else None,
+        }
+
+    return {
+        'queue_depth': counts[CVAnalysisJob.PENDING] + counts[CVAnalysisJob.RUNNING],
+        'counts': counts,
+        'oldest_pending_s': round((timezone.now() - oldest).total_seconds(), 1) if oldest else None,
+        'image_latency_ms': summary(image_ms),
+        'end_to_end_ms': summary(total_ms),
+    }
@@ -0,0 +1,387 @@
+"""
+Predictive maintenance: failure-risk model trained on telemetry history.
+
+Telemetry is put on a 1 Hz grid and cut into WINDOW-second windows with
+NumPy stride tricks (sliding_window_view returns a view, nothing is copied).
+Every window becomes one feature row: per-sensor mean/std/min/max/last/slope
+and the low/mid/high band energy of the vibration spectrum - bearing wear
+shows up as high-frequency vibration before the temperature moves. A window
+is labelled positive when a real failure (MaintenanceLog with
+is_prediction=False) follows within HORIZON seconds of its end.
+
+train_failure_model fits a gradient boosting classifier and saves it to
+ml_service.FAILURE_MODEL_PATH. score_fleet scores every machine at once: one
+query for the last WINDOW seconds of telemetry, one (machines, WINDOW,
+sensors) array, one feature pass and one predict_proba call.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .services import TELEMETRY_FIELDS
+
+logger = logging.getLogger(__name__)
+
+METRICS = TELEMETRY_FIELDS
+TEMPERATURE, VIBRATION, HUMIDITY, MOTOR_LOAD = range(len(METRICS))
+
+WINDOW = 300            # seconds (1 Hz readings) per feature window
+STRIDE = 60             # step between training windows
+HORIZON = 3600          # predict failures within the next hour
+MIN_COVERAGE = 0.5      # windows with fewer readings are neither used nor scored
+ALERT_PROBABILITY = 50.0
+
+WINDOW_STATS = ('mean', 'std', 'min', 'max', 'last', 'slope')
+VIBRATION_BANDS = ('low', 'mid', 'high')
+FEATURE_NAMES = (
+    [f'{metric}_{stat}' for metric in METRICS for stat in WINDOW_STATS]
+    + [f'vibration_energy_{band}' for band in VIBRATION_BANDS]
+)
+
+
+def window_features(windows):
+    """
+    Feature rows for a batch of telemetry windows.
+
+    Args:
+        windows: (N, length, len(METRICS)) readings on a 1 Hz grid, nan = no reading
+
+    Returns:
+        ndarray: (N, len(FEATURE_NAMES))
+    """
+    import numpy as np
+
+    # (N, metrics, length), contiguous: every reduction runs along the last axis
+    x = np.ascontiguousarray(np.asarray(windows, dtype=float).transpose(0, 2, 1))
+    n, _, length = x.shape
+    valid = ~np.isnan(x)
+    count = np.maximum(valid.sum(axis=2), 1)
+
+    mean = np.where(valid, x, 0.0).sum(axis=2) / count
+    # Gaps are filled with the window mean so they add nothing to std, slope or spectrum
+    centered = np.where(valid, x - mean[:, :, None], 0.0)
+    std = np.sqrt((centered ** 2).sum(axis=2) / count)
+    low = mean + centered.min(axis=2)
+    high = mean + centered.max(axis=2)
+
+    last_idx = length - 1 - np.argmax(valid[:, :, ::-1], axis=2)
+    last = mean + np.take_along_axis(centered, last_idx[:, :, None], axis=2)[:, :, 0]
+
+    # Least-squares slope (per second) over the readings that exist
+    t = np.arange(length, dtype=float)
+    t_mean = (valid * t).sum(axis=2) / count
+    dt = np.where(valid, t - t_mean[:, :, None], 0.0)
+    denom = (dt ** 2).sum(axis=2)
+    slope = np.divide((dt * centered).sum(axis=2), denom, out=np.zeros_like(denom), where=denom > 0)
+
+    stats = np.stack([mean, std, low, high, last, slope], axis=2)
+
+    # Vibration power spectrum without the DC term, split into equal bands
+    power = np.abs(np.fft.rfft(centered[:, VIBRATION], axis=1)[:, 1:]) ** 2 / length
+    energy = np.stack([band.sum(axis=1) for band in np.array_split(power, len(VIBRATION_BANDS), axis=1)], axis=1)
+
+    return np.hstack([stats.reshape(n, len(METRICS) * len(WINDOW_STATS)), energy])
+
+
+def labelled_windows(grid, failures, window=WINDOW, stride=STRIDE, horizon=HORIZON):
+    """
+    Training windows of one machine.
+
+    Args:
+        grid: (T, len(METRICS)) 1 Hz readings, nan = no reading
+        failures: sorted grid seconds at which the machine failed
+
+    Returns:
+        tuple: (windows (W, window, metrics), labels (W,)) - windows that
+        contain a failure or too few readings are dropped
+    """
+    import numpy as np
+
+    if len(grid) < window:
+        return np.empty((0, window, grid.shape[1])), np.empty(0, dtype=bool)
+
+    # (W, metrics, window) view -> (W, window, metrics)
+    windows = np.lib.stride_tricks.sliding_window_view(grid, window, axis=0)[::stride].transpose(0, 2, 1)
+    starts = np.arange(len(windows)) * stride
+    ends = starts + window - 1
+
+    failures = np.asarray(failures, dtype=float)
+    nxt = np.searchsorted(failures, starts, side='left')
+    next_failure = np.append(failures, np.inf)[nxt]
+
+    has_reading = np.concatenate([[0], np.cumsum((~np.isnan(grid)).any(axis=1))])
+    coverage = (has_reading[ends + 1] - has_reading[starts]) / window
+
+    keep = (next_failure > ends) & (coverage >= MIN_COVERAGE)
+    labels = next_failure <= ends + horizon
+    return windows[keep], labels[keep]
+
+
+def build_training_set(series, window=WINDOW, stride=STRIDE, horizon=HORIZON):
+    """
+    Feature matrix for many machines.
+
+    Args:
+        series: iterable of (grid, failures) per machine, see labelled_windows
+
+    Returns:
+        tuple: (features, labels, groups) - groups is the machine index of each
+        row, for splitting train/test by machine
+    """
+    import numpy as np
+
+    features, labels, groups = [], [], []
+    for idx, (grid, failures) in enumerate(series):
+        windows, y = labelled_windows(grid, failures, window, stride, horizon)
+        if len(y):
+            features.append(window_features(windows))
+            labels.append(y)
+            groups.append(np.full(len(y), idx))
+
+    if not features:
+        return np.empty((0, len(FEATURE_NAMES))), np.empty(0, dtype=bool), np.empty(0, dtype=int)
+    return np.vstack(features), np.concatenate(labels), np.concatenate(groups)
+
+
+def synthetic_fleet(machines, seconds, failing=0.3, degradation=2 * HORIZON, seed=0):
+    """
+    Synthetic 1 Hz telemetry for a fleet.
+
+    A `failing` share of machines degrades over `degradation` seconds before
+    its failure: temperature and motor load creep up and a growing
+    high-frequency component appears in vibration. Some failures fall after
+    the generated period, like machines that are about to break today.
+
+    Returns:
+        tuple: (values (machines, seconds, metrics) float32 with nan after a
+        failure, failure_at (machines,) failure second or -1)
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds, dtype=np.float32)
+    shape = (machines, seconds)
+
+    failure_at = np.full(machines, -1)
+    fail = rng.random(machines) < failing
+    failure_at[fail] = rng.integers(seconds // 2, seconds + HORIZON, fail.sum())
+    wear = np.where(fail[:, None], np.clip((t - (failure_at[:, None] - degradation)) / degradation, 0, 1), 0)
+    wear = wear.astype(np.float32)
+    phase = rng.uniform(0, 2 * np.pi, (machines, 1)).astype(np.float32)
+
+    values = np.empty(shape + (len(METRICS),), dtype=np.float32)
+    values[:, :, TEMPERATURE] = rng.uniform(55, 70, (machines, 1)) + rng.normal(0, 0.5, shape) + 15 * wear ** 2
+    values[:, :, VIBRATION] = (
+        0.15 + 0.01 * np.sin(2 * np.pi * t / 100 + phase) + rng.normal(0, 0.01, shape)
+        + 0.05 * wear + 0.1 * wear * np.sin(2 * np.pi * 0.3 * t + phase)
+    )
+    values[:, :, HUMIDITY] = 50 + rng.normal(0, 1, shape)
+    values[:, :, MOTOR_LOAD] = rng.uniform(40, 60, (machines, 1)) + rng.normal(0, 1, shape) + 10 * wear
+
+    # A failed machine stops reporting
+    values[fail[:, None] & (t >= failure_at[:, None])] = np.nan
+    return values, failure_at
+
+
+def synthetic_series(values, failure_at):
+    """(grid, failures) pairs of a synthetic fleet for build_training_set"""
+    import numpy as np
+
+    for grid, failure in zip(values, failure_at):
+        yield grid, np.array([failure] if failure >= 0 else [])
+
+
+def _to_grid(slots, seconds, values, rows, length):
+    """Scatter readings into a (rows, length, metrics) 1 Hz grid (nan = no reading)"""
+    import numpy as np
+
+    grid = np.full((rows, length, len(METRICS)), np.nan)
+    inside = (seconds >= 0) & (seconds < length)
+    slots, seconds, values = slots[inside], seconds[inside], values[inside]
+    # Several readings in one second: the later one (in input order) wins.
+    # NumPy leaves open which duplicate a fancy-index assignment keeps, so
+    # the last occurrence of every (slot, second) is picked explicitly
+    cell = slots * length + seconds
+    _, last = np.unique(cell[::-1], return_index=True)
+    last = len(cell) - 1 - last
+    grid[slots[last], seconds[last]] = values[last]
+    return grid
+
+
+def history_series(start, end, horizon=HORIZON):
+    """
+    (grid, failures) per machine from raw MachineTelemetry in [start, end).
+
+    Failures are MaintenanceLog entries written by people (is_prediction=False).
+    Only raw readings are used: compacted history has no per-second detail.
+    """
+    import numpy as np
+    from .models import MachineTelemetry, MaintenanceLog
+
+    length = int((end - start).total_seconds())
+    machine_ids = (MachineTelemetry.objects.filter(timestamp__gte=start, timestamp__lt=end)
+                   .values_list('machine_id', flat=True).distinct())
+    for machine_id in sorted(machine_ids):
+        rows = list(MachineTelemetry.objects.filter(machine_id=machine_id, timestamp__gte=start, timestamp__lt=end)
+                    .order_by('timestamp').values_list('timestamp', *METRICS))
+        seconds = np.array([int((row[0] - start).total_seconds()) for row in rows])
+        values = np.array([row[1:] for row in rows], dtype=float)
+        grid = _to_grid(np.zeros(len(rows), dtype=int), seconds, values, 1, length)[0]
+
+        failed = MaintenanceLog.objects.filter(
+            machine_id=machine_id, is_prediction=False,
+            timestamp__gte=start, timestamp__lt=end + timedelta(seconds=horizon),
+        ).order_by('timestamp').values_list('timestamp', flat=True)
+        yield grid, np.array([(ts - start).total_seconds() for ts in failed])
+
+
+def train_failure_model(features, labels, groups, path=None, window=WINDOW, horizon=HORIZON):
+    """
+    Fit the failure-risk classifier and save it.
+
+    The model is evaluated on machines held out of training (windows of one
+    machine are strongly correlated), then refitted on everything.
+
+    Returns:
+        dict: hold-out metrics
+    """
+    import joblib
+    import numpy as np
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.metrics import average_precision_score, precision_score, recall_score, roc_auc_score
+    from sklearn.model_selection import GroupShuffleSplit
+    from .ml_service import FAILURE_MODEL_PATH
+
+    labels = np.asarray(labels, dtype=bool)
+    if labels.all() or not labels.any():
+        raise ValueError("training set needs windows both before failures and of normal operation")
+
+    def make_model():
+        return HistGradientBoostingClassifier(max_iter=200, class_weight='balanced', random_state=42)
+
+    train, test = next(GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
+                       .split(features, labels, groups))
+    model = make_model().fit(features[train], labels[train])
+    metrics = {
+        'windows': int(len(labels)),
+        'positive_share': round(float(labels.mean()), 4),
+        'test_machines': int(len(np.unique(groups[test]))),
+    }
+    if labels[test].any() and not labels[test].all():
+        proba = model.predict_proba(features[test])[:, 1]
+        predicted = proba * 100 >= ALERT_PROBABILITY
+        metrics.update({
+            'roc_auc': round(float(roc_auc_score(labels[test], proba)), 4),
+            'average_precision': round(float(average_precision_score(labels[test], proba)), 4),
+            'precision': round(float(precision_score(labels[test], predicted, zero_division=0)), 4),
+            'recall': round(float(recall_score(labels[test], predicted)), 4),
+        })
+
+    model = make_model().fit(features, labels)
+    joblib.dump({
+        'model': model,
+        'feature_names': FEATURE_NAMES,
+        'window': window,
+        'horizon': horizon,
+        'metrics': metrics,
+        'trained_at': timezone.now().isoformat(),
+    }, path or FAILURE_MODEL_PATH)
+    logger.info(f"Failure model trained on {len(labels)} windows: {metrics}")
+    return metrics
+
+
+def load_fleet_windows(now, window=WINDOW):
+    """
+    Last `window` seconds of telemetry of every machine, in one query.
+
+    Returns:
+        tuple: (machine_ids (N,), grid (N, window, metrics))
+    """
+    import numpy as np
+    from .models import MachineTelemetry
+
+    start = now - timedelta(seconds=window)
+    # In time order (ties by insertion): _to_grid keeps the later reading of a second
+    rows = list(MachineTelemetry.objects.filter(timestamp__gt=start, timestamp__lte=now)
+                .order_by('timestamp', 'pk').values_list('machine_id', 'timestamp', *METRICS))
+    if not rows:
+        return np.empty(0, dtype=int), np.empty((0, window, len(METRICS)))
+
+    machine_ids, slots = np.unique(np.array([row[0] for row in rows]), return_inverse=True)
+    # (start, now] -> seconds 0..window-1
+    seconds = np.ceil([(row[1] - start).total_seconds() for row in rows]).astype(int) - 1
+    values = np.array([row[2:] for row in rows], dtype=float)
+    return machine_ids, _to_grid(slots, seconds, values, len(machine_ids), window)
+
+
+def score_fleet(now=None, threshold=ALERT_PROBABILITY, predictor=None):
+    """
+    Score every machine with recent telemetry in one batch.
+
+    The risk is stored on MachineHealthState.failure_risk; a MaintenanceLog
+    prediction is written only when a machine's risk crosses `threshold`
+    (not on every run while it stays high).
+
+    Returns:
+        dict: {'machines', 'alerts', 'load_ms', 'features_ms', 'predict_ms', 'write_ms'}
+    """
+    import numpy as np
+    from .ml_service import failure_predictor
+    from .models import MachineHealthState, MaintenanceLog
+
+    predictor = predictor or failure_predictor
+    if predictor.model is None:
+        raise Exception("Failure model not trained (run manage.py train_failure_model)")
+    if list(predictor.feature_names) != FEATURE_NAMES:
+        raise ValueError("failure model was trained on different features, retrain it")
+    now = now or timezone.now()
+
+    start = time.perf_counter()
+    machine_ids, grid = load_fleet_windows(now, predictor.window)
+    loaded = time.perf_counter()
+
+    coverage = (~np.isnan(grid)).any(axis=2).mean(axis=1)
+    machine_ids, grid = machine_ids[coverage >= MIN_COVERAGE], grid[coverage >= MIN_COVERAGE]
+    features = window_features(grid)
+    featured = time.perf_counter()
+
+    risk = np.round(predictor.predict_proba(features) * 100, 1) if len(features) else np.empty(0)
+    predicted = time.perf_counter()
+
+    last_temperature = features[:, FEATURE_NAMES.index('temperature_last')]
+    last_vibration = features[:, FEATURE_NAMES.index('vibration_last')]
+    with transaction.atomic():
+        previous = dict(MachineHealthState.objects.filter(machine_id__in=machine_ids.tolist())
+                        .values_list('machine_id', 'failure_risk'))
+        MachineHealthState.objects.bulk_create(
+            [MachineHealthState(machine_id=int(m), failure_risk=float(r), scored_at=now)
+             for m, r in zip(machine_ids, risk)],
+            update_conflicts=True, unique_fields=['machine'], update_fields=['failure_risk', 'scored_at'],
+        )
+        logs = [
+            MaintenanceLog(
+                machine_id=int(machine_ids[i]),
+                timestamp=now,
+                description=f"AI: Модель прогнозирует отказ в ближайшие {predictor.horizon // 60} мин",
+                temperature=round(float(last_temperature[i]), 2),
+                vibration=round(float(last_vibration[i]), 3),
+                is_prediction=True,
+                probability_failure=float(risk[i]),
+            )
+            for i in np.flatnonzero(risk >= threshold)
+            if previous.get(int(machine_ids[i]), 0) < threshold
+        ]
+        MaintenanceLog.objects.bulk_create(logs)
+    written = time.perf_counter()
+
+    return {
+        'machines': int(len(machine_ids)),
+        'alerts': len(logs),
+        'load_ms': round((loaded - start) * 1000, 1),
+        'features_ms': round((featured - loaded) * 1000, 1),
+        'predict_ms': round((predicted - featured) * 1000, 1),
+        'write_ms': round((written - predicted) * 1000, 1),
+    }
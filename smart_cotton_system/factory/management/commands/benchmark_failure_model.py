@@ -0,0 +1,111 @@
+"""
+Django management command to benchmark the predictive-maintenance pipeline
+Usage: python manage.py benchmark_failure_model --machines 1000 --hours 1 [--db]
+"""
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from factory import maintenance
+from factory.ml_service import FailurePredictor
+from factory.models import Machine, MachineTelemetry
+
+
+class Command(BaseCommand):
+    help = 'Benchmark feature building, training and batched scoring on a synthetic 1 Hz fleet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--machines',
+            type=int,
+            default=1000,
+            help='Machines in the synthetic fleet (default: 1000)',
+        )
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=1,
+            help='Hours of 1 Hz telemetry per machine (default: 1)',
+        )
+        parser.add_argument(
+            '--db',
+            action='store_true',
+            help='Also time score_fleet against the database (rows are rolled back)',
+        )
+
+    def handle(self, *args, **options):
+        import numpy as np
+
+        machines = options['machines']
+        seconds = int(options['hours'] * 3600)
+
+        start = time.perf_counter()
+        values, failure_at = maintenance.synthetic_fleet(machines, seconds)
+        generated = time.perf_counter()
+        self.stdout.write(
+            f"📊 Fleet: {machines} machines x {seconds} s = {values.shape[0] * values.shape[1]:,} readings "
+            f"({generated - start:.1f}s to generate)"
+        )
+
+        features, labels, groups = maintenance.build_training_set(maintenance.synthetic_series(values, failure_at))
+        built = time.perf_counter()
+        self.stdout.write(
+            f"  training windows: {len(labels):,} in {built - generated:.2f}s "
+            f"({len(labels) / (built - generated):,.0f} windows/s)"
+        )
+
+        # Train into a temporary file so the production model is left alone
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'failure_model.pkl')
+            metrics = maintenance.train_failure_model(features, labels, groups, path=path)
+            trained = time.perf_counter()
+            predictor = FailurePredictor(path)
+        self.stdout.write(f"  training: {trained - built:.1f}s, hold-out {metrics}")
+
+        # Scoring: the last WINDOW seconds of every machine that is still running
+        running = np.flatnonzero(~np.isnan(values[:, -1, 0]))
+        latest = values[running, -maintenance.WINDOW:]
+
+        start = time.perf_counter()
+        risk = predictor.predict_proba(maintenance.window_features(latest))
+        batched = time.perf_counter() - start
+
+        sample = running[:100]
+        start = time.perf_counter()
+        for i in range(len(sample)):
+            predictor.predict_proba(maintenance.window_features(latest[i:i + 1]))
+        per_machine = (time.perf_counter() - start) / max(len(sample), 1) * len(running)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Scored {len(running)} machines in {batched * 1000:.1f} ms in one batch "
+            f"vs ~{per_machine * 1000:.0f} ms one by one; {(risk * 100 >= maintenance.ALERT_PROBABILITY).sum()} at risk"
+        ))
+
+        if options['db']:
+            self._benchmark_db(latest, predictor)
+
+    def _benchmark_db(self, latest, predictor):
+        now = timezone.now().replace(microsecond=0)
+        with transaction.atomic():
+            fleet = Machine.objects.bulk_create([Machine(name=f'Bench-{i}') for i in range(len(latest))])
+            start = time.perf_counter()
+            rows = [
+                MachineTelemetry(
+                    machine_id=machine.pk,
+                    timestamp=now - timedelta(seconds=len(window) - 1 - second),
+                    **dict(zip(maintenance.METRICS, map(float, reading))),
+                )
+                for machine, window in zip(fleet, latest)
+                for second, reading in enumerate(window)
+            ]
+            MachineTelemetry.objects.bulk_create(rows, batch_size=5000)
+            self.stdout.write(f"  inserted {len(rows):,} readings in {time.perf_counter() - start:.1f}s")
+
+            stats = maintenance.score_fleet(now=now, predictor=predictor)
+            self.stdout.write(self.style.SUCCESS(f"✅ score_fleet: {stats}"))
+            transaction.set_rollback(True)
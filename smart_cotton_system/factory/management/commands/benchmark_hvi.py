@@ -0,0 +1,88 @@
+"""
+Django management command to benchmark HVI quality classification throughput
+Usage: python manage.py benchmark_hvi --rows 1000 --repeat 3
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from factory.ml_service import hvi_classifier
+
+
+def make_samples(n, color_grades, seed=42):
+    """Synthetic HVI samples within realistic lab ranges"""
+    rng = random.Random(seed)
+    return [{
+        'micronaire': round(rng.uniform(3.0, 5.5), 2),
+        'strength': round(rng.uniform(24.0, 36.0), 1),
+        'length': round(rng.uniform(1.0, 1.3), 3),
+        'uniformity': round(rng.uniform(78.0, 86.0), 1),
+        'trash_grade': rng.randint(1, 6),
+        'trash_cnt': rng.randint(5, 60),
+        'trash_area': round(rng.uniform(0.05, 0.8), 2),
+        'sfi': round(rng.uniform(6.0, 14.0), 1),
+        'sci': rng.randint(90, 160),
+        'color_grade': rng.choice(color_grades),
+    } for _ in range(n)]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark HVI classification: per-sample predict() vs predict_batch()'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1000,
+            help='Number of synthetic samples (default: 1000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Repetitions per measurement, best is reported (default: 3)',
+        )
+
+    def handle(self, *args, **options):
+        if not hvi_classifier.model:
+            self.stdout.write(self.style.ERROR('❌ HVI models not loaded'))
+            return
+
+        rows = options['rows']
+        repeat = max(1, options['repeat'])
+        samples = make_samples(rows, [str(c) for c in hvi_classifier.color_encoder.classes_])
+
+        # Warm-up so one-off initialisation isn't measured
+        hvi_classifier.predict(samples[0])
+        hvi_classifier.predict_batch(samples[:10])
+
+        def best_of(fn):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn()
+                timings.append(time.perf_counter() - start)
+            return min(timings)
+
+        single = best_of(lambda: [hvi_classifier.predict(s) for s in samples])
+        batch = best_of(lambda: hvi_classifier.predict_batch(samples))
+
+        self.stdout.write(self.style.SUCCESS(f'HVI classification, {rows} rows (best of {repeat})'))
+        self.stdout.write(f'  predict() per row:  {single:8.3f} s  {rows / single:12,.0f} rows/s')
+        self.stdout.write(f'  predict_batch():    {batch:8.3f} s  {rows / batch:12,.0f} rows/s')
+        self.stdout.write(self.style.SUCCESS(f'  Speedup: {single / batch:.1f}x'))
+
+        # Single-sample latency (what one predict-quality request pays)
+        latencies = []
+        for sample in samples:
+            start = time.perf_counter()
+            hvi_classifier.predict(sample)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+        self.stdout.write(self.style.SUCCESS('\nSingle-sample predict() latency'))
+        self.stdout.write(f'  p50: {statistics.median(latencies):.3f} ms   p99: {p99:.3f} ms   '
+                          f'mean: {statistics.fmean(latencies):.3f} ms')
@@ -0,0 +1,74 @@
+"""
+Django management command to benchmark bulk telemetry ingestion
+Usage: python manage.py benchmark_telemetry --rows 10000 --machines 20
+"""
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from factory.models import Machine
+from factory.services import ingest_telemetry
+
+
+def make_records(machine_ids, n, seed=42):
+    """Synthetic sensor readings, one per second, spread over the machines"""
+    rng = random.Random(seed)
+    start = timezone.now() - timedelta(seconds=n)
+    return [{
+        'machine_id': rng.choice(machine_ids),
+        'timestamp': (start + timedelta(seconds=i)).isoformat(),
+        'temperature': round(rng.uniform(40, 90), 1),
+        'vibration': round(rng.uniform(0.05, 0.8), 3),
+        'humidity': round(rng.uniform(20, 70), 1),
+        'motor_load': round(rng.uniform(30, 100), 1),
+    } for i in range(n)]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ingest_telemetry (telemetry/bulk) throughput; changes are rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=10000,
+            help='Telemetry records per request (default: 10000)',
+        )
+        parser.add_argument(
+            '--machines',
+            type=int,
+            default=20,
+            help='Machines the records are spread over (default: 20)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Repetitions, best is reported (default: 3)',
+        )
+
+    def handle(self, *args, **options):
+        timings = []
+        for _ in range(max(1, options['repeat'])):
+            # Nothing is kept: machines and logs are rolled back after each run
+            with transaction.atomic():
+                machines = Machine.objects.bulk_create(
+                    [Machine(name=f'Bench-{i}') for i in range(options['machines'])]
+                )
+                records = make_records([m.pk for m in machines], options['rows'])
+
+                start = time.perf_counter()
+                created, updated, errors, alerts = ingest_telemetry(records)
+                timings.append(time.perf_counter() - start)
+
+                transaction.set_rollback(True)
+
+        best = min(timings)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {created} rows, {updated} machines updated, {len(alerts)} alerts, {len(errors)} errors"
+        ))
+        self.stdout.write(f"  best of {len(timings)}: {best:.3f} s  {created / best:,.0f} rows/s")
@@ -0,0 +1,122 @@
+"""
+Django management command to benchmark Computer Vision inference under concurrency
+Usage: python manage.py benchmark_vision --requests 256 --clients 1 8 32 [--synthetic-model]
+"""
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from factory.ml_service import vision_classifier
+
+
+def make_images(n, size=(640, 480), seed=42):
+    """Synthetic JPEG uploads (random noise, camera-like resolution)"""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(n):
+        pixels = rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format='JPEG', quality=85)
+        images.append(buffer.getvalue())
+    return images
+
+
+def build_synthetic_model(input_size):
+    """Small CNN with the production input/output shape (for trees without cotton_model.keras)"""
+    import tensorflow as tf
+
+    return tf.keras.Sequential([
+        tf.keras.layers.Input(shape=input_size + (3,)),
+        tf.keras.layers.Rescaling(1.0 / 255),
+        tf.keras.layers.Conv2D(16, 3, strides=2, activation='relu'),
+        tf.keras.layers.Conv2D(32, 3, strides=2, activation='relu'),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(1, activation='sigmoid'),
+    ])
+
+
+class Command(BaseCommand):
+    help = 'Benchmark CV inference: one model call per request vs micro-batched predict()'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=256,
+            help='Images classified per measurement (default: 256)',
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            nargs='+',
+            default=[1, 8, 32],
+            help='Concurrent client counts to measure (default: 1 8 32)',
+        )
+        parser.add_argument(
+            '--synthetic-model',
+            action='store_true',
+            help='Use a small random CNN instead of cotton_model.keras',
+        )
+
+    def handle(self, *args, **options):
+        if options['synthetic_model']:
+            vision_classifier.get().model = build_synthetic_model(vision_classifier.INPUT_SIZE)
+        if not vision_classifier.model:
+            self.stdout.write(self.style.ERROR(
+                '❌ Computer Vision model not loaded (use --synthetic-model to benchmark without it)'
+            ))
+            return
+
+        images = make_images(options['requests'])
+
+        def unbatched(image):
+            # Baseline: every request runs the model on its own
+            return vision_classifier.predict_arrays([vision_classifier.preprocess(image)])[0]
+
+        # Warm-up so graph tracing isn't measured
+        unbatched(images[0])
+        vision_classifier.predict(images[0])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"CV inference, {len(images)} images, batch size {vision_classifier.batcher.max_batch_size}, "
+            f"wait {vision_classifier.batcher.max_wait * 1000:.0f} ms"
+        ))
+        self.stdout.write(f"  {'mode':<10}{'clients':>8}{'img/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'avg batch':>11}")
+
+        for clients in options['clients']:
+            for mode, fn in (('single', unbatched), ('batched', vision_classifier.predict)):
+                batches_before = vision_classifier.batcher.batches
+                items_before = vision_classifier.batcher.items
+                throughput, p50, p99 = self.run(fn, images, clients)
+
+                if mode == 'batched':
+                    batches = vision_classifier.batcher.batches - batches_before
+                    items = vision_classifier.batcher.items - items_before
+                    avg_batch = f'{items / batches:.1f}' if batches else '-'
+                else:
+                    avg_batch = '1.0'
+                self.stdout.write(
+                    f'  {mode:<10}{clients:>8}{throughput:>10,.0f}{p50:>10.1f}{p99:>10.1f}{avg_batch:>11}'
+                )
+
+    @staticmethod
+    def run(fn, images, clients):
+        """Classify all images from `clients` threads; returns (images/s, p50 ms, p99 ms)"""
+        def timed(image):
+            start = time.perf_counter()
+            fn(image)
+            return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            latencies = sorted(pool.map(timed, images))
+        elapsed = time.perf_counter() - start
+
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        return len(images) / elapsed, statistics.median(latencies), p99
@@ -0,0 +1,56 @@
+"""
+Django management command to compact old machine telemetry into rollups
+Usage: python manage.py compact_telemetry --older-than-days 30 [--minute-retention-days 180]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from factory.telemetry import compact_telemetry
+
+
+class Command(BaseCommand):
+    help = 'Roll raw telemetry older than N days into 1-minute/1-hour summaries and delete it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=30,
+            help='Compact raw readings older than this many days (default: 30)',
+        )
+        parser.add_argument(
+            '--chunk-hours',
+            type=int,
+            default=6,
+            help='Hours of one machine compacted per transaction (default: 6)',
+        )
+        parser.add_argument(
+            '--minute-retention-days',
+            type=int,
+            default=None,
+            help='Also delete 1-minute rollups older than this (hour rollups are kept)',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        verbose = options['verbosity'] > 1
+
+        def progress(machine_id, chunk_start, rows):
+            if verbose and rows:
+                self.stdout.write(f'  machine {machine_id} {chunk_start:%Y-%m-%d %H:%M}: {rows} rows')
+
+        stats = compact_telemetry(
+            options['older_than_days'],
+            chunk_hours=options['chunk_hours'],
+            minute_retention_days=options['minute_retention_days'],
+            progress=progress,
+        )
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Compacted {stats['raw_rows']} raw rows of {stats['machines']} machines "
+            f"(before {stats['cutoff']:%Y-%m-%d %H:%M} UTC) in {elapsed:.1f}s"
+        ))
+        if options['minute_retention_days'] is not None:
+            self.stdout.write(f"🗑️  Deleted {stats['minute_rollups_deleted']} expired 1-minute rollups")
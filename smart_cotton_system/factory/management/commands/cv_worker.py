@@ -0,0 +1,79 @@
+"""
+Django management command to run the background CV analysis worker pool
+Usage: python manage.py cv_worker --workers 4 --batch-size 32 [--once] [--retry-failed]
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from factory.cv_jobs import CVWorkerPool, queue_stats
+from factory.models import CVAnalysisJob
+
+
+class Command(BaseCommand):
+    help = 'Process queued CottonBatch photo analysis jobs with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.CV_WORKERS,
+            help=f'Worker threads (default: {settings.CV_WORKERS})',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.CV_WORKER_BATCH_SIZE,
+            help=f'Photos per vision model call (default: {settings.CV_WORKER_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the current backlog and exit instead of running forever',
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Re-queue failed jobs before starting',
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            retried = CVAnalysisJob.objects.filter(status=CVAnalysisJob.FAILED).update(
+                status=CVAnalysisJob.PENDING, attempts=0, error=''
+            )
+            self.stdout.write(f'🔁 Re-queued {retried} failed jobs')
+
+        stats = queue_stats()
+        self.stdout.write(f"📥 Queue depth: {stats['queue_depth']}")
+
+        pool = CVWorkerPool(workers=options['workers'], batch_size=options['batch_size'])
+
+        if options['once']:
+            start = time.perf_counter()
+            handled = pool.drain()
+            elapsed = time.perf_counter() - start
+            stats = queue_stats()
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {handled} jobs handled in {elapsed:.1f}s, "
+                f"{stats['counts'][CVAnalysisJob.FAILED]} failed in total, "
+                f"per-image p50 {stats['image_latency_ms']['p50']} ms"
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🚀 CV worker pool: {options['workers']} workers x {options['batch_size']} photos (Ctrl+C to stop)"
+        ))
+        pool.start()
+        try:
+            while True:
+                time.sleep(60)
+                stats = queue_stats()
+                self.stdout.write(
+                    f"  queue {stats['queue_depth']}, per-image p50 {stats['image_latency_ms']['p50']} ms, "
+                    f"end-to-end p95 {stats['end_to_end_ms']['p95']} ms"
+                )
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping...')
+            pool.stop(timeout=30)
@@ -0,0 +1,122 @@
+"""
+Django management command to report import cost per app
+Usage: python manage.py import_time [--top 10]
+
+Runs a fresh interpreter with ``python -X importtime``, calls django.setup()
+and then imports each local app's urls (which pulls in views and services).
+Imports are attributed to the step that first triggered them, so shared
+dependencies are charged to the first app that needs them.
+"""
+import os
+import subprocess
+import sys
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+SECTION_MARKER = '@@section '
+
+CHILD_SCRIPT = """
+import importlib, os, sys
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+sys.stderr.write('@@section django.setup\\n')
+import django
+django.setup()
+for module in sys.argv[1:]:
+    sys.stderr.write('@@section ' + module + '\\n')
+    try:
+        importlib.import_module(module)
+    except ImportError:
+        pass
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Split ``-X importtime`` output into sections.
+
+    Returns:
+        list: [(section, total_us, [(cumulative_us, module), ...]), ...]
+        where the module list only contains top-level imports of the section.
+    """
+    sections = []
+    current = None
+    for line in stderr.splitlines():
+        if line.startswith(SECTION_MARKER):
+            current = [line[len(SECTION_MARKER):].strip(), 0, []]
+            sections.append(current)
+            continue
+        if current is None or not line.startswith('import time:'):
+            continue
+
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # header line
+
+        name = parts[2][1:]
+        if name.startswith(' '):
+            continue  # nested import, already included in its parent's cumulative time
+
+        cumulative = int(parts[1])
+        current[1] += cumulative
+        current[2].append((cumulative, name.strip()))
+
+    return [(name, total, sorted(modules, reverse=True)) for name, total, modules in sections]
+
+
+class Command(BaseCommand):
+    help = 'Report per-app import time (based on python -X importtime)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=5,
+            help='Number of heaviest imports to show per app (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        base_dir = str(settings.BASE_DIR)
+
+        modules = []
+        for app_config in apps.get_app_configs():
+            if not app_config.path.startswith(base_dir):
+                continue  # third-party / contrib app
+            for suffix in ('urls', 'views'):
+                if os.path.exists(os.path.join(app_config.path, f'{suffix}.py')):
+                    modules.append(f'{app_config.name}.{suffix}')
+                    break
+        modules.append(settings.ROOT_URLCONF)
+
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT, *modules],
+            cwd=base_dir,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            self.stdout.write(self.style.ERROR(result.stderr[-2000:]))
+            return
+
+        sections = parse_importtime(result.stderr)
+        grand_total = sum(total for _, total, _ in sections)
+
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS('  IMPORT TIME REPORT'))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+
+        for name, total, top_modules in sections:
+            self.stdout.write(f'\n{name:<40} {total / 1000:>10.1f} ms')
+            for cumulative, module in top_modules[:options['top']]:
+                self.stdout.write(f'    {module:<36} {cumulative / 1000:>10.1f} ms')
+
+        self.stdout.write(self.style.SUCCESS(f'\nTotal: {grand_total / 1000:.1f} ms'))
+
+        budget = getattr(settings, 'STARTUP_TIME_BUDGET', None)
+        setup_total = next((total for name, total, _ in sections if name == 'django.setup'), 0)
+        if budget is not None and setup_total / 1e6 > budget:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️ django.setup() imports take {setup_total / 1e6:.2f}s, over the {budget:.2f}s budget'
+            ))
@@ -0,0 +1,79 @@
+"""
+Django management command to re-grade historical cotton batches with the HVI model
+Usage: python manage.py regrade_batches --chunk-size 1000 [--only-ungraded] [--dry-run]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from factory.ml_service import hvi_classifier, HVI_FIELDS
+from factory.models import CottonBatch
+from factory.services import grade_batches
+
+
+class Command(BaseCommand):
+    help = 'Re-grade CottonBatch quality with the HVI XGBoost model in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Batches graded and written per chunk (default: 1000)',
+        )
+        parser.add_argument(
+            '--only-ungraded',
+            action='store_true',
+            help='Only grade batches without a quality class',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Grade but do not write results',
+        )
+
+    def handle(self, *args, **options):
+        if not hvi_classifier.model:
+            self.stdout.write(self.style.ERROR('❌ HVI models not loaded'))
+            return
+
+        chunk_size = options['chunk_size']
+
+        # Only batches with the full set of HVI parameters can be scored by the model
+        queryset = CottonBatch.objects.filter(**{f'{f}__isnull': False for f in HVI_FIELDS})
+        if options['only_ungraded']:
+            queryset = queryset.filter(quality_class__isnull=True)
+        queryset = queryset.order_by('pk')
+
+        total = queryset.count()
+        self.stdout.write(f'📊 Batches to grade: {total}')
+
+        processed = 0
+        graded_count = 0
+        error_count = 0
+        last_pk = 0
+        start = time.perf_counter()
+
+        # Keyset pagination: each chunk is an indexed range scan, no OFFSET
+        while True:
+            chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+
+            graded, errors = grade_batches(chunk, save=not options['dry_run'], fallback_to_rules=False)
+            processed += len(chunk)
+            graded_count += len(graded)
+            error_count += len(errors)
+
+            for error in errors[:5]:
+                self.stdout.write(self.style.WARNING(f"  {error['batch']}: {error['error']}"))
+
+            self.stdout.write(f'  ... {processed}/{total} processed')
+
+        elapsed = time.perf_counter() - start
+        rate = graded_count / elapsed if elapsed > 0 else 0
+        action = 'graded (dry run)' if options['dry_run'] else 'graded'
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {graded_count} batches {action} in {elapsed:.1f}s ({rate:,.0f}/s), {error_count} errors'
+        ))
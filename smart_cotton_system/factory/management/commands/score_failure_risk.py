@@ -0,0 +1,56 @@
+"""
+Django management command to score failure risk of all machines periodically
+Usage: python manage.py score_failure_risk --interval 60 [--once]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from factory.maintenance import ALERT_PROBABILITY, score_fleet
+from factory.ml_service import failure_predictor
+
+
+class Command(BaseCommand):
+    help = 'Score every machine with the failure model in one batch every interval'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Seconds between scoring runs (default: 60)',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=ALERT_PROBABILITY,
+            help=f'Risk (%%) that writes a MaintenanceLog prediction (default: {ALERT_PROBABILITY:.0f})',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Score once and exit',
+        )
+
+    def handle(self, *args, **options):
+        if failure_predictor.model is None:
+            self.stdout.write(self.style.ERROR("❌ Failure model not trained (run manage.py train_failure_model)"))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🚀 Scoring failure risk every {options['interval']}s (Ctrl+C to stop)"
+        ))
+        try:
+            while True:
+                started = time.monotonic()
+                stats = score_fleet(threshold=options['threshold'])
+                self.stdout.write(
+                    f"  {stats['machines']} machines, {stats['alerts']} alerts | load {stats['load_ms']} ms, "
+                    f"features {stats['features_ms']} ms, predict {stats['predict_ms']} ms, "
+                    f"write {stats['write_ms']} ms"
+                )
+                if options['once']:
+                    return
+                time.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping...')
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0012_cvanalysisjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='maintenancelog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+# Журнальные записи, которые telemetry/bulk создавал до появления MachineTelemetry
+SENSOR_LOG_DESCRIPTION = 'Auto-generated from sensor data'
+BATCH_SIZE = 5000
+
+# What is backfilled: the old telemetry_data endpoint charted every
+# MaintenanceLog row of a machine. In practice those are the dashboard
+# simulator's snapshots ("Simulated: ...", is_prediction=True) plus the
+# sensor logs above. Every sensor log is copied (0/0 included: it is a
+# reading) and then deleted. Of the other rows, those with a reading are
+# copied and stay in the journal with their descriptions and failure
+# probabilities; temperature and vibration both 0 there is the model
+# default, i.e. nothing was measured, so they are not copied.
+
+
+def _sensor_logs(MaintenanceLog):
+    return MaintenanceLog.objects.filter(description=SENSOR_LOG_DESCRIPTION, is_prediction=False)
+
+
+def _reading_logs(MaintenanceLog):
+    return MaintenanceLog.objects.exclude(temperature=0, vibration=0)
+
+
+def move_sensor_logs_to_telemetry(apps, schema_editor):
+    MaintenanceLog = apps.get_model('factory', 'MaintenanceLog')
+    MachineTelemetry = apps.get_model('factory', 'MachineTelemetry')
+
+    rows = (_sensor_logs(MaintenanceLog) | _reading_logs(MaintenanceLog)).values_list(
+        'machine_id', 'timestamp', 'temperature', 'vibration'
+    ).order_by('pk')
+
+    batch = []
+    for machine_id, timestamp, temperature, vibration in rows.iterator(chunk_size=BATCH_SIZE):
+        # humidity/motor_load в журнал не писались - остаются пустыми
+        batch.append(MachineTelemetry(machine_id=machine_id, timestamp=timestamp,
+                                      temperature=temperature, vibration=vibration))
+        if len(batch) >= BATCH_SIZE:
+            MachineTelemetry.objects.bulk_create(batch)
+            batch = []
+    MachineTelemetry.objects.bulk_create(batch)
+
+    _sensor_logs(MaintenanceLog).delete()
+
+
+def move_telemetry_to_sensor_logs(apps, schema_editor):
+    MaintenanceLog = apps.get_model('factory', 'MaintenanceLog')
+    MachineTelemetry = apps.get_model('factory', 'MachineTelemetry')
+
+    # Показания, чьи записи журнала остались на месте, второй раз не пишем
+    kept = set(_reading_logs(MaintenanceLog).values_list('machine_id', 'timestamp'))
+
+    rows = MachineTelemetry.objects.values_list('machine_id', 'timestamp', 'temperature', 'vibration').order_by('pk')
+    batch = []
+    for machine_id, timestamp, temperature, vibration in rows.iterator(chunk_size=BATCH_SIZE):
+        if (machine_id, timestamp) in kept:
+            continue
+        batch.append(MaintenanceLog(machine_id=machine_id, timestamp=timestamp,
+                                    description=SENSOR_LOG_DESCRIPTION,
+                                    temperature=temperature or 0, vibration=vibration or 0))
+        if len(batch) >= BATCH_SIZE:
+            MaintenanceLog.objects.bulk_create(batch)
+            batch = []
+    MaintenanceLog.objects.bulk_create(batch)
+
+
+def create_brin_index(apps, schema_editor):
+    # BRIN по времени на PostgreSQL: таблица пишется по порядку времени,
+    # индекс в сотни раз меньше B-tree и ускоряет выборки по диапазону дат
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS factory_machinetelemetry_ts_brin '
+            'ON factory_machinetelemetry USING brin ("timestamp")'
+        )
+
+
+def drop_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS factory_machinetelemetry_ts_brin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0013_maintenancelog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineTelemetry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('temperature', models.FloatField(blank=True, null=True, verbose_name='Температура (°C)')),
+                ('vibration', models.FloatField(blank=True, null=True, verbose_name='Вибрация')),
+                ('humidity', models.FloatField(blank=True, null=True, verbose_name='Влажность (%)')),
+                ('motor_load', models.FloatField(blank=True, null=True, verbose_name='Нагрузка мотора (%)')),
+                ('machine', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='telemetry', to='factory.machine', verbose_name='Станок')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['machine', 'timestamp'], name='factory_mac_machine_ac0660_idx')],
+            },
+        ),
+        migrations.RunPython(create_brin_index, drop_brin_index),
+        migrations.RunPython(move_sensor_logs_to_telemetry, move_telemetry_to_sensor_logs),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0014_machinetelemetry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineTelemetryHour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField(verbose_name='Начало интервала')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Показаний')),
+                ('temperature_count', models.PositiveIntegerField(default=0)),
+                ('temperature_min', models.FloatField(blank=True, null=True)),
+                ('temperature_max', models.FloatField(blank=True, null=True)),
+                ('temperature_mean', models.FloatField(blank=True, null=True)),
+                ('temperature_last', models.FloatField(blank=True, null=True)),
+                ('vibration_count', models.PositiveIntegerField(default=0)),
+                ('vibration_min', models.FloatField(blank=True, null=True)),
+                ('vibration_max', models.FloatField(blank=True, null=True)),
+                ('vibration_mean', models.FloatField(blank=True, null=True)),
+                ('vibration_last', models.FloatField(blank=True, null=True)),
+                ('humidity_count', models.PositiveIntegerField(default=0)),
+                ('humidity_min', models.FloatField(blank=True, null=True)),
+                ('humidity_max', models.FloatField(blank=True, null=True)),
+                ('humidity_mean', models.FloatField(blank=True, null=True)),
+                ('humidity_last', models.FloatField(blank=True, null=True)),
+                ('motor_load_count', models.PositiveIntegerField(default=0)),
+                ('motor_load_min', models.FloatField(blank=True, null=True)),
+                ('motor_load_max', models.FloatField(blank=True, null=True)),
+                ('motor_load_mean', models.FloatField(blank=True, null=True)),
+                ('motor_load_last', models.FloatField(blank=True, null=True)),
+                ('machine', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='factory.machine', verbose_name='Станок')),
+            ],
+            options={
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('machine', 'bucket_start'), name='machinetelemetryhour_machine_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MachineTelemetryMinute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField(verbose_name='Начало интервала')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Показаний')),
+                ('temperature_count', models.PositiveIntegerField(default=0)),
+                ('temperature_min', models.FloatField(blank=True, null=True)),
+                ('temperature_max', models.FloatField(blank=True, null=True)),
+                ('temperature_mean', models.FloatField(blank=True, null=True)),
+                ('temperature_last', models.FloatField(blank=True, null=True)),
+                ('vibration_count', models.PositiveIntegerField(default=0)),
+                ('vibration_min', models.FloatField(blank=True, null=True)),
+                ('vibration_max', models.FloatField(blank=True, null=True)),
+                ('vibration_mean', models.FloatField(blank=True, null=True)),
+                ('vibration_last', models.FloatField(blank=True, null=True)),
+                ('humidity_count', models.PositiveIntegerField(default=0)),
+                ('humidity_min', models.FloatField(blank=True, null=True)),
+                ('humidity_max', models.FloatField(blank=True, null=True)),
+                ('humidity_mean', models.FloatField(blank=True, null=True)),
+                ('humidity_last', models.FloatField(blank=True, null=True)),
+                ('motor_load_count', models.PositiveIntegerField(default=0)),
+                ('motor_load_min', models.FloatField(blank=True, null=True)),
+                ('motor_load_max', models.FloatField(blank=True, null=True)),
+                ('motor_load_mean', models.FloatField(blank=True, null=True)),
+                ('motor_load_last', models.FloatField(blank=True, null=True)),
+                ('machine', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='factory.machine', verbose_name='Станок')),
+            ],
+            options={
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('machine', 'bucket_start'), name='machinetelemetryminute_machine_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0015_telemetry_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineHealthState',
+            fields=[
+                ('machine', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='health_state', serialize=False, to='factory.machine', verbose_name='Станок')),
+                ('state', models.JSONField(default=dict)),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('last_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('alarm', models.BooleanField(default=False, verbose_name='Тревога')),
+                ('probability_failure', models.FloatField(default=0, verbose_name='Вероятность поломки (%)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
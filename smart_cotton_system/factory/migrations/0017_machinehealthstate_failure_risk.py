@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0016_machinehealthstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='machinehealthstate',
+            name='failure_risk',
+            field=models.FloatField(default=0, verbose_name='Риск отказа, модель (%)'),
+        ),
+        migrations.AddField(
+            model_name='machinehealthstate',
+            name='scored_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
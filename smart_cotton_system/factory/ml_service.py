@@ -3,18 +3,29 @@ ML Service for Cotton Quality Analysis
 Integrates HVI Classification, Computer Vision, and Seed Recommendation
 """
 
+import math
 import os
-import joblib
-import numpy as np
-import cv2
-from PIL import Image
+import threading
 from django.conf import settings
 import logging
+from .batching import MicroBatcher
 
 logger = logging.getLogger(__name__)
 
 # Model paths
 MODELS_DIR = os.path.join(settings.BASE_DIR, 'models')
+FAILURE_MODEL_PATH = os.path.join(MODELS_DIR, 'failure_model.pkl')
+
+# HVI input fields in the column order the scaler/XGBoost model were trained on
+HVI_NUMERIC_FIELDS = [
+    'micronaire', 'strength', 'length', 'uniformity',
+    'trash_grade', 'trash_cnt', 'trash_area', 'sfi', 'sci',
+]
+HVI_INTEGER_FIELDS = ('trash_grade', 'trash_cnt')
+HVI_FIELDS = HVI_NUMERIC_FIELDS + ['color_grade']
+
+# XGBoost class index -> quality class
+QUALITY_CLASSES = {0: 'Low Grade', 1: 'Premium', 2: 'Standard'}
 
 class HVIClassifier:
     """HVI Laboratory - Quality Classification from fiber parameters"""
@@ -23,16 +34,35 @@ class HVIClassifier:
         self.model = None
         self.scaler = None
         self.color_encoder = None
+        self.color_lookup = {}
+        self.scale = None
+        self.offset = None
         self.load_models()
     
     def load_models(self):
+        import joblib
+
         try:
             self.model = joblib.load(os.path.join(MODELS_DIR, 'cotton_xgboost_model.pkl'))
             self.scaler = joblib.load(os.path.join(MODELS_DIR, 'cotton_scaler.pkl'))
             self.color_encoder = joblib.load(os.path.join(MODELS_DIR, 'color_encoder.pkl'))
+            self._build_lookups()
             logger.info("HVI models loaded successfully")
         except Exception as e:
             logger.error(f"Error loading HVI models: {e}")
+
+    def _build_lookups(self):
+        """
+        Precompute per-request constants once at load time:
+        - color grade -> code dict (LabelEncoder codes are indices into classes_),
+          instead of LabelEncoder.transform sorting/searching on every call
+        - MinMaxScaler parameters, so scaling is a plain NumPy multiply-add
+        """
+        self.color_lookup = {str(c): i for i, c in enumerate(self.color_encoder.classes_)}
+
+        if hasattr(self.scaler, 'scale_') and hasattr(self.scaler, 'min_'):
+            self.scale = self.scaler.scale_.astype('float64')
+            self.offset = self.scaler.min_.astype('float64')
     
     def predict(self, data):
         """
@@ -63,63 +93,201 @@ class HVIClassifier:
             raise Exception("HVI models not loaded")
         
         try:
-            import pandas as pd
-            
-            # Prepare input data
-            input_df = pd.DataFrame([{
-                'Micronaire': data['micronaire'],
-                'Strength': data['strength'],
-                'Length': data['length'],
-                'Uniformity': data['uniformity'],
-                'Trash_Grade': data['trash_grade'],
-                'Trash_Cnt': data['trash_cnt'],
-                'Trash_Area': data['trash_area'],
-                'SFI': data['sfi'],
-                'SCI': data['sci'],
-                'Color_Grade': data['color_grade']
-            }])
-            
-            # Encode color grade - handle unknown labels
-            try:
-                input_df['Color_Grade'] = self.color_encoder.transform(input_df['Color_Grade'])
-            except ValueError:
-                # If color grade not in encoder, use the most common class (0 or mode)
-                logger.warning(f"Unknown color grade: {data['color_grade']}. Using default encoding.")
-                # Get available classes
+            import numpy as np
+
+            # Encode color grade with the lookup built at load time
+            color_code = self.color_lookup.get(str(data['color_grade']).strip())
+            if color_code is None:
+                logger.warning(f"Unknown color grade: {data['color_grade']}")
                 available_classes = list(self.color_encoder.classes_)
-                logger.info(f"Available color grades: {available_classes}")
-                # Use first class as default or raise informative error
                 raise ValueError(f"Color grade '{data['color_grade']}' not recognized. Available options: {', '.join(available_classes)}")
-            
-            # Scale features
-            input_scaled = self.scaler.transform(input_df)
-            
-            # Predict
-            prediction = self.model.predict(input_scaled)[0]
-            probabilities = self.model.predict_proba(input_scaled)[0]
-            
-            # Map classes
-            classes = {0: 'Low Grade', 1: 'Premium', 2: 'Standard'}
+
+            # Fixed-order feature vector (training column order)
+            features = np.array(
+                [[data[f] for f in HVI_NUMERIC_FIELDS] + [color_code]],
+                dtype=np.float64
+            )
+
+            # Scale and predict: class is the argmax of a single predict_proba
+            probabilities = self.model.predict_proba(self._scale(features))[0].tolist()
+            prediction = max(range(len(probabilities)), key=probabilities.__getitem__)
             
             return {
-                'quality_class': classes[prediction],
-                'confidence': float(probabilities[prediction]),
+                'quality_class': QUALITY_CLASSES[prediction],
+                'confidence': probabilities[prediction],
                 'probabilities': {
-                    'low_grade': float(probabilities[0]),
-                    'premium': float(probabilities[1]),
-                    'standard': float(probabilities[2])
+                    'low_grade': probabilities[0],
+                    'premium': probabilities[1],
+                    'standard': probabilities[2]
                 }
             }
         except Exception as e:
             logger.error(f"Error in HVI prediction: {e}")
             raise
 
+    def encode_batch(self, rows):
+        """
+        Validate HVI rows and encode the valid ones as a feature matrix
+
+        Args:
+            rows (list): dicts with the same keys as predict()
+
+        Returns:
+            tuple: (matrix, row_indices, errors) where matrix is an
+            (n_valid, 10) float array in training column order, row_indices
+            maps matrix rows back to input rows, and errors is a list of
+            {'row': int, 'error': str} for rejected rows.
+        """
+        import numpy as np
+
+        numeric = []
+        colors = []
+        row_indices = []
+        errors = []
+
+        for idx, row in enumerate(rows):
+            if not isinstance(row, dict):
+                errors.append({'row': idx, 'error': "Expected an object with HVI fields"})
+                continue
+
+            missing = [f for f in HVI_FIELDS if _is_blank(row.get(f))]
+            if missing:
+                errors.append({'row': idx, 'error': f"Missing required fields: {', '.join(missing)}"})
+                continue
+
+            try:
+                values = [float(row[f]) for f in HVI_NUMERIC_FIELDS]
+            except (TypeError, ValueError) as e:
+                errors.append({'row': idx, 'error': f"Invalid data type: {e}"})
+                continue
+
+            # float() accepts "nan"/"inf": not a measurement
+            non_finite = [f for f, v in zip(HVI_NUMERIC_FIELDS, values) if not math.isfinite(v)]
+            if non_finite:
+                errors.append({'row': idx, 'error': f"Fields must be finite numbers: {', '.join(non_finite)}"})
+                continue
+
+            # Counts/grades must be whole numbers: 2.5 is a data error, not 2
+            fractional = [
+                f for f, v in zip(HVI_NUMERIC_FIELDS, values)
+                if f in HVI_INTEGER_FIELDS and not v.is_integer()
+            ]
+            if fractional:
+                errors.append({'row': idx, 'error': f"Fields must be integers: {', '.join(fractional)}"})
+                continue
+
+            numeric.append(values)
+            colors.append(str(row['color_grade']).strip())
+            row_indices.append(idx)
+
+        matrix = np.empty((len(row_indices), len(HVI_FIELDS)), dtype=np.float64)
+        if not row_indices:
+            return matrix, row_indices, errors
+
+        matrix[:, :-1] = numeric
+
+        # Encode color grades through the lookup; unknown grades reject their row
+        codes = [self.color_lookup.get(c) for c in colors]
+        if None in codes:
+            available = ', '.join(self.color_encoder.classes_)
+            keep = []
+            for pos, code in enumerate(codes):
+                if code is None:
+                    errors.append({
+                        'row': row_indices[pos],
+                        'error': f"Color grade '{colors[pos]}' not recognized. Available options: {available}",
+                    })
+                else:
+                    keep.append(pos)
+            matrix = matrix[keep]
+            codes = [codes[pos] for pos in keep]
+            row_indices = [row_indices[pos] for pos in keep]
+
+        matrix[:, -1] = codes
+
+        errors.sort(key=lambda e: e['row'])
+        return matrix, row_indices, errors
+
+    def predict_batch(self, rows):
+        """
+        Classify many HVI samples with a single predict_proba call
+
+        Args:
+            rows (list): dicts with the same keys as predict()
+
+        Returns:
+            tuple: (results, errors) where results is a list of
+            {'row', 'quality_class', 'confidence', 'probabilities'} for valid
+            rows and errors is a list of {'row', 'error'}.
+        """
+        if not self.model:
+            raise Exception("HVI models not loaded")
+
+        matrix, row_indices, errors = self.encode_batch(rows)
+        if not row_indices:
+            return [], errors
+
+        scaled = self._scale(matrix)
+        probabilities = self.model.predict_proba(scaled)
+        predictions = probabilities.argmax(axis=1)
+
+        results = []
+        for row_idx, pred, proba in zip(row_indices, predictions.tolist(), probabilities.tolist()):
+            results.append({
+                'row': row_idx,
+                'quality_class': QUALITY_CLASSES[pred],
+                'confidence': proba[pred],
+                'probabilities': {
+                    'low_grade': proba[0],
+                    'premium': proba[1],
+                    'standard': proba[2]
+                }
+            })
+        return results, errors
+
+    def _scale(self, matrix):
+        """
+        Apply the fitted scaler to a plain NumPy matrix
+
+        Returns float32, the dtype XGBoost uses internally, so the model does
+        not have to convert the input again.
+        """
+        import numpy as np
+
+        if self.scale is None:
+            return self.scaler.transform(matrix).astype(np.float32)
+
+        # MinMaxScaler.transform is X * scale_ + min_; applying it directly
+        # avoids the DataFrame feature-name check on ndarray input
+        scaled = matrix * self.scale + self.offset
+        if getattr(self.scaler, 'clip', False):
+            lo, hi = self.scaler.feature_range
+            scaled = scaled.clip(lo, hi)
+        return scaled.astype(np.float32)
+
+
+def _is_blank(value):
+    """True for missing values, empty strings and NaN (empty spreadsheet cells)"""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    return isinstance(value, float) and value != value
+
 
 class CottonVisionClassifier:
     """Computer Vision - Clean/Dirty classification from images"""
+
+    INPUT_SIZE = (224, 224)
     
     def __init__(self):
         self.model = None
+        self.batcher = MicroBatcher(
+            self.predict_arrays,
+            max_batch_size=getattr(settings, 'VISION_BATCH_MAX_SIZE', 32),
+            max_wait_ms=getattr(settings, 'VISION_BATCH_WAIT_MS', 5),
+            name='vision-batcher',
+        )
         self.load_model()
     
     def load_model(self):
@@ -129,13 +297,64 @@ class CottonVisionClassifier:
             logger.info("Computer Vision model loaded successfully")
         except Exception as e:
             logger.error(f"Error loading CV model: {e}")
+
+    def preprocess(self, image):
+        """
+        Decode and resize one image to the model input
+
+        Args:
+            image: file path, raw bytes, or a file-like object (e.g. an
+                uploaded file) - decoded in memory, no temp file needed
+
+        Returns:
+            np.ndarray: (224, 224, 3) uint8 RGB array
+        """
+        import io
+        import cv2
+        import numpy as np
+        from PIL import Image
+
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            image = io.BytesIO(image)
+
+        rgb = np.asarray(Image.open(image).convert('RGB'))
+        return cv2.resize(rgb, self.INPUT_SIZE)
+
+    def predict_arrays(self, arrays):
+        """Run the model once on a list of preprocessed images"""
+        import numpy as np
+
+        if not self.model:
+            raise Exception("Computer Vision model not loaded")
+
+        # predict_on_batch skips Model.predict's per-call data pipeline setup
+        scores = np.asarray(self.model.predict_on_batch(np.stack(arrays)))
+        return [self._interpret(float(score)) for score in scores.reshape(len(arrays), -1)[:, 0]]
+
+    @staticmethod
+    def _interpret(score):
+        # Interpret results (0=Clean, 1=Dirty)
+        if score > 0.5:
+            label = "Dirty"
+            confidence = score
+        else:
+            label = "Clean"
+            confidence = 1 - score
+
+        return {
+            'label': label,
+            'confidence': confidence,
+            'score': score
+        }
     
-    def predict(self, image_path):
+    def predict(self, image):
         """
         Predict if cotton is clean or dirty from image
+
+        Concurrent calls are micro-batched into a single model call.
         
         Args:
-            image_path (str): Path to cotton image
+            image: path to cotton image, raw image bytes or file-like object
         
         Returns:
             dict: {
@@ -148,121 +367,240 @@ class CottonVisionClassifier:
             raise Exception("Computer Vision model not loaded")
         
         try:
-            # Load and preprocess image
-            image = Image.open(image_path).convert('RGB')
-            img_array = np.array(image)
-            img_resized = cv2.resize(img_array, (224, 224))
-            img_batch = np.expand_dims(img_resized, 0)
-            
-            # Predict
-            prediction = self.model.predict(img_batch)
-            score = float(prediction[0][0])
-            
-            # Interpret results (0=Clean, 1=Dirty)
-            if score > 0.5:
-                label = "Dirty"
-                confidence = score
-            else:
-                label = "Clean"
-                confidence = 1 - score
-            
-            return {
-                'label': label,
-                'confidence': confidence,
-                'score': score
-            }
+            return self.batcher(self.preprocess(image))
         except Exception as e:
             logger.error(f"Error in CV prediction: {e}")
             raise
 
+    def predict_many(self, images):
+        """
+        Classify several images with batched model calls
+
+        Returns:
+            list: per image, either a predict() result dict or {'error': str}
+            for images that could not be decoded
+        """
+        if not self.model:
+            raise Exception("Computer Vision model not loaded")
+
+        results = [None] * len(images)
+        arrays = []
+        positions = []
+        for idx, image in enumerate(images):
+            try:
+                arrays.append(self.preprocess(image))
+                positions.append(idx)
+            except Exception as e:
+                results[idx] = {'error': f"Cannot decode image: {e}"}
+
+        step = self.batcher.max_batch_size
+        for offset in range(0, len(arrays), step):
+            chunk = self.predict_arrays(arrays[offset:offset + step])
+            for idx, result in zip(positions[offset:offset + step], chunk):
+                results[idx] = result
+        return results
+
 
 class SeedRecommender:
     """Seed Recommendation - Yield and quality prediction"""
+
+    # Variety information
+    VARIETIES_INFO = {
+        'PHY 485WRF': {'type': 'Upland', 'brand': 'PhytoGen (Corteva)'},
+        'DP 555 R/R': {'type': 'Upland', 'brand': 'DeltaPine (Monsanto)'},
+        'FM 960B2R': {'type': 'Upland', 'brand': 'FiberMax (Bayer)'},
+        'STV 4892 BR': {'type': 'Upland', 'brand': 'Stoneville'},
+        'DPL 445BR': {'type': 'Upland', 'brand': 'DeltaPine'},
+        'TAMCOT 22': {'type': 'Upland', 'brand': 'Tamcot (Texas A&M)'},
+        'COBALT': {'type': 'Pima', 'brand': 'Cobalt Pima (Premium)'},
+        'DP 340': {'type': 'Pima', 'brand': 'DeltaPine Pima'},
+        'PHY 800': {'type': 'Pima', 'brand': 'PhytoGen Pima'}
+    }
     
     def __init__(self):
         self.yield_model = None
         self.quality_model = None
         self.location_encoder = None
         self.variety_encoder = None
+        self.location_index = {}
+        self.yield_matrix = None
+        self.quality_matrix = None
+        self.score_matrix = None
         self.load_models()
     
     def load_models(self):
+        import joblib
+
         try:
             self.yield_model = joblib.load(os.path.join(MODELS_DIR, 'yield_model.pkl'))
             self.quality_model = joblib.load(os.path.join(MODELS_DIR, 'quality_model.pkl'))
             self.location_encoder = joblib.load(os.path.join(MODELS_DIR, 'loc_encoder.pkl'))
             self.variety_encoder = joblib.load(os.path.join(MODELS_DIR, 'var_encoder.pkl'))
+            self._build_matrix()
             logger.info("Seed recommendation models loaded successfully")
         except Exception as e:
             logger.error(f"Error loading seed models: {e}")
+
+    def _build_matrix(self):
+        """
+        Precompute yield/quality/score for every location x variety pair.
+
+        Both inputs are categorical (a few locations and varieties), so the
+        whole table costs one predict per model at load time; requests only
+        index into it. The table lives on this instance, so
+        seed_recommender.reload() after retraining rebuilds it.
+        """
+        import numpy as np
+
+        locations = self.location_encoder.classes_
+        varieties = self.variety_encoder.classes_
+
+        # LabelEncoder codes are positions in classes_
+        loc_codes, var_codes = np.meshgrid(
+            np.arange(len(locations)), np.arange(len(varieties)), indexing='ij'
+        )
+        grid = np.column_stack([loc_codes.ravel(), var_codes.ravel()])
+        shape = (len(locations), len(varieties))
+
+        self.yield_matrix = np.asarray(self.yield_model.predict(grid), dtype=float).reshape(shape)
+        self.quality_matrix = np.asarray(self.quality_model.predict(grid), dtype=float).reshape(shape)
+
+        # Calculate score
+        price_multiplier = np.array([
+            1.3 if self.VARIETIES_INFO.get(v, {}).get('type') == 'Pima' else 1.0 for v in varieties
+        ])
+        self.score_matrix = self.yield_matrix * price_multiplier + self.quality_matrix * 5
+        self.location_index = {loc: i for i, loc in enumerate(locations)}
     
-    def get_recommendations(self, location):
+    def get_recommendations(self, location, top_k=3):
         """
         Get top seed variety recommendations for a location
         
         Args:
             location (str): Farm location/region
+            top_k (int): number of varieties to return
         
         Returns:
             list: Top 3 recommendations with yield and quality predictions
         """
+        import numpy as np
+
         if not self.yield_model:
             raise Exception("Seed models not loaded")
-        
+
+        row = self.location_index.get(location)
+        if row is None:
+            raise ValueError(f"unknown location '{location}'")
+
+        scores = self.score_matrix[row]
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        results = []
+        for col in top:
+            variety = self.variety_encoder.classes_[col]
+            info = self.VARIETIES_INFO.get(variety, {'type': 'Other', 'brand': 'Local'})
+            results.append({
+                'variety': variety,
+                'type': info['type'],
+                'brand': info['brand'],
+                'predicted_yield': int(self.yield_matrix[row, col]),
+                'predicted_quality': round(float(self.quality_matrix[row, col]), 1),
+                'score': float(scores[col])
+            })
+        return results
+
+
+class FailurePredictor:
+    """Predictive maintenance - failure risk from windowed telemetry features"""
+
+    def __init__(self, path=FAILURE_MODEL_PATH):
+        self.path = path
+        self.model = None
+        self.feature_names = []
+        self.window = None
+        self.horizon = None
+        self.metrics = {}
+        self.load_models()
+
+    def load_models(self):
+        import joblib
+
         try:
-            # Variety information
-            varieties_info = {
-                'PHY 485WRF': {'type': 'Upland', 'brand': 'PhytoGen (Corteva)'},
-                'DP 555 R/R': {'type': 'Upland', 'brand': 'DeltaPine (Monsanto)'},
-                'FM 960B2R': {'type': 'Upland', 'brand': 'FiberMax (Bayer)'},
-                'STV 4892 BR': {'type': 'Upland', 'brand': 'Stoneville'},
-                'DPL 445BR': {'type': 'Upland', 'brand': 'DeltaPine'},
-                'TAMCOT 22': {'type': 'Upland', 'brand': 'Tamcot (Texas A&M)'},
-                'COBALT': {'type': 'Pima', 'brand': 'Cobalt Pima (Premium)'},
-                'DP 340': {'type': 'Pima', 'brand': 'DeltaPine Pima'},
-                'PHY 800': {'type': 'Pima', 'brand': 'PhytoGen Pima'}
-            }
-            
-            # Encode location
-            loc_code = self.location_encoder.transform([location])[0]
-            
-            # Get all varieties
-            all_varieties = self.variety_encoder.classes_
-            
-            results = []
-            for variety in all_varieties:
-                var_code = self.variety_encoder.transform([variety])[0]
-                
-                # Predict
-                pred_yield = self.yield_model.predict([[loc_code, var_code]])[0]
-                pred_quality = self.quality_model.predict([[loc_code, var_code]])[0]
-                
-                # Get variety info
-                info = varieties_info.get(variety, {'type': 'Other', 'brand': 'Local'})
-                
-                # Calculate score
-                price_multiplier = 1.3 if info['type'] == 'Pima' else 1.0
-                score = (pred_yield * price_multiplier) + (pred_quality * 5)
-                
-                results.append({
-                    'variety': variety,
-                    'type': info['type'],
-                    'brand': info['brand'],
-                    'predicted_yield': int(pred_yield),
-                    'predicted_quality': round(pred_quality, 1),
-                    'score': score
-                })
-            
-            # Sort by score and return top 3
-            results.sort(key=lambda x: x['score'], reverse=True)
-            return results[:3]
-            
+            # Written by factory.maintenance.train_failure_model
+            bundle = joblib.load(self.path)
+            self.model = bundle['model']
+            self.feature_names = bundle['feature_names']
+            self.window = bundle['window']
+            self.horizon = bundle['horizon']
+            self.metrics = bundle.get('metrics', {})
+            logger.info("Failure model loaded successfully")
         except Exception as e:
-            logger.error(f"Error in seed recommendation: {e}")
-            raise
+            logger.error(f"Error loading failure model: {e}")
+
+    def predict_proba(self, features):
+        """
+        Failure probability for a batch of feature rows
+
+        Args:
+            features: (N, len(feature_names)) array from maintenance.window_features
+
+        Returns:
+            ndarray: (N,) probability of a failure within `horizon` seconds
+        """
+        if not self.model:
+            raise Exception("Failure model not trained (run manage.py train_failure_model)")
+        return self.model.predict_proba(features)[:, 1]
+
+
+class LazyModel:
+    """
+    Proxy that constructs a model service on first use.
+
+    Importing this module must stay cheap: every manage.py command and worker
+    boot imports the URLconf, which imports the views and this module. The
+    wrapped service (and TensorFlow/XGBoost with it) is only loaded when an
+    attribute is first accessed.
+    """
+
+    def __init__(self, factory, name):
+        self._factory = factory
+        self._name = name
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        return self._instance is not None
+
+    def get(self):
+        """Return the wrapped service, loading it on the first call"""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    logger.info(f"Loading {self._name} model on first use")
+                    self._instance = self._factory()
+        return self._instance
+
+    def reload(self):
+        """Drop the current instance and load a fresh one (e.g. after retraining)"""
+        with self._lock:
+            self._instance = None
+        return self.get()
+
+    def __getattr__(self, item):
+        if item in ('_factory', '_name', '_instance', '_lock'):
+            raise AttributeError(item)
+        return getattr(self.get(), item)
+
+    def __repr__(self):
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f"<LazyModel {self._name} ({state})>"
 
 
-# Singleton instances
-hvi_classifier = HVIClassifier()
-vision_classifier = CottonVisionClassifier()
-seed_recommender = SeedRecommender()
+# Singleton instances (loaded lazily on first use)
+hvi_classifier = LazyModel(HVIClassifier, 'hvi')
+vision_classifier = LazyModel(CottonVisionClassifier, 'vision')
+seed_recommender = LazyModel(SeedRecommender, 'seed')
+failure_predictor = LazyModel(FailurePredictor, 'failure')
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 import uuid
 
 
@@ -76,12 +77,125 @@ class Machine(models.Model):
         return self.name
 
 
+class MachineTelemetry(models.Model):
+    """
+    Показания датчиков станка (time-series, только добавление).
+
+    Отдельно от MaintenanceLog: журнал - для событий обслуживания, а сюда
+    пишется поток телеметрии. Составной индекс (machine, timestamp)
+    обслуживает запросы "последние N показаний станка" и диапазоны времени.
+    """
+    # db_index=False: индекс (machine, timestamp) уже начинается с machine
+    machine = models.ForeignKey(Machine, on_delete=models.CASCADE, related_name='telemetry',
+                                db_index=False, verbose_name="Станок")
+    timestamp = models.DateTimeField(default=timezone.now)
+    temperature = models.FloatField(null=True, blank=True, verbose_name="Температура (°C)")
+    vibration = models.FloatField(null=True, blank=True, verbose_name="Вибрация")
+    humidity = models.FloatField(null=True, blank=True, verbose_name="Влажность (%)")
+    motor_load = models.FloatField(null=True, blank=True, verbose_name="Нагрузка мотора (%)")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['machine', 'timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.machine_id} @ {self.timestamp:%Y-%m-%d %H:%M:%S}"
+
+
+class TelemetryRollup(models.Model):
+    """
+    Сводка телеметрии станка за интервал (count/min/max/mean/last по каждому
+    датчику). Сырые показания старше N дней сжимаются в такие сводки
+    командой compact_telemetry, см. factory/telemetry.py.
+    """
+    # db_index=False: уникальный индекс (machine, bucket_start) начинается с machine
+    machine = models.ForeignKey(Machine, on_delete=models.CASCADE, related_name='+',
+                                db_index=False, verbose_name="Станок")
+    bucket_start = models.DateTimeField(verbose_name="Начало интервала")
+    count = models.PositiveIntegerField(default=0, verbose_name="Показаний")
+
+    # По каждому датчику: число непустых показаний (вес для среднего), min/max/mean/last
+    temperature_count = models.PositiveIntegerField(default=0)
+    temperature_min = models.FloatField(null=True, blank=True)
+    temperature_max = models.FloatField(null=True, blank=True)
+    temperature_mean = models.FloatField(null=True, blank=True)
+    temperature_last = models.FloatField(null=True, blank=True)
+
+    vibration_count = models.PositiveIntegerField(default=0)
+    vibration_min = models.FloatField(null=True, blank=True)
+    vibration_max = models.FloatField(null=True, blank=True)
+    vibration_mean = models.FloatField(null=True, blank=True)
+    vibration_last = models.FloatField(null=True, blank=True)
+
+    humidity_count = models.PositiveIntegerField(default=0)
+    humidity_min = models.FloatField(null=True, blank=True)
+    humidity_max = models.FloatField(null=True, blank=True)
+    humidity_mean = models.FloatField(null=True, blank=True)
+    humidity_last = models.FloatField(null=True, blank=True)
+
+    motor_load_count = models.PositiveIntegerField(default=0)
+    motor_load_min = models.FloatField(null=True, blank=True)
+    motor_load_max = models.FloatField(null=True, blank=True)
+    motor_load_mean = models.FloatField(null=True, blank=True)
+    motor_load_last = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+        constraints = [
+            models.UniqueConstraint(fields=['machine', 'bucket_start'], name='%(class)s_machine_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.machine_id} @ {self.bucket_start:%Y-%m-%d %H:%M} ({self.count})"
+
+
+class MachineTelemetryMinute(TelemetryRollup):
+    """Сводка телеметрии за 1 минуту"""
+    RESOLUTION = 60
+
+    class Meta(TelemetryRollup.Meta):
+        pass
+
+
+class MachineTelemetryHour(TelemetryRollup):
+    """Сводка телеметрии за 1 час"""
+    RESOLUTION = 3600
+
+    class Meta(TelemetryRollup.Meta):
+        pass
+
+
+class MachineHealthState(models.Model):
+    """
+    Состояние потокового детектора аномалий станка (factory/anomaly.py):
+    EWMA среднее/дисперсия, CUSUM и последнее значение по каждому датчику.
+    Размер не зависит от объема телеметрии - O(1) на станок.
+    """
+    machine = models.OneToOneField(Machine, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='health_state', verbose_name="Станок")
+    # {metric: [mean, var, cusum_hi, cusum_lo, last]}
+    state = models.JSONField(default=dict)
+    samples = models.PositiveIntegerField(default=0)
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    alarm = models.BooleanField(default=False, verbose_name="Тревога")
+    probability_failure = models.FloatField(default=0, verbose_name="Вероятность поломки (%)")
+    # Оценка модели предиктивного обслуживания (factory/maintenance.py)
+    failure_risk = models.FloatField(default=0, verbose_name="Риск отказа, модель (%)")
+    scored_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Health {self.machine_id}: {self.probability_failure:.0f}%{' ALARM' if self.alarm else ''}"
+
+
 class MaintenanceLog(models.Model):
     """
     Журнал. Сюда пишет AI, если предсказывает поломку.
     """
     machine = models.ForeignKey(Machine, on_delete=models.CASCADE, verbose_name="Станок")
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # default, а не auto_now_add: телеметрия пишется с временем датчика
+    timestamp = models.DateTimeField(default=timezone.now)
     description = models.TextField(verbose_name="Описание проблемы")
     temperature = models.FloatField(default=0, verbose_name="Температура (°C)")
     vibration = models.FloatField(default=0, verbose_name="Вибрация")
@@ -90,4 +204,40 @@ class MaintenanceLog(models.Model):
     probability_failure = models.FloatField(default=0, verbose_name="Вероятность поломки (%)")
 
     def __str__(self):
-        return f"LOG: {self.machine.name} - {self.description}"
\ No newline at end of file
+        return f"LOG: {self.machine.name} - {self.description}"
+
+class CVAnalysisJob(models.Model):
+    """
+    Очередь CV анализа фото партий. Задачу создает post_save сигнал,
+    выполняет пул воркеров (factory/cv_jobs.py) пачками через vision модель.
+    """
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    batch = models.ForeignKey(CottonBatch, on_delete=models.CASCADE, related_name='cv_jobs', verbose_name="Партия")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=64, blank=True, default='', help_text="Воркер, взявший задачу")
+    error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Время обработки одного фото (декодирование + доля батча модели)
+    latency_ms = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"CV job {self.pk}: {self.batch_id} [{self.status}]"
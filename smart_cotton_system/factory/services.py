@@ -1,4 +1,9 @@
+import bisect
+import ipaddress
+import math
 import random
+import threading
+
 import requests  # <--- ВАЖНО: Добавлен импорт
 
 # ==========================================
@@ -75,42 +80,210 @@ def get_seed_recommendations(region_code, soil_ph=7.0):
 # ==========================================
 # 3. GEOIP ЛОГИКА (НОВОЕ!)
 # ==========================================
-def get_coords_by_ip(ip_address):
+DEMO_LOCATION = (40.8000, 68.6000, "South (Makhtaaral)")
+DEFAULT_LOCATION = (42.3176, 69.5901, "South (Default)")
+
+GEOIP_URL = 'http://ip-api.com/json/{ip}'
+# Адреса одной подсети (/24 для IPv4, /48 для IPv6) почти всегда в одном
+# месте, поэтому кэшируем по префиксу, а не по конкретному IP
+GEOIP_PREFIX_V4 = 24
+GEOIP_PREFIX_V6 = 48
+
+_geoip_cache = None
+_geoip_ranges = None
+_geoip_pending = set()
+_geoip_lock = threading.Lock()
+_geoip_executor = None
+
+
+def geoip_cache():
+    global _geoip_cache
+    if _geoip_cache is None:
+        from django.conf import settings
+        from .caching import TTLCache
+
+        _geoip_cache = TTLCache(
+            maxsize=getattr(settings, 'GEOIP_CACHE_SIZE', 10000),
+            ttl=getattr(settings, 'GEOIP_CACHE_TTL', 24 * 3600),
+            name='geoip',
+        )
+    return _geoip_cache
+
+
+def _geoip_key(ip):
+    """'10.1.2.3' -> '10.1.2.0/24'"""
+    prefix = GEOIP_PREFIX_V4 if ip.version == 4 else GEOIP_PREFIX_V6
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+
+def load_geoip_ranges(path=None):
     """
-    Определяет координаты по IP.
-    Если Localhost - возвращает Мактаарал (чтобы работало демо).
+    Офлайн таблица диапазонов IP (CSV: network,lat,lon,region), например
+    выгрузка сетей местных провайдеров; сети не должны пересекаться.
+    Возвращает отсортированный по началу
+    диапазона список (start, end, version, (lat, lon, region)) для bisect.
     """
-    # 1. Если это локальный комп разработчика
-    if ip_address in ['127.0.0.1', '::1', 'localhost']:
-        # Возвращаем координаты Мактаарала (Юг Казахстана)
-        print("🌍 Localhost detected -> Mocking South KZ")
-        return 40.8000, 68.6000, "South (Makhtaaral)"
+    import csv
+    import os
+    from django.conf import settings
+
+    path = path or getattr(settings, 'GEOIP_RANGES_FILE', None)
+    ranges = []
+    if not path or not os.path.exists(path):
+        return ranges
 
-    # 2. Если реальный IP - спрашиваем у бесплатного API
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                network = ipaddress.ip_network(row['network'].strip(), strict=False)
+                location = (float(row['lat']), float(row['lon']), row['region'].strip())
+            except (KeyError, ValueError, AttributeError) as e:
+                print(f"⚠️ GeoIP ranges: пропущена строка {row}: {e}")
+                continue
+            ranges.append((int(network.network_address), int(network.broadcast_address),
+                           network.version, location))
+    ranges.sort(key=lambda r: (r[2], r[0]))
+    return ranges
+
+
+def lookup_offline(ip):
+    """Координаты из офлайн таблицы или None"""
+    global _geoip_ranges
+    if _geoip_ranges is None:
+        _geoip_ranges = load_geoip_ranges()
+    if not _geoip_ranges:
+        return None
+
+    # Последний диапазон, начинающийся не позже адреса (диапазоны не пересекаются)
+    value = int(ip)
+    idx = bisect.bisect_right(_geoip_ranges, (ip.version, value), key=lambda r: (r[2], r[0]))
+    if idx:
+        start, end, version, location = _geoip_ranges[idx - 1]
+        if version == ip.version and start <= value <= end:
+            return location
+    return None
+
+
+def lookup_ip_api(ip_address, timeout=3):
+    """Запрос к ip-api.com; None если сервис не ответил или не знает адрес"""
     try:
-        response = requests.get(f'http://ip-api.com/json/{ip_address}', timeout=3)
+        response = requests.get(GEOIP_URL.format(ip=ip_address), timeout=timeout)
         data = response.json()
         if data['status'] == 'success':
             return data['lat'], data['lon'], data['regionName']
     except Exception as e:
         print(f"⚠️ GeoIP Error: {e}")
+    return None
 
-    # 3. Если всё сломалось - дефолт (Юг)
-    return 42.3176, 69.5901, "South (Default)"
 
+def _resolve_in_background(key, ip_address):
+    """Внешний запрос в фоне: страница не ждет, результат попадет в кэш"""
+    global _geoip_executor
+    from django.conf import settings
 
-# ==========================================
-# 4. АГРОНОМИЯ (Обновленная)
-# ==========================================
-def get_agronomy_data(lat, lon):
+    with _geoip_lock:
+        if key in _geoip_pending:
+            return
+        _geoip_pending.add(key)
+        if _geoip_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _geoip_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='geoip')
+
+    def run():
+        try:
+            location = lookup_ip_api(ip_address, timeout=getattr(settings, 'GEOIP_LOOKUP_TIMEOUT', 3))
+            if location:
+                geoip_cache().set(key, location)
+            else:
+                # Сервис недоступен - не дергаем его на каждой загрузке страницы
+                geoip_cache().set(key, DEFAULT_LOCATION, ttl=getattr(settings, 'GEOIP_FAILURE_TTL', 300))
+        finally:
+            with _geoip_lock:
+                _geoip_pending.discard(key)
+
+    _geoip_executor.submit(run)
+
+
+def get_coords_by_ip(ip_address, wait=False):
     """
-    Генерирует погоду по координатам.
+    Определяет координаты по IP.
+    Если Localhost - возвращает Мактаарал (чтобы работало демо).
+
+    Порядок: кэш (LRU + TTL по подсети) -> офлайн таблица диапазонов ->
+    ip-api.com. Внешний запрос по умолчанию уходит в фон, а ответ сразу
+    получает дефолт (Юг); следующая загрузка страницы возьмет его из кэша.
+    wait=True - дождаться ответа сервиса (скрипты, отладка).
     """
+    # 1. Если это локальный комп разработчика
+    if ip_address in ['127.0.0.1', '::1', 'localhost']:
+        # Возвращаем координаты Мактаарала (Юг Казахстана)
+        return DEMO_LOCATION
+
     try:
-        lat_val = float(lat)
-    except:
-        lat_val = 42.0
+        ip = ipaddress.ip_address(str(ip_address).strip())
+    except ValueError:
+        return DEFAULT_LOCATION
+    if ip.is_loopback:
+        return DEMO_LOCATION
+    if ip.is_private or ip.is_reserved or ip.is_link_local or ip.is_multicast:
+        # ip-api такие адреса не знает
+        return lookup_offline(ip) or DEFAULT_LOCATION
 
+    # 2. Кэш по подсети
+    cache = geoip_cache()
+    key = _geoip_key(ip)
+    location = cache.get(key)
+    if location is not None:
+        return location
+
+    # 3. Офлайн таблица диапазонов
+    location = lookup_offline(ip)
+    if location is not None:
+        cache.set(key, location)
+        return location
+
+    # 4. Бесплатный API
+    if wait:
+        location = lookup_ip_api(str(ip))
+        cache.set(key, location or DEFAULT_LOCATION)
+        return location or DEFAULT_LOCATION
+
+    _resolve_in_background(key, str(ip))
+
+    # 5. Пока ответа нет - дефолт (Юг)
+    return DEFAULT_LOCATION
+
+
+# ==========================================
+# 4. АГРОНОМИЯ (Обновленная)
+# ==========================================
+# Прогноз считается на ячейку сетки, а не на точку клика: соседние клики
+# получают один и тот же ответ из кэша
+AGRONOMY_GRID_DEG = 0.25
+
+_forecast_cache = None
+
+
+def forecast_cache():
+    global _forecast_cache
+    if _forecast_cache is None:
+        from django.conf import settings
+        from .caching import TTLCache
+
+        _forecast_cache = TTLCache(
+            maxsize=getattr(settings, 'AGRONOMY_FORECAST_CACHE_SIZE', 4096),
+            ttl=getattr(settings, 'AGRONOMY_FORECAST_TTL', 3600),
+            name='agronomy_forecast',
+        )
+    return _forecast_cache
+
+
+def grid_cell(lat, lon, step=AGRONOMY_GRID_DEG):
+    """Индексы ячейки сетки step x step градусов"""
+    return math.floor(lat / step), math.floor(lon / step)
+
+
+def _generate_agronomy_data(lat_val):
     # Если широта < 43, считаем Югом (Туркестанская область)
     is_south = lat_val < 43.0
 
@@ -139,6 +312,29 @@ def get_agronomy_data(lat, lon):
     }
 
 
+def get_agronomy_data(lat, lon):
+    """
+    Генерирует погоду по координатам.
+    Прогноз кэшируется на ячейку сетки AGRONOMY_GRID_DEG (общий dict -
+    не изменять).
+    """
+    try:
+        lat_val = float(lat)
+    except (TypeError, ValueError):
+        lat_val = 42.0
+    try:
+        lon_val = float(lon)
+    except (TypeError, ValueError):
+        lon_val = 69.0
+    if not (math.isfinite(lat_val) and math.isfinite(lon_val)):
+        lat_val, lon_val = 42.0, 69.0
+
+    # Сторона сетки совпадает с границей Юга (43°), так что ячейка целиком на одной стороне
+    cell = grid_cell(lat_val, lon_val)
+    cell_lat = cell[0] * AGRONOMY_GRID_DEG
+    return forecast_cache().get_or_set(cell, lambda: _generate_agronomy_data(cell_lat))
+
+
 # ==========================================
 # 5. СТАРЫЕ ФУНКЦИИ (Оставляем)
 # ==========================================
@@ -154,6 +350,157 @@ def analyze_machine_health(machine, temp, vibration, load):
     return min(risk_score, 100), ", ".join(issues) if issues else "Показатели в норме"
 
 
+# Показания датчиков в телеметрии (поля Machine с последними значениями)
+TELEMETRY_FIELDS = ('temperature', 'vibration', 'humidity', 'motor_load')
+
+
+def _parse_telemetry_timestamps(values, default):
+    """
+    ISO 8601 strings -> aware UTC timestamps, column-wise; empty or
+    unparseable values get `default`, naive ones are read in the default
+    time zone
+    """
+    import pandas as pd
+    from django.utils import timezone
+
+    text = values.where(values.notna(), '').astype(str).str.strip()
+    # Со смещением и без разбираем отдельно: в смешанной колонке pandas
+    # применяет смещение соседних строк к "наивным"
+    aware = text.str.contains(r'(?:Z|[+-]\d{2}:?\d{2})$', regex=True)
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns, UTC]')
+    if aware.any():
+        parsed[aware] = pd.to_datetime(text[aware], errors='coerce', utc=True, format='ISO8601')
+    naive = ~aware & (text != '')
+    if naive.any():
+        local = pd.to_datetime(text[naive], errors='coerce', format='ISO8601')
+        parsed[naive] = local.dt.tz_localize(
+            timezone.get_default_timezone(), ambiguous='NaT', nonexistent='NaT'
+        ).dt.tz_convert('UTC')
+    return parsed.fillna(pd.Timestamp(default).tz_convert('UTC'))
+
+
+# Machine uses a 32-bit AutoField
+MAX_MACHINE_ID = 2 ** 31 - 1
+
+
+def _validate_telemetry(records, now):
+    """
+    Column-wise validation of a telemetry batch
+
+    Returns:
+        tuple: (frame, errors) - frame indexed by row number with machine_id
+        (int), timestamp (UTC) and TELEMETRY_FIELDS (float, empty -> 0) for
+        the valid rows; errors is a list of (row, message)
+    """
+    import numpy as np
+    import pandas as pd
+
+    is_object = np.fromiter((isinstance(r, dict) for r in records), dtype=bool, count=len(records))
+    errors = [(int(idx), "expected an object") for idx in np.flatnonzero(~is_object)]
+    df = pd.DataFrame.from_records(
+        [r for r, ok in zip(records, is_object) if ok],
+        columns=['machine_id', 'timestamp', *TELEMETRY_FIELDS],
+    )
+    df.index = np.flatnonzero(is_object)
+
+    invalid = pd.Series(False, index=df.index)
+    messages = pd.Series('', index=df.index)
+
+    machine_ids = pd.to_numeric(df['machine_id'], errors='coerce')
+    # inf/1e30 не должны дойти до приведения к int64
+    bad = (~np.isfinite(machine_ids) | (machine_ids != machine_ids.round())
+           | (machine_ids.abs() > MAX_MACHINE_ID))
+    if bad.any():
+        messages[bad] = "invalid machine_id " + df['machine_id'][bad].map(repr).astype(str)
+        invalid |= bad
+
+    out = pd.DataFrame(index=df.index)
+    for field in TELEMETRY_FIELDS:
+        raw = df[field]
+        values = pd.to_numeric(raw, errors='coerce')
+        # Пустое значение -> 0, нечисловое -> ошибка строки
+        blank = raw.isna() | (raw == '')
+        bad = ((values.isna() & ~blank) | (values.notna() & ~np.isfinite(values))) & ~invalid
+        if bad.any():
+            messages[bad] = f"invalid {field} " + raw[bad].map(repr).astype(str)
+            invalid |= bad
+        out[field] = values.fillna(0.0)
+
+    out.insert(0, 'machine_id', machine_ids.where(~invalid, 0).astype('int64'))
+    out.insert(1, 'timestamp', _parse_telemetry_timestamps(df['timestamp'], now))
+
+    errors.extend(zip(messages.index[invalid].tolist(), messages[invalid].tolist()))
+    return out[~invalid], errors
+
+
+def ingest_telemetry(records, batch_size=1000):
+    """
+    Запись пачки показаний датчиков одним набором запросов.
+
+    Пачка проверяется по колонкам (pandas), без цикла по строкам. Станки
+    загружаются одним in_bulk, показания пишутся в MachineTelemetry
+    через bulk_create, а
+    последние показания каждого станка (по самому свежему timestamp в
+    пачке) - одним upsert. Все в одной транзакции: ~3 запроса на
+    пачку вместо 3 на строку. В той же транзакции пачка проходит через
+    потоковый детектор аномалий (factory.anomaly).
+
+    Args:
+        records: список {'machine_id', 'timestamp' (ISO 8601, необязательно),
+            'temperature', 'vibration', 'humidity', 'motor_load'}
+
+    Returns:
+        tuple: (created, machines_updated, errors, alerts) - errors это
+        список 'Row N: ...' для отклоненных строк, alerts - созданные
+        MaintenanceLog прогнозы
+    """
+    from django.db import transaction
+    from django.utils import timezone
+    from .anomaly import detect_anomalies
+    from .models import Machine, MachineTelemetry
+
+    # 1. Валидация всей пачки до обращения к базе
+    rows, errors = _validate_telemetry(records, timezone.now())
+
+    # 2. Все станки одним запросом
+    machines = Machine.objects.in_bulk(rows['machine_id'].unique().tolist()) if len(rows) else {}
+    unknown = ~rows['machine_id'].isin(list(machines))
+    errors.extend(
+        (idx, f"Machine {machine_id} not found")
+        for idx, machine_id in rows['machine_id'][unknown].items()
+    )
+    rows = rows[~unknown]
+
+    columns = [rows['machine_id'].tolist(), rows['timestamp'].array.to_pydatetime().tolist()]
+    columns += [rows[f].tolist() for f in TELEMETRY_FIELDS]
+    telemetry = [
+        MachineTelemetry(machine_id=machine_id, timestamp=timestamp, temperature=temperature,
+                         vibration=vibration, humidity=humidity, motor_load=motor_load)
+        for machine_id, timestamp, temperature, vibration, humidity, motor_load in zip(*columns)
+    ]
+
+    # 3. Последние показания - один раз на станок (при равном времени - последняя строка)
+    latest = rows.sort_values('timestamp', kind='stable').groupby('machine_id').tail(1)
+    updated = []
+    for machine_id, *values in latest[['machine_id', *TELEMETRY_FIELDS]].itertuples(index=False):
+        machine = machines[machine_id]
+        for field, value in zip(TELEMETRY_FIELDS, values):
+            setattr(machine, field, value)
+        updated.append(machine)
+
+    with transaction.atomic():
+        MachineTelemetry.objects.bulk_create(telemetry, batch_size=batch_size)
+        # Upsert instead of bulk_update: one INSERT .. ON CONFLICT rather than a CASE per row
+        Machine.objects.bulk_create(
+            updated, batch_size=batch_size, update_conflicts=True, unique_fields=['id'],
+            update_fields=TELEMETRY_FIELDS,
+        )
+        alerts = detect_anomalies(telemetry)
+
+    errors = [f"Row {idx}: {message}" for idx, message in sorted(errors)]
+    return len(telemetry), len(updated), errors, alerts
+
+
 def classify_hvi_quality(batch_instance):
     mic = batch_instance.micronaire
     strength = batch_instance.strength
@@ -165,6 +512,95 @@ def classify_hvi_quality(batch_instance):
         return "Standard (Средний) 🟡"
 
 
-def analyze_cotton_image(image_path):
-    conf = random.uniform(0.85, 0.99)
-    return ("Dirty (Грязный) 🍂", conf) if random.random() > 0.8 else ("Clean (Чистый) ✨", conf)
\ No newline at end of file
+# Классы XGBoost модели -> подписи, которые хранятся в CottonBatch.quality_class
+QUALITY_LABELS = {
+    'Premium': "Premium (Высший) 🟢",
+    'Standard': "Standard (Средний) 🟡",
+    'Low Grade': "Low Grade (Брак) 🔴",
+}
+
+
+def grade_batches(batches, save=True, fallback_to_rules=True, batch_size=500):
+    """
+    Оценка качества партий HVI моделью (XGBoost) одним векторным вызовом.
+
+    Партии с полным набором HVI параметров оцениваются моделью; если модель
+    не загружена или данных не хватает - используется classify_hvi_quality.
+    RECEIVED партии переводятся в ANALYZED (EXPORT_READY не откатываем).
+
+    Args:
+        batches: queryset или список CottonBatch
+        save (bool): записать quality_class/status через bulk_update
+            (False - только изменить объекты, например в pre_save сигнале)
+        fallback_to_rules (bool): оценивать правилом партии, которые модель
+            не смогла оценить (False - оставить их как есть)
+
+    Returns:
+        tuple: (graded, errors) - список оцененных партий и
+        список {'batch': batch_code, 'error': str}
+    """
+    from .ml_service import hvi_classifier, HVI_FIELDS
+    from .models import CottonBatch
+
+    batches = list(batches)
+    labels = {}
+    errors = []
+
+    if batches and hvi_classifier.model:
+        rows = [{f: getattr(b, f) for f in HVI_FIELDS} for b in batches]
+        try:
+            results, row_errors = hvi_classifier.predict_batch(rows)
+        except Exception as e:
+            print(f"⚠️ HVI model error, using rule-based grading: {e}")
+            results, row_errors = [], []
+
+        for result in results:
+            labels[result['row']] = QUALITY_LABELS[result['quality_class']]
+        for row_error in row_errors:
+            errors.append({'batch': batches[row_error['row']].batch_code, 'error': row_error['error']})
+
+    graded = []
+    for idx, batch in enumerate(batches):
+        label = labels.get(idx)
+        if label is None and fallback_to_rules and batch.micronaire and batch.strength:
+            label = classify_hvi_quality(batch)
+        if label is None:
+            continue
+
+        batch.quality_class = label
+        if batch.status == 'RECEIVED':
+            batch.status = 'ANALYZED'
+        graded.append(batch)
+
+    if save and graded:
+        CottonBatch.objects.bulk_update(graded, ['quality_class', 'status'], batch_size=batch_size)
+
+    return graded, errors
+
+
+# Классы CV модели -> подписи, которые хранятся в CottonBatch.cv_status
+CV_LABELS = {
+    'Clean': "Clean (Чистый) ✨",
+    'Dirty': "Dirty (Грязный) 🍂",
+}
+
+
+def classify_cotton_images(images):
+    """
+    Чистота хлопка по фото (CV модель) пачкой.
+
+    Args:
+        images: список путей, байтов или файловых объектов
+
+    Returns:
+        list: для каждого фото (label, confidence) или {'error': str}
+    """
+    from .ml_service import vision_classifier
+
+    results = []
+    for prediction in vision_classifier.predict_many(images):
+        if 'error' in prediction:
+            results.append(prediction)
+        else:
+            results.append((CV_LABELS[prediction['label']], prediction['confidence']))
+    return results
\ No newline at end of file
@@ -2,17 +2,15 @@ from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
 from .models import CottonBatch
 # Не забудьте импортировать функцию рекомендаций!
-from .services import classify_hvi_quality, analyze_cotton_image, get_seed_recommendations
+from .services import grade_batches, get_seed_recommendations
+from .cv_jobs import enqueue_cv_analysis
 
 
 @receiver(pre_save, sender=CottonBatch)
 def run_ai_analysis(sender, instance, **kwargs):
-    # 1. HVI АНАЛИЗ
+    # 1. HVI АНАЛИЗ (XGBoost; если HVI данных не хватает - правило)
     if instance.micronaire and instance.strength:
-        result = classify_hvi_quality(instance)
-        if result:
-            instance.quality_class = result
-            instance.status = 'ANALYZED'
+        grade_batches([instance], save=False)
 
     # 2. ПОДБОР СЕМЯН (Новое!)
     # Если указан регион, но еще нет рекомендаций
@@ -23,11 +21,7 @@ def run_ai_analysis(sender, instance, **kwargs):
 
 
 @receiver(post_save, sender=CottonBatch)
-def run_cv_analysis(sender, instance, created, **kwargs):
-    # 3. CV АНАЛИЗ (Фото)
+def queue_cv_analysis(sender, instance, created, **kwargs):
+    # 3. CV АНАЛИЗ (Фото) - в фоне: задача в очередь, результат запишет воркер (cv_jobs.py)
     if instance.cotton_image and not instance.cv_status:
-        label, conf = analyze_cotton_image(instance.cotton_image.path)
-        CottonBatch.objects.filter(pk=instance.pk).update(
-            cv_status=label,
-            cv_confidence=conf
-        )
\ No newline at end of file
+        enqueue_cv_analysis(instance)
@@ -0,0 +1,453 @@
+"""
+Downsampled telemetry queries and retention for dashboards.
+
+A chart is only a few hundred pixels wide, so weeks of per-second readings
+are reduced to a bounded number of points on the server:
+
+- bucket: the range is cut into equal time buckets and min/mean/max per
+  bucket are computed in SQL (GROUP BY), so only the aggregates leave the
+  database. Spikes stay visible through min/max.
+- lttb: Largest-Triangle-Three-Buckets picks real readings that preserve
+  the visual shape of one series (NumPy).
+
+Raw readings older than N days are compacted (compact_telemetry) into
+1-minute and 1-hour rollups and deleted. Queries read rollups for the
+compacted part of a range and raw rows for the rest, picking the coarsest
+resolution that is still finer than the requested bucket.
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Func, Max, Min, Sum
+from django.db.models.functions import Floor
+from django.utils import timezone
+
+from .services import TELEMETRY_FIELDS
+
+logger = logging.getLogger(__name__)
+
+MAX_POINTS = 5000
+# Added before flooring bucket numbers so float error can't push a reading
+# that sits exactly on a bucket boundary into the previous bucket
+BUCKET_EPSILON = 1e-6
+ROLLUP_STATS = ('count', 'min', 'max', 'mean', 'last')
+
+
+class Epoch(Func):
+    """Seconds since 1970-01-01 UTC of a datetime column"""
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template='EXTRACT(EPOCH FROM %(expressions)s)',
+                              **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # Django stores UTC datetimes as text; julianday() parses them. Its
+        # double is only good to ~10 us at today's dates: round to ms so that
+        # hour/minute-aligned rollups land exactly on bucket boundaries
+        return super().as_sql(compiler, connection,
+                              template='ROUND((julianday(%(expressions)s) - 2440587.5) * 86400.0, 3)',
+                              **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template='UNIX_TIMESTAMP(%(expressions)s)',
+                              **extra_context)
+
+
+def _floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(value):
+    floored = _floor_hour(value)
+    return floored if floored == value else floored + timedelta(hours=1)
+
+
+# ------------------------------------------------------------------
+# Sources: raw rows for recent data, rollups for compacted history
+# ------------------------------------------------------------------
+
+def compacted_until(machine):
+    """End of the compacted (rollup-only) history of a machine, or None"""
+    from .models import MachineTelemetryHour
+
+    last = (
+        MachineTelemetryHour.objects.filter(machine=machine)
+        .aggregate(last=Max('bucket_start'))['last']
+    )
+    return last + timedelta(seconds=MachineTelemetryHour.RESOLUTION) if last else None
+
+
+def plan_sources(machine, start, end, width):
+    """
+    Split [start, end) into (label, model, seg_start, seg_end) segments.
+
+    Raw rows after the compaction boundary; before it, 1-minute rollups
+    where they are still kept and the bucket is under an hour, else 1-hour
+    rollups. The switch from hour to minute rollups is on an hour boundary,
+    so no hour is read from both.
+    """
+    from .models import MachineTelemetry, MachineTelemetryHour, MachineTelemetryMinute
+
+    boundary = compacted_until(machine)
+    if boundary is None or boundary <= start:
+        return [('raw', MachineTelemetry, start, end)]
+
+    segments = []
+    history_end = min(end, boundary)
+
+    minute_from = history_end
+    if width < MachineTelemetryHour.RESOLUTION:
+        first_minute = (
+            MachineTelemetryMinute.objects.filter(machine=machine)
+            .aggregate(first=Min('bucket_start'))['first']
+        )
+        if first_minute is not None and first_minute < history_end:
+            # Час, минуты которого удалены частично, берем из часовой сводки
+            minute_from = min(max(start, _ceil_hour(first_minute)), history_end)
+
+    if start < minute_from:
+        segments.append(('1h', MachineTelemetryHour, start, minute_from))
+    if minute_from < history_end:
+        segments.append(('1m', MachineTelemetryMinute, minute_from, history_end))
+    if boundary < end:
+        segments.append(('raw', MachineTelemetry, boundary, end))
+    return segments
+
+
+# ------------------------------------------------------------------
+# Bucketed aggregates
+# ------------------------------------------------------------------
+
+def bucket_width(start, end, points):
+    """Bucket length in seconds so that [start, end) yields at most `points` buckets"""
+    return max((end - start).total_seconds() / points, 1.0)
+
+
+def _segment_buckets(model, machine, seg_start, seg_end, origin, width, fields):
+    """Per-bucket count and per-field min/max/sum/n for one source segment"""
+    from .models import MachineTelemetry
+
+    raw = model is MachineTelemetry
+    time_field = 'timestamp' if raw else 'bucket_start'
+
+    aggregates = {'n': Count('pk') if raw else Sum('count')}
+    for field in fields:
+        if raw:
+            aggregates[f'{field}_min'] = Min(field)
+            aggregates[f'{field}_max'] = Max(field)
+            aggregates[f'{field}_sum'] = Sum(field)
+            aggregates[f'{field}_n'] = Count(field)
+        else:
+            # Means are weighted by the readings behind each rollup
+            aggregates[f'{field}_min'] = Min(f'{field}_min')
+            aggregates[f'{field}_max'] = Max(f'{field}_max')
+            aggregates[f'{field}_sum'] = Sum(F(f'{field}_mean') * F(f'{field}_count'), output_field=FloatField())
+            aggregates[f'{field}_n'] = Sum(f'{field}_count')
+
+    return (
+        model.objects.filter(machine=machine, **{f'{time_field}__gte': seg_start, f'{time_field}__lt': seg_end})
+        .annotate(bucket=Floor((Epoch(time_field) - origin.timestamp()) / width + BUCKET_EPSILON))
+        .values('bucket')
+        .annotate(**aggregates)
+        .order_by('bucket')
+    )
+
+
+def bucketed(machine, start, end, points, fields=TELEMETRY_FIELDS):
+    """
+    Min/mean/max per time bucket, aggregated by the database.
+
+    Args:
+        machine: Machine (or pk)
+        start, end (datetime): aware datetimes, end exclusive
+
+    Returns:
+        dict: {'bucket_seconds', 'sources', 'timestamps', 'count',
+        <field>: {'min', 'mean', 'max'}} with one entry per non-empty
+        bucket, in time order
+    """
+    width = bucket_width(start, end, points)
+    segments = plan_sources(machine, start, end, width)
+
+    # A bucket can straddle two sources: combine the partial aggregates
+    buckets = {}
+    for _, model, seg_start, seg_end in segments:
+        for row in _segment_buckets(model, machine, seg_start, seg_end, start, width, fields):
+            bucket = buckets.setdefault(int(row['bucket']), {
+                'n': 0, **{f: {'min': None, 'max': None, 'sum': 0.0, 'n': 0} for f in fields}
+            })
+            bucket['n'] += row['n'] or 0
+            for field in fields:
+                acc = bucket[field]
+                for stat, pick in (('min', min), ('max', max)):
+                    value = row[f'{field}_{stat}']
+                    if value is not None:
+                        acc[stat] = value if acc[stat] is None else pick(acc[stat], value)
+                acc['sum'] += row[f'{field}_sum'] or 0.0
+                acc['n'] += row[f'{field}_n'] or 0
+
+    result = {
+        'bucket_seconds': width,
+        'sources': [{'source': label, 'start': s.isoformat(), 'end': e.isoformat()}
+                    for label, _, s, e in segments],
+        'timestamps': [],
+        'count': [],
+        **{field: {'min': [], 'mean': [], 'max': []} for field in fields},
+    }
+    for index in sorted(buckets):
+        bucket = buckets[index]
+        result['timestamps'].append((start + timedelta(seconds=index * width)).isoformat())
+        result['count'].append(bucket['n'])
+        for field in fields:
+            acc = bucket[field]
+            result[field]['min'].append(acc['min'])
+            result[field]['max'].append(acc['max'])
+            result[field]['mean'].append(float(acc['sum']) / acc['n'] if acc['n'] else None)
+    return result
+
+
+# ------------------------------------------------------------------
+# LTTB
+# ------------------------------------------------------------------
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last points and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    point kept from the previous bucket and the mean of the next bucket.
+
+    Args:
+        x, y: 1-D arrays (x ascending)
+        threshold (int): number of points to keep
+
+    Returns:
+        np.ndarray: indices of the kept points
+    """
+    import numpy as np
+
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Bucket i covers [edges[i], edges[i + 1]); first and last points stand alone
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(int) + 1
+    edges[-1] = n - 1
+
+    kept = np.empty(threshold, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[hi:next_hi].mean()
+        next_y = y[hi:next_hi].mean()
+
+        # Twice the triangle area, for every candidate in the bucket at once
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        a = lo + int(area.argmax())
+        kept[i + 1] = a
+    return kept
+
+
+def downsampled(machine, start, end, points, field='temperature', fields=TELEMETRY_FIELDS):
+    """
+    LTTB downsample of the readings, driven by one series.
+
+    The points are chosen to preserve the shape of `field`; all `fields`
+    are returned at those same readings so series stay aligned. Compacted
+    history contributes its rollup means (at the rollup start time).
+
+    Returns:
+        dict: {'sources', 'timestamps', 'source_points', <field>: [...]}
+    """
+    import numpy as np
+    from .models import MachineTelemetry
+
+    segments = plan_sources(machine, start, end, bucket_width(start, end, points))
+
+    rows = []
+    for _, model, seg_start, seg_end in segments:
+        if model is MachineTelemetry:
+            time_field, columns = 'timestamp', list(fields)
+        else:
+            time_field, columns = 'bucket_start', [f'{f}_mean' for f in fields]
+        driver = columns[list(fields).index(field)]
+
+        # Epoch seconds straight from SQL: no datetime object per raw reading
+        rows.extend(
+            model.objects.filter(machine=machine, **{
+                f'{time_field}__gte': seg_start, f'{time_field}__lt': seg_end, f'{driver}__isnull': False,
+            })
+            .annotate(epoch=Epoch(time_field))
+            .order_by(time_field)
+            .values_list('epoch', *columns)
+        )
+
+    result = {
+        'sources': [{'source': label, 'start': s.isoformat(), 'end': e.isoformat()}
+                    for label, _, s, e in segments],
+    }
+    if not rows:
+        return {**result, 'timestamps': [], 'source_points': 0, **{f: [] for f in fields}}
+
+    data = np.array(rows, dtype=float)  # None -> nan
+    x = data[:, 0]
+    kept = lttb(x, data[:, 1 + list(fields).index(field)], points)
+
+    result['timestamps'] = [datetime.fromtimestamp(round(x[i], 3), tz=dt_timezone.utc).isoformat() for i in kept]
+    result['source_points'] = len(rows)
+    for offset, name in enumerate(fields, start=1):
+        result[name] = [rows[i][offset] for i in kept]
+    return result
+
+
+# ------------------------------------------------------------------
+# Compaction
+# ------------------------------------------------------------------
+
+def _rollups(model, machine_id, frame, fields):
+    """Aggregate raw readings (DataFrame indexed by timestamp) into rollup rows"""
+    grouped = frame.groupby(frame.index.floor(f'{model.RESOLUTION}s'))
+    stats = grouped[list(fields)].agg(list(ROLLUP_STATS))
+    stats.columns = [f'{field}_{stat}' for field, stat in stats.columns]
+    stats = stats.astype(object).where(stats.notna(), None)
+    counts = grouped.size()
+
+    rollups = []
+    for bucket_start, values in zip(stats.index, stats.to_dict('records')):
+        for field in fields:
+            values[f'{field}_count'] = int(values[f'{field}_count'])
+        rollups.append(model(machine_id=machine_id, bucket_start=bucket_start.to_pydatetime(),
+                             count=int(counts[bucket_start]), **values))
+    return rollups
+
+
+def _merge_existing(model, machine_id, rollups, fields):
+    """
+    Fold in rollups already stored for the same buckets (readings that
+    arrived after their hour was compacted): counts add up, means are
+    weighted by count, `last` prefers the newly compacted readings.
+    """
+    existing = {
+        r.bucket_start: r for r in model.objects.filter(
+            machine_id=machine_id, bucket_start__in=[r.bucket_start for r in rollups]
+        )
+    }
+    for new in rollups:
+        old = existing.get(new.bucket_start)
+        if old is None:
+            continue
+        for field in fields:
+            pairs = {stat: (getattr(old, f'{field}_{stat}'), getattr(new, f'{field}_{stat}'))
+                     for stat in ROLLUP_STATS}
+            for stat, pick in (('min', min), ('max', max)):
+                values = [v for v in pairs[stat] if v is not None]
+                setattr(new, f'{field}_{stat}', pick(values) if values else None)
+            old_n, new_n = pairs['count']
+            old_mean, new_mean = pairs['mean']
+            if old_n and new_n:
+                setattr(new, f'{field}_mean', (old_mean * old_n + new_mean * new_n) / (old_n + new_n))
+            elif old_n:
+                setattr(new, f'{field}_mean', old_mean)
+            setattr(new, f'{field}_count', old_n + new_n)
+            if pairs['last'][1] is None:
+                setattr(new, f'{field}_last', pairs['last'][0])
+        new.count += old.count
+
+
+def compact_chunk(machine_id, chunk_start, chunk_end, fields=TELEMETRY_FIELDS):
+    """
+    Roll one machine's raw readings in [chunk_start, chunk_end) into minute
+    and hour rollups and delete them, in one short transaction.
+
+    chunk_start/chunk_end must be hour-aligned so no rollup spans two chunks.
+
+    Returns:
+        int: raw rows compacted
+    """
+    import pandas as pd
+    from .models import MachineTelemetry, MachineTelemetryHour, MachineTelemetryMinute
+
+    raw = MachineTelemetry.objects.filter(
+        machine_id=machine_id, timestamp__gte=chunk_start, timestamp__lt=chunk_end
+    )
+    rows = list(raw.order_by('timestamp').values_list('pk', 'timestamp', *fields))
+    if not rows:
+        return 0
+
+    frame = pd.DataFrame(rows, columns=['pk', 'timestamp', *fields]).set_index('timestamp')
+    update_fields = ['count'] + [f'{field}_{stat}' for field in fields for stat in ROLLUP_STATS]
+
+    with transaction.atomic():
+        for model in (MachineTelemetryMinute, MachineTelemetryHour):
+            rollups = _rollups(model, machine_id, frame, fields)
+            _merge_existing(model, machine_id, rollups, fields)
+            model.objects.bulk_create(
+                rollups, update_conflicts=True,
+                unique_fields=['machine', 'bucket_start'], update_fields=update_fields,
+            )
+        # pk bound: rows inserted after the read above are left for the next run
+        raw.filter(pk__lte=int(frame['pk'].max())).delete()
+    return len(rows)
+
+
+def compact_telemetry(older_than_days, chunk_hours=6, minute_retention_days=None,
+                      delete_batch=5000, progress=None):
+    """
+    Compact raw telemetry older than `older_than_days` into rollups.
+
+    Each machine is processed in hour-aligned chunks of `chunk_hours`; every
+    chunk (rollup upsert + raw delete) is its own transaction, so locks stay
+    short and an interrupted run resumes where it stopped.
+
+    Args:
+        minute_retention_days: also delete 1-minute rollups older than this
+            (hour rollups are kept)
+        progress: optional callable(machine_id, chunk_start, rows)
+
+    Returns:
+        dict: {'cutoff', 'machines', 'raw_rows', 'minute_rollups_deleted'}
+    """
+    from .models import MachineTelemetry, MachineTelemetryMinute
+
+    cutoff = _floor_hour(timezone.now() - timedelta(days=older_than_days))
+    chunk = timedelta(hours=chunk_hours)
+    stats = {'cutoff': cutoff, 'machines': 0, 'raw_rows': 0, 'minute_rollups_deleted': 0}
+
+    old = MachineTelemetry.objects.filter(timestamp__lt=cutoff)
+    for machine_id in old.values_list('machine_id', flat=True).distinct().order_by('machine_id'):
+        stats['machines'] += 1
+        machine_old = old.filter(machine_id=machine_id)
+        next_ts = machine_old.aggregate(first=Min('timestamp'))['first']
+
+        while next_ts is not None:
+            chunk_start = _floor_hour(next_ts)
+            chunk_end = min(chunk_start + chunk, cutoff)
+            rows = compact_chunk(machine_id, chunk_start, chunk_end)
+            stats['raw_rows'] += rows
+            if progress:
+                progress(machine_id, chunk_start, rows)
+            # Skip gaps in the data instead of walking empty chunks
+            next_ts = machine_old.filter(timestamp__gte=chunk_end).aggregate(first=Min('timestamp'))['first']
+
+    if minute_retention_days is not None:
+        # On an hour boundary: an hour keeps all of its minute rollups or none
+        horizon = _floor_hour(timezone.now() - timedelta(days=minute_retention_days))
+        expired = MachineTelemetryMinute.objects.filter(bucket_start__lt=horizon)
+        # Small DELETE statements, each committed on its own
+        while True:
+            pks = list(expired.values_list('pk', flat=True)[:delete_batch])
+            if not pks:
+                break
+            MachineTelemetryMinute.objects.filter(pk__in=pks).delete()
+            stats['minute_rollups_deleted'] += len(pks)
+
+    logger.info(f"Telemetry compaction up to {cutoff}: {stats['raw_rows']} raw rows, "
+                f"{stats['machines']} machines")
+    return stats
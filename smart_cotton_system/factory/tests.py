@@ -1,3 +1,180 @@
-from django.test import TestCase
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+
+def run_in_fresh_interpreter(script):
+    """Run a snippet in a new Python process (cold imports) and return its stdout"""
+    result = subprocess.run(
+        [sys.executable, '-c', script],
+        cwd=settings.BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    lines = result.stdout.strip().splitlines()
+    return lines[-1] if lines else ''
+
+
+class StartupBudgetTests(SimpleTestCase):
+    """Guards against heavy imports creeping back into worker boot"""
+
+    def test_django_setup_within_budget(self):
+        elapsed = float(run_in_fresh_interpreter(
+            "import os, time\n"
+            "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')\n"
+            "start = time.perf_counter()\n"
+            "import django\n"
+            "django.setup()\n"
+            "print(time.perf_counter() - start)\n"
+        ))
+        self.assertLess(
+            elapsed, settings.STARTUP_TIME_BUDGET,
+            f"django.setup() took {elapsed:.2f}s (budget {settings.STARTUP_TIME_BUDGET:.2f}s)"
+        )
+
+    def test_urlconf_does_not_import_ml_frameworks(self):
+        loaded = run_in_fresh_interpreter(
+            "import os, sys\n"
+            "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')\n"
+            "import django\n"
+            "django.setup()\n"
+            "import config.urls\n"
+            "heavy = ('tensorflow', 'keras', 'xgboost', 'yfinance', 'cv2', 'matplotlib')\n"
+            "print(','.join(m for m in heavy if m in sys.modules))\n"
+        )
+        self.assertEqual(loaded, '', f"Heavy modules imported at startup: {loaded}")
+
+
+class TelemetryRetentionTests(TestCase):
+    """Queries over compacted history must count every reading exactly once"""
+
+    NOW = datetime(2026, 1, 10, 11, 20, tzinfo=dt_timezone.utc)
+    FIRST = datetime(2026, 1, 8, 10, 0, tzinfo=dt_timezone.utc)
+    READINGS = 180  # one per minute, 10:00-13:00
+
+    def setUp(self):
+        from .models import Machine, MachineTelemetry
+
+        self.machine = Machine.objects.create(name='Джин 1')
+        MachineTelemetry.objects.bulk_create(
+            MachineTelemetry(machine=self.machine, timestamp=self.FIRST + timedelta(minutes=i),
+                             temperature=60.0, vibration=1.0, humidity=50.0, motor_load=60.0)
+            for i in range(self.READINGS)
+        )
+
+    def compact(self, **kwargs):
+        from .telemetry import compact_telemetry
+
+        with mock.patch('factory.telemetry.timezone.now', return_value=self.NOW):
+            return compact_telemetry(older_than_days=1, **kwargs)
+
+    def counted(self):
+        from .telemetry import bucketed
+
+        start = self.FIRST - timedelta(hours=1)
+        result = bucketed(self.machine, start, start + timedelta(hours=5), points=300)
+        return sum(result['count'])
+
+    def test_minute_retention_cut_on_hour_boundary(self):
+        from .models import MachineTelemetryMinute
+
+        # now - 2 days = 2026-01-08 11:20, in the middle of the data
+        stats = self.compact(minute_retention_days=2)
+
+        self.assertEqual(stats['raw_rows'], self.READINGS)
+        self.assertEqual(stats['minute_rollups_deleted'], 60)
+        first = MachineTelemetryMinute.objects.order_by('bucket_start').first().bucket_start
+        self.assertEqual(first, self.FIRST + timedelta(hours=1))
+        self.assertEqual(self.counted(), self.READINGS)
+
+    def test_window_spanning_partly_deleted_minutes(self):
+        from .models import MachineTelemetryMinute
+
+        self.compact()
+        # Minute rollups cut mid-hour (e.g. by an earlier retention run)
+        MachineTelemetryMinute.objects.filter(
+            bucket_start__lt=self.FIRST + timedelta(hours=1, minutes=20)
+        ).delete()
+
+        self.assertEqual(self.counted(), self.READINGS)
+
+
+class TelemetryValidationTests(TestCase):
+    """Non-finite numbers are row errors, not database errors"""
+
+    def setUp(self):
+        from .models import Machine
+
+        self.machine = Machine.objects.create(name='Джин 1')
+
+    def reading(self, **overrides):
+        return {'machine_id': self.machine.pk, 'temperature': 60.0, 'vibration': 1.0,
+                'humidity': 50.0, 'motor_load': 60.0, **overrides}
+
+    def test_non_finite_machine_id_rejected(self):
+        from .services import ingest_telemetry
+
+        records = [self.reading(machine_id='inf'), self.reading(machine_id=1e30), self.reading()]
+        created, _, errors, _ = ingest_telemetry(records)
+
+        self.assertEqual(created, 1)
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(errors[0].startswith('Row 0: invalid machine_id'))
+        self.assertTrue(errors[1].startswith('Row 1: invalid machine_id'))
+
+    def test_non_finite_reading_rejected(self):
+        from .models import MachineHealthState
+        from .services import ingest_telemetry
+
+        records = [self.reading(temperature='inf'), self.reading(vibration='nan'),
+                   self.reading(humidity='-Infinity'), self.reading()]
+        created, _, errors, _ = ingest_telemetry(records)
+
+        self.assertEqual(created, 1)
+        self.assertEqual([e.split(':')[0] for e in errors], ['Row 0', 'Row 1', 'Row 2'])
+        self.assertTrue(MachineHealthState.objects.filter(machine=self.machine).exists())
+
+
+class CVJobRetryTests(TestCase):
+    """A failing vision model re-queues jobs; FAILED is for bad images"""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from .models import CottonBatch, CVAnalysisJob
+
+        farmer = get_user_model().objects.create_user(username='farmer', password='x')
+        # region='' skips the seed recommender in the pre_save signal
+        with self.captureOnCommitCallbacks():
+            CottonBatch.objects.create(farmer=farmer, region='', cotton_image='cotton_images/a.jpg')
+        self.job = CVAnalysisJob.objects.get()
+
+    def run_once(self, ready=True, error=None):
+        from .cv_jobs import CVWorkerPool
+
+        with mock.patch('factory.cv_jobs.vision_model_ready', return_value=ready), \
+                mock.patch('factory.services.classify_cotton_images', side_effect=error):
+            handled = CVWorkerPool(workers=1).run_once()
+        self.job.refresh_from_db()
+        return handled
+
+    def test_jobs_not_claimed_without_model(self):
+        from .models import CVAnalysisJob
+
+        self.assertEqual(self.run_once(ready=False), 0)
+        self.assertEqual((self.job.status, self.job.attempts), (CVAnalysisJob.PENDING, 0))
+
+    @override_settings(CV_JOB_MAX_ATTEMPTS=2)
+    def test_model_error_requeues_until_attempts_used(self):
+        from .models import CVAnalysisJob
+
+        self.assertEqual(self.run_once(error=RuntimeError('model crashed')), 0)
+        self.assertEqual((self.job.status, self.job.attempts), (CVAnalysisJob.PENDING, 1))
+        self.assertEqual(self.job.error, 'model crashed')
+
+        self.assertEqual(self.run_once(error=RuntimeError('model crashed')), 1)
+        self.assertEqual((self.job.status, self.job.attempts), (CVAnalysisJob.FAILED, 2))
@@ -5,15 +5,21 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from .models import CottonBatch, Machine, MaintenanceLog
+from .models import CottonBatch, Machine, MachineTelemetry, MaintenanceLog
 from .serializers import CottonBatchSerializer, MachineSerializer, MaintenanceLogSerializer
 from users.permissions import IsLabOrReadOnly
-from .services import analyze_machine_health, get_agronomy_data, get_coords_by_ip
+from .services import analyze_machine_health, get_agronomy_data, get_coords_by_ip, ingest_telemetry
 from .ml_service import hvi_classifier, vision_classifier
 import logging
+import zipfile
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on samples per batch quality request
+HVI_BATCH_MAX_ROWS = 5000
+# Upper bound on images per analyze-images request
+VISION_MAX_IMAGES = 64
+
 class MachineViewSet(viewsets.ModelViewSet):
     queryset = Machine.objects.all()
     serializer_class = MachineSerializer
@@ -24,20 +30,25 @@ class MachineViewSet(viewsets.ModelViewSet):
         """Get telemetry data for a specific machine"""
         try:
             machine = Machine.objects.get(pk=pk)
-            logs = MaintenanceLog.objects.filter(machine=machine).order_by('-timestamp')[:100]
+            # Последние 100 показаний - range scan по индексу (machine, timestamp)
+            rows = list(
+                MachineTelemetry.objects.filter(machine=machine)
+                .order_by('-timestamp')
+                .values_list('timestamp', 'temperature', 'vibration', 'humidity', 'motor_load')[:100]
+            )
 
             telemetry = {
-                "timestamps": [log.timestamp.isoformat() for log in logs],
-                "temperatures": [float(log.temperature) if log.temperature else 0 for log in logs],
-                "vibrations": [float(log.vibration) if log.vibration else 0 for log in logs],
-                "humidities": [float(log.humidity) if log.humidity else 0 for log in logs],
-                "motor_loads": [float(log.motor_load) if hasattr(log, 'motor_load') and log.motor_load else 0 for log in logs],
+                "timestamps": [row[0].isoformat() for row in rows],
+                "temperatures": [row[1] or 0 for row in rows],
+                "vibrations": [row[2] or 0 for row in rows],
+                "humidities": [row[3] or 0 for row in rows],
+                "motor_loads": [row[4] or 0 for row in rows],
             }
 
             data = {
                 "machine": MachineSerializer(machine).data,
                 "telemetry": telemetry,
-                "count": len(logs)
+                "count": len(rows)
             }
             return Response(data)
             
@@ -46,12 +57,80 @@ class MachineViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=True, methods=['get'], url_path='telemetry/series')
+    def telemetry_series(self, request, pk=None):
+        """
+        Downsampled telemetry for charts
+
+        Query params:
+            start, end: ISO 8601 range (default: the last 24 hours)
+            points: target number of points (default 500, max 5000)
+            mode: 'bucket' - min/mean/max per time bucket, computed in SQL (default)
+                  'lttb'   - Largest-Triangle-Three-Buckets sample of raw readings
+            field: series that drives the LTTB selection (default: temperature)
+        """
+        from django.utils import timezone as tz
+        from django.utils.dateparse import parse_datetime
+        from datetime import timedelta
+        from .services import TELEMETRY_FIELDS
+        from .telemetry import MAX_POINTS, bucketed, downsampled
+
+        try:
+            machine = Machine.objects.get(pk=pk)
+        except Machine.DoesNotExist:
+            return Response({"error": "Machine not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        params = request.query_params
+        try:
+            end = parse_datetime(params['end']) if params.get('end') else tz.now()
+            start = parse_datetime(params['start']) if params.get('start') else end - timedelta(days=1)
+            if start is None or end is None:
+                raise ValueError("start/end must be ISO 8601 datetimes")
+            start = start if tz.is_aware(start) else tz.make_aware(start)
+            end = end if tz.is_aware(end) else tz.make_aware(end)
+            if start >= end:
+                raise ValueError("start must be before end")
+
+            points = int(params.get('points', 500))
+            if not 3 <= points <= MAX_POINTS:
+                raise ValueError(f"points must be between 3 and {MAX_POINTS}")
+
+            mode = params.get('mode', 'bucket')
+            field = params.get('field', 'temperature')
+            if mode not in ('bucket', 'lttb'):
+                raise ValueError("mode must be 'bucket' or 'lttb'")
+            if field not in TELEMETRY_FIELDS:
+                raise ValueError(f"field must be one of: {', '.join(TELEMETRY_FIELDS)}")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Compacted history is read from 1-minute / 1-hour rollups (see series['sources'])
+        if mode == 'bucket':
+            series = bucketed(machine, start, end, points)
+        else:
+            series = downsampled(machine, start, end, points, field=field)
+
+        return Response({
+            "machine": machine.pk,
+            "mode": mode,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "points": len(series['timestamps']),
+            "series": series
+        })
+
     @action(detail=False, methods=['post'], url_path='telemetry/bulk')
     def telemetry_bulk(self, request):
-        """Bulk create telemetry data for machines"""
-        from django.utils import timezone as tz
-        from datetime import datetime as dt
-        
+        """
+        Bulk create telemetry data for machines
+
+        Expected payload: a list of
+        {"machine_id": 1, "timestamp": "2025-12-07T10:00:00Z",
+         "temperature": 65.2, "vibration": 0.31, "humidity": 40, "motor_load": 72}
+
+        Valid rows are written in one transaction; invalid rows and unknown
+        machines are reported in "errors".
+        """
         payload = request.data
         
         if not isinstance(payload, list):
@@ -60,52 +139,16 @@ class MachineViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        created_count = 0
-        errors = []
-        
-        for idx, record in enumerate(payload):
-            try:
-                machine_id = record.get('machine_id')
-                machine = Machine.objects.get(pk=machine_id)
-                
-                # Parse timestamp
-                timestamp_str = record.get('timestamp')
-                if timestamp_str:
-                    try:
-                        log_timestamp = dt.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                    except:
-                        log_timestamp = tz.now()
-                else:
-                    log_timestamp = tz.now()
-                
-                # Create maintenance log entry
-                MaintenanceLog.objects.create(
-                    machine=machine,
-                    temperature=record.get('temperature', 0),
-                    vibration=record.get('vibration', 0),
-                    humidity=record.get('humidity', 0),
-                    motor_load=record.get('motor_load', 0),
-                    timestamp=log_timestamp,
-                    log_type='telemetry',
-                    notes='Auto-generated from sensor data'
-                )
-                
-                # Update machine's last readings
-                machine.last_temperature = record.get('temperature', 0)
-                machine.last_vibration = record.get('vibration', 0)
-                machine.last_humidity = record.get('humidity', 0)
-                machine.last_motor_load = record.get('motor_load', 0)
-                machine.save()
-                
-                created_count += 1
-                
-            except Machine.DoesNotExist:
-                errors.append(f"Row {idx}: Machine {machine_id} not found")
-            except Exception as e:
-                errors.append(f"Row {idx}: {str(e)}")
+        created_count, machines_updated, errors, alerts = ingest_telemetry(payload)
         
         return Response({
             "created": created_count,
+            "machines_updated": machines_updated,
+            "alerts": [
+                {"machine_id": log.machine_id, "timestamp": log.timestamp,
+                 "probability_failure": log.probability_failure, "description": log.description}
+                for log in alerts
+            ],
             "total": len(payload),
             "errors": errors[:10] if errors else None
         }, status=status.HTTP_200_OK)
@@ -186,6 +229,89 @@ class CottonBatchViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=False, methods=['post'], url_path='predict-quality/batch', permission_classes=[],
+            parser_classes=[JSONParser, MultiPartParser, FormParser])
+    def predict_quality_batch(self, request):
+        """
+        HVI Lab - Predict cotton quality for a whole HVI result sheet
+
+        Accepts either:
+        - JSON: a list of samples (same fields as predict-quality), or {"samples": [...]}
+        - multipart/form-data with a CSV or XLSX file in the 'file' field
+          (columns: Micronaire, Strength, Length, Uniformity, Trash_Grade,
+          Trash_Cnt, Trash_Area, SFI, SCI, Color_Grade - case-insensitive)
+
+        Valid rows are classified in a single model call; invalid rows are
+        reported in "errors" with their (0-based) row index.
+        """
+        try:
+            if 'file' in request.FILES:
+                try:
+                    rows = self._read_hvi_sheet(request.FILES['file'])
+                except (ValueError, zipfile.BadZipFile) as e:
+                    return Response(
+                        {"error": f"Invalid file: {str(e)}"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            else:
+                rows = request.data.get('samples') if isinstance(request.data, dict) else request.data
+
+            if not isinstance(rows, list):
+                return Response(
+                    {"error": "Expected a list of samples or a CSV/XLSX file in 'file' field"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            if len(rows) > HVI_BATCH_MAX_ROWS:
+                return Response(
+                    {"error": f"Too many rows: {len(rows)} (max {HVI_BATCH_MAX_ROWS})"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            results, errors = hvi_classifier.predict_batch(rows)
+
+            return Response({
+                "success": True,
+                "total": len(rows),
+                "classified": len(results),
+                "failed": len(errors),
+                "results": results,
+                "errors": errors
+            }, status=status.HTTP_200_OK)
+
+        except ValueError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error(f"Error in batch quality prediction: {e}")
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @staticmethod
+    def _read_hvi_sheet(uploaded_file):
+        """Read an uploaded CSV/XLSX HVI sheet into a list of row dicts"""
+        import pandas as pd
+
+        name = uploaded_file.name.lower()
+        # Только .xlsx: для старого .xls pandas нужен xlrd, которого нет в зависимостях
+        if name.endswith('.xlsx'):
+            df = pd.read_excel(uploaded_file, engine='openpyxl')
+        elif name.endswith('.csv'):
+            df = pd.read_csv(uploaded_file)
+        else:
+            raise ValueError("Unsupported file type, upload .csv or .xlsx")
+
+        # "Color Grade", "color-grade", "Color_Grade" -> "color_grade"
+        df.columns = (
+            df.columns.astype(str).str.strip().str.lower()
+            .str.replace(r'[\s\-]+', '_', regex=True)
+        )
+        return df.to_dict('records')
+
     @action(detail=False, methods=['post'], url_path='analyze-image', permission_classes=[], parser_classes=[MultiPartParser, FormParser])
     def analyze_image(self, request):
         """
@@ -201,32 +327,17 @@ class CottonBatchViewSet(viewsets.ModelViewSet):
                 )
             
             image_file = request.FILES['image']
-            
-            # Save temporarily
-            import tempfile
-            import os
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-                for chunk in image_file.chunks():
-                    tmp_file.write(chunk)
-                tmp_path = tmp_file.name
-            
-            try:
-                # Predict using CV model
-                result = vision_classifier.predict(tmp_path)
-                
-                return Response({
-                    "success": True,
-                    "label": result['label'],
-                    "confidence": result['confidence'],
-                    "score": result['score'],
-                    "filename": image_file.name
-                }, status=status.HTTP_200_OK)
-                
-            finally:
-                # Clean up temp file
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
+
+            # Decode in memory (no temp file); concurrent requests are micro-batched
+            result = vision_classifier.predict(image_file.read())
+
+            return Response({
+                "success": True,
+                "label": result['label'],
+                "confidence": result['confidence'],
+                "score": result['score'],
+                "filename": image_file.name
+            }, status=status.HTTP_200_OK)
             
         except Exception as e:
             logger.error(f"Error in image analysis: {e}")
@@ -235,6 +346,58 @@ class CottonBatchViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['post'], url_path='analyze-images', permission_classes=[], parser_classes=[MultiPartParser, FormParser])
+    def analyze_images(self, request):
+        """
+        Computer Vision - Analyze several cotton images in one request
+
+        Expected: multipart/form-data with one or more files in the 'images' field.
+        All images are classified in batched model calls.
+        """
+        try:
+            files = request.FILES.getlist('images')
+            if not files:
+                return Response(
+                    {"error": "No image files provided. Send images in 'images' field."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            if len(files) > VISION_MAX_IMAGES:
+                return Response(
+                    {"error": f"Too many images: {len(files)} (max {VISION_MAX_IMAGES})"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            predictions = vision_classifier.predict_many([f.read() for f in files])
+
+            results = []
+            for image_file, prediction in zip(files, predictions):
+                results.append({"filename": image_file.name, **prediction})
+
+            return Response({
+                "success": True,
+                "total": len(files),
+                "failed": sum(1 for r in results if 'error' in r),
+                "results": results
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.error(f"Error in batch image analysis: {e}")
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=False, methods=['get'], url_path='cv-queue', permission_classes=[])
+    def cv_queue(self, request):
+        """
+        Background CV analysis queue: depth, job counts by status and
+        per-image / end-to-end latency of recently analyzed photos.
+        """
+        from .cv_jobs import queue_stats
+
+        return Response(queue_stats(), status=status.HTTP_200_OK)
+
 class MaintenanceLogViewSet(viewsets.ModelViewSet):
     queryset = MaintenanceLog.objects.all().order_by('-timestamp')
     serializer_class = MaintenanceLogSerializer
@@ -274,4 +437,15 @@ def api_agronomy_predict(request):
     # 3. Получаем агрономический прогноз
     data = get_agronomy_data(lat, lon)
 
-    return JsonResponse(data)
\ No newline at end of file
+    return JsonResponse(data)
+
+
+def health_ready(request):
+    """
+    Readiness probe для балансировщика: 200 когда модели прогреты, иначе 503.
+    Отдает состояние и время загрузки/первого инференса по каждой модели.
+    """
+    from .warmup import readiness
+
+    data = readiness()
+    return JsonResponse(data, status=200 if data['ready'] else 503)
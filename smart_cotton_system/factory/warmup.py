@@ -0,0 +1,182 @@
+"""
+Model warm-up for ML-backed workers.
+
+Models are loaded lazily (see ml_service.LazyModel), so without warm-up the
+first request after a deploy would pay for model loading and the first
+inference (TensorFlow graph tracing, XGBoost/sklearn initialisation).
+start_warmup() is called from config/wsgi.py and config/asgi.py: it loads
+every model in a background thread and runs one dummy inference on each,
+while /health/ready/ reports progress so the load balancer only routes
+traffic to warm workers.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+def _warm_irrigation():
+    from agronomy.services import get_water_service
+
+    service = get_water_service()
+    if service.model is None:
+        raise FileNotFoundError("Irrigation model not trained (Irrigation_Model.pkl missing)")
+    return lambda: service.predict_humidity({
+        'soil_humidity': 30.0,
+        'soil_temperature': 20.0,
+        'daily_mean_temperature': 25.0,
+        'location_x': 0.0,
+        'location_y': 0.0,
+    })
+
+
+def _warm_hvi():
+    from .ml_service import hvi_classifier
+
+    if hvi_classifier.model is None:
+        raise FileNotFoundError("HVI models not loaded")
+    return lambda: hvi_classifier.predict({
+        'micronaire': 4.0,
+        'strength': 30.0,
+        'length': 1.12,
+        'uniformity': 83.0,
+        'trash_grade': 3,
+        'trash_cnt': 15,
+        'trash_area': 0.2,
+        'sfi': 9.0,
+        'sci': 130,
+        'color_grade': str(hvi_classifier.color_encoder.classes_[0]),
+    })
+
+
+def _warm_seed():
+    from .ml_service import seed_recommender
+
+    if seed_recommender.yield_model is None:
+        raise FileNotFoundError("Seed models not loaded")
+    location = seed_recommender.location_encoder.classes_[0]
+    return lambda: seed_recommender.get_recommendations(location)
+
+
+def _warm_vision():
+    import numpy as np
+    from .ml_service import vision_classifier
+
+    if vision_classifier.model is None:
+        raise FileNotFoundError("Computer Vision model not loaded")
+    dummy = np.zeros(vision_classifier.INPUT_SIZE + (3,), dtype=np.uint8)
+    return lambda: vision_classifier.predict_arrays([dummy])
+
+
+def _warm_finance():
+    import numpy as np
+    from finance.services import FinanceAIService
+
+    models = FinanceAIService().load_models()
+
+    def infer():
+        for model in models:
+            shape = [1 if dim is None else dim for dim in model.input_shape]
+            model.predict(np.zeros(shape, dtype=np.float32), verbose=0)
+
+    return infer
+
+
+# name -> loader; each loader loads the model and returns a dummy-inference callable
+WARMUP_MODELS = {
+    'irrigation': _warm_irrigation,
+    'hvi': _warm_hvi,
+    'seed': _warm_seed,
+    'vision': _warm_vision,
+    'finance': _warm_finance,
+}
+
+_state = {name: {'state': PENDING, 'load_ms': None, 'inference_ms': None, 'error': None}
+          for name in WARMUP_MODELS}
+_state_lock = threading.Lock()
+_thread = None
+
+
+def _update(name, **values):
+    with _state_lock:
+        _state[name].update(values)
+
+
+def warm_up_models():
+    """Load every registered model and run one dummy inference on each"""
+    for name, loader in WARMUP_MODELS.items():
+        _update(name, state=LOADING)
+        try:
+            start = time.perf_counter()
+            infer = loader()
+            loaded = time.perf_counter()
+            infer()
+            done = time.perf_counter()
+        except Exception as e:
+            logger.warning(f"Warm-up of {name} model failed: {e}")
+            _update(name, state=FAILED, error=str(e))
+            continue
+
+        _update(
+            name,
+            state=READY,
+            load_ms=round((loaded - start) * 1000, 1),
+            inference_ms=round((done - loaded) * 1000, 1),
+        )
+        logger.info(f"Warm-up of {name} model finished in {(done - start) * 1000:.0f} ms")
+
+
+def start_warmup():
+    """Start warm-up in a background thread (once per process, if enabled)"""
+    global _thread
+
+    if not getattr(settings, 'ML_WARMUP_ON_BOOT', True):
+        return None
+    with _state_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=warm_up_models, name='ml-warmup', daemon=True)
+            _thread.start()
+    return _thread
+
+
+def readiness():
+    """
+    Per-model warm-up state.
+
+    Returns:
+        dict: {
+            'status': 'warming' | 'ready' | 'degraded' | 'disabled',
+            'ready': bool,
+            'models': {name: {'state', 'load_ms', 'inference_ms', 'error'}}
+        }
+
+    A worker is ready once every model has finished warming up. Models that
+    failed to load (e.g. a model file that was never trained) make the status
+    'degraded' but do not block readiness: waiting would not fix them.
+    """
+    with _state_lock:
+        models = {name: dict(values) for name, values in _state.items()}
+        started = _thread is not None
+
+    if not started:
+        status = 'disabled'
+    elif any(m['state'] in (PENDING, LOADING) for m in models.values()):
+        status = 'warming'
+    elif any(m['state'] == FAILED for m in models.values()):
+        status = 'degraded'
+    else:
+        status = 'ready'
+
+    return {
+        'status': status,
+        'ready': status != 'warming',
+        'models': models,
+    }
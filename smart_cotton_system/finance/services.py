@@ -1,9 +1,8 @@
 import os
-import tensorflow as tf
+import threading
 from typing import Literal
 from datetime import date, timedelta
 from numpy import argmax
-from sklearn.preprocessing import MinMaxScaler
 import numpy as np
 import requests
 import pandas as pd
@@ -43,6 +42,27 @@ def get_best_model(metrics):
     return best_model_index, metrics[best_model_index]
 
 
+# Loaded Keras models keyed by file path, shared by all FinanceAIService instances
+_keras_models = {}
+_keras_models_lock = threading.Lock()
+
+
+def load_keras_model(path):
+    """Load a Keras model once per process and reuse it across requests"""
+    model = _keras_models.get(path)
+    if model is None:
+        with _keras_models_lock:
+            model = _keras_models.get(path)
+            if model is None:
+                # TensorFlow is imported on demand so the web process and
+                # manage.py commands don't pay for it at import time
+                import tensorflow as tf
+
+                model = tf.keras.models.load_model(path)
+                _keras_models[path] = model
+    return model
+
+
 class FinanceAIService:
     """Service for AI-based financial forecasting and recommendations"""
     
@@ -61,6 +81,12 @@ class FinanceAIService:
             self.best_lstm_model = 1
             self.best_blstm_model = 1
 
+    def load_models(self):
+        """Return the (LSTM, BiLSTM) pair used for forecasting"""
+        lstm_path = os.path.join(self.models_dir, f"lstm_{self.best_lstm_model}.keras")
+        blstm_path = os.path.join(self.models_dir, f"blstm_{self.best_blstm_model}.keras")
+        return load_keras_model(lstm_path), load_keras_model(blstm_path)
+
     def get_data(self, iso, start_date, end_date):
         """Fetch currency exchange rate data from Central Bank of Armenia API"""
         api_url = 'http://api.cba.am/exchangerates.asmx'
@@ -122,18 +148,16 @@ class FinanceAIService:
         if data is None:
             return None
             
+        from sklearn.preprocessing import MinMaxScaler
+
         data = data.reshape(-1, 1)
         
         scaler = MinMaxScaler(feature_range=(0, 1))
         data_scaled = scaler.fit_transform(data)
         
         try:
-            lstm_path = os.path.join(self.models_dir, f"lstm_{self.best_lstm_model}.keras")
-            blstm_path = os.path.join(self.models_dir, f"blstm_{self.best_blstm_model}.keras")
-            
-            lstm = tf.keras.models.load_model(lstm_path)
-            blstm = tf.keras.models.load_model(blstm_path)
-            
+            lstm, blstm = self.load_models()
+
             lstm_pred = lstm.predict(data_scaled, verbose=0)
             blstm_pred = blstm.predict(data_scaled, verbose=0)
             
@@ -0,0 +1,218 @@
+"""
+Persistent cache of weather archives and soil pH for the seed & yield app.
+
+Usage:
+    from geo_cache import GeoCache
+    cache = GeoCache()                       # SEED_APP_CACHE_DB, SEED_APP_GRID_DEG
+    df = cache.weather(lat, lon, fetch)      # fetch(lat, lon) -> DataFrame
+    ph = cache.soil_ph(lat, lon, fetch_ph)   # fetch_ph(lat, lon) -> float | None
+    cache.stats()
+
+Coordinates are snapped to a grid (GRID_DEG, ~5 km by default) and the
+data is fetched for the cell centre, so every point of a cell shares one
+entry. Entries live in one SQLite file (WAL mode), so they survive restarts
+and are shared by every Streamlit process and thread on the machine; within
+a process concurrent misses on one cell make a single request. The
+daily weather frame is stored column by column (NumPy .npz blob); hit and
+miss counters are kept in the same file.
+"""
+import io
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+CACHE_DB = os.getenv('SEED_APP_CACHE_DB', 'data/geo_cache.sqlite')
+GRID_DEG = float(os.getenv('SEED_APP_GRID_DEG', '0.05'))
+# pH не меняется, а неудачный запрос к SoilGrids повторяем через час
+SOIL_FAILURE_TTL = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS weather (
+    cell_lat INTEGER, cell_lon INTEGER, grid REAL, period TEXT,
+    fetched_at REAL, data BLOB,
+    PRIMARY KEY (cell_lat, cell_lon, grid, period)
+);
+CREATE TABLE IF NOT EXISTS soil (
+    cell_lat INTEGER, cell_lon INTEGER, grid REAL,
+    fetched_at REAL, ph REAL,
+    PRIMARY KEY (cell_lat, cell_lon, grid)
+);
+CREATE TABLE IF NOT EXISTS stats (
+    kind TEXT PRIMARY KEY, hits INTEGER NOT NULL DEFAULT 0, misses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def frame_to_blob(df):
+    """DataFrame -> .npz: one array per column, dates as int64 ns"""
+    columns = {}
+    for name in df.columns:
+        values = df[name]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            columns[f"dt__{name}"] = values.to_numpy(dtype='datetime64[ns]').astype('int64')
+        else:
+            columns[name] = values.to_numpy()
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **columns)
+    return buffer.getvalue()
+
+
+def blob_to_frame(blob):
+    with np.load(io.BytesIO(blob), allow_pickle=False) as data:
+        columns = {}
+        for key in data.files:
+            if key.startswith('dt__'):
+                columns[key[4:]] = pd.to_datetime(data[key], unit='ns')
+            else:
+                columns[key] = data[key]
+    return pd.DataFrame(columns)
+
+
+class GeoCache:
+    """
+    On-disk cache keyed by coordinates snapped to a grid.
+
+    Args:
+        path (str): SQLite file
+        grid (float): cell size in degrees
+        period (str): weather archive period; part of the key, so changing
+            the requested dates does not return stale frames
+    """
+
+    def __init__(self, path=CACHE_DB, grid=GRID_DEG, period=''):
+        self.path = path
+        self.grid = grid
+        self.period = period
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Новое соединение на вызов: sqlite3 соединения не делятся между потоками
+        conn = sqlite3.connect(self.path, timeout=30)
+        # В WAL режиме NORMAL не теряет целостность, но не делает fsync на каждый счетчик
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _key_lock(self, key):
+        """Один запрос к API на ячейку: остальные потоки ждут и читают его результат"""
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def cell(self, lat, lon):
+        """(индексы ячейки, координаты центра ячейки)"""
+        # round: 40.85 / 0.05 = 816.9999..., а должно попасть в ячейку 817
+        i = math.floor(round(float(lat) / self.grid, 9))
+        j = math.floor(round(float(lon) / self.grid, 9))
+        return (i, j), (round((i + 0.5) * self.grid, 6), round((j + 0.5) * self.grid, 6))
+
+    def _count(self, conn, kind, hit):
+        column = 'hits' if hit else 'misses'
+        conn.execute(
+            f"INSERT INTO stats (kind, {column}) VALUES (?, 1) "
+            f"ON CONFLICT(kind) DO UPDATE SET {column} = {column} + 1",
+            (kind,),
+        )
+
+    def _read_weather(self, key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data FROM weather WHERE cell_lat=? AND cell_lon=? AND grid=? AND period=?", key
+            ).fetchone()
+        return None if row is None else blob_to_frame(row[0])
+
+    def _read_soil(self, key):
+        """(найдено, pH)"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT ph, fetched_at FROM soil WHERE cell_lat=? AND cell_lon=? AND grid=?", key
+            ).fetchone()
+        if row is None or (row[0] is None and time.time() - row[1] >= SOIL_FAILURE_TTL):
+            return False, None
+        return True, row[0]
+
+    def _record(self, kind, hit):
+        with self._connect() as conn:
+            self._count(conn, kind, hit)
+
+    def weather(self, lat, lon, fetch):
+        """Погодный архив ячейки; fetch(lat, lon) вызывается для центра ячейки при промахе"""
+        (i, j), (c_lat, c_lon) = self.cell(lat, lon)
+        key = (i, j, self.grid, self.period)
+        df = self._read_weather(key)
+        if df is None:
+            with self._key_lock(('weather',) + key):
+                df = self._read_weather(key)
+                if df is None:
+                    self._record('weather', False)
+                    df = fetch(c_lat, c_lon)
+                    if df is not None and not df.empty:
+                        with self._connect() as conn:
+                            conn.execute(
+                                "INSERT OR REPLACE INTO weather VALUES (?, ?, ?, ?, ?, ?)",
+                                (*key, time.time(), frame_to_blob(df)),
+                            )
+                    return df
+        self._record('weather', True)
+        return df
+
+    def soil_ph(self, lat, lon, fetch):
+        """pH ячейки; None (ответа нет) тоже кэшируется, но на SOIL_FAILURE_TTL"""
+        (i, j), (c_lat, c_lon) = self.cell(lat, lon)
+        key = (i, j, self.grid)
+        found, ph = self._read_soil(key)
+        if not found:
+            with self._key_lock(('soil',) + key):
+                found, ph = self._read_soil(key)
+                if not found:
+                    self._record('soil', False)
+                    ph = fetch(c_lat, c_lon)
+                    with self._connect() as conn:
+                        conn.execute("INSERT OR REPLACE INTO soil VALUES (?, ?, ?, ?, ?)",
+                                     (*key, time.time(), ph))
+                    return ph
+        self._record('soil', True)
+        return ph
+
+    def stats(self):
+        """{kind: {hits, misses, hit_rate, entries}} по всем процессам с момента создания файла"""
+        with self._connect() as conn:
+            counters = {kind: (hits, misses) for kind, hits, misses in
+                        conn.execute("SELECT kind, hits, misses FROM stats")}
+            entries = {
+                'weather': conn.execute("SELECT COUNT(*) FROM weather").fetchone()[0],
+                'soil': conn.execute("SELECT COUNT(*) FROM soil").fetchone()[0],
+            }
+        report = {}
+        for kind in ('weather', 'soil'):
+            hits, misses = counters.get(kind, (0, 0))
+            total = hits + misses
+            report[kind] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / total, 3) if total else None,
+                'entries': entries[kind],
+            }
+        return report
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM weather")
+            conn.execute("DELETE FROM soil")
+            conn.execute("DELETE FROM stats")
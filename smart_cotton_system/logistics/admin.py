@@ -27,6 +27,7 @@ class DepotAdmin(admin.ModelAdmin):
 
 @admin.register(OptimizationJob)
 class OptimizationJobAdmin(admin.ModelAdmin):
-    list_display = ('id', 'depot', 'created_at', 'status')
-    list_filter = ('status', 'created_at')
-    readonly_fields = ('created_at', 'request_data', 'ors_request', 'ors_solution')
+    list_display = ('id', 'depot', 'solver', 'created_at', 'status', 'progress')
+    list_filter = ('status', 'solver', 'created_at')
+    search_fields = ('request_hash',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'request_hash', 'request_data', 'ors_request', 'ors_solution')
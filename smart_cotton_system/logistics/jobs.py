@@ -0,0 +1,176 @@
+"""
+Background execution of optimize requests.
+
+POST /api/logistics/optimize/ with "async": true (or ROUTE_OPTIMIZE_ASYNC)
+validates the request and checks feasibility in the web worker, stores a
+PENDING OptimizationJob and returns 202 with its id. The solve runs on a
+thread pool of the same process (ROUTE_JOB_WORKERS threads); the client
+polls GET optimize/jobs/<id>/ (status, progress) and fetches the solution
+from GET optimize/jobs/<id>/result/.
+
+A request that is already solved (result_cache.py) returns its DONE job at
+once, and one identical to a PENDING/RUNNING job returns that job instead of
+queueing a second solve. The queue is not persistent: a job lost in a
+restart is reported FAILED - a RUNNING one ROUTE_JOB_TIMEOUT seconds after it
+started, a PENDING one ROUTE_JOB_TIMEOUT seconds after it was created unless
+it is still waiting in this process's pool.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import result_cache
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 1.0   # seconds between progress writes to the database
+
+_executor = None
+_executor_lock = threading.Lock()
+_queued = set()          # ids of jobs submitted to this process's executor, until they finish
+_queued_lock = threading.Lock()
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ROUTE_JOB_WORKERS', 2),
+                thread_name_prefix='route-jobs',
+            )
+    return _executor
+
+
+def expire_stale(job):
+    """
+    Mark a job FAILED if it was lost: RUNNING for longer than
+    ROUTE_JOB_TIMEOUT, or PENDING for longer and not queued in this process
+    (a job waiting for a free worker here is not stale)
+    """
+    from .models import OptimizationJob
+
+    timeout = getattr(settings, 'ROUTE_JOB_TIMEOUT', 900)
+    limit = timezone.now() - timedelta(seconds=timeout)
+    if job.status == OptimizationJob.Status.RUNNING and (job.started_at or job.created_at) < limit:
+        result_cache.finish_job(job, {'error': f'Job did not finish within {timeout} s (server restarted?)'})
+    elif job.status == OptimizationJob.Status.PENDING and job.created_at < limit:
+        with _queued_lock:
+            if job.id in _queued:
+                return
+        result_cache.finish_job(job, {'error': f'Job was not started within {timeout} s (server restarted?)'})
+
+
+def job_status(job, include_result=False):
+    """
+    Status of an OptimizationJob for the API
+
+    Returns:
+        dict: jobId, status, progress (%), solver, timestamps; error when
+        FAILED; result (the optimize_routes response) when DONE and asked for
+    """
+    from .models import OptimizationJob
+
+    expire_stale(job)
+    status = {
+        'jobId': job.id,
+        'status': job.status,
+        'progress': job.progress,
+        'solver': job.solver,
+        'createdAt': job.created_at.isoformat(),
+        'startedAt': job.started_at.isoformat() if job.started_at else None,
+        'finishedAt': job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status == OptimizationJob.Status.FAILED:
+        status['error'] = job.error_message
+    if include_result and job.status == OptimizationJob.Status.DONE:
+        status['result'] = result_cache.job_result(job)
+    return status
+
+
+def _progress_writer(job_id):
+    """progress(fraction) callback that writes to the job at most every PROGRESS_INTERVAL"""
+    from .models import OptimizationJob
+
+    last = [0.0]
+
+    def report(fraction):
+        now = time.monotonic()
+        if now - last[0] < PROGRESS_INTERVAL:
+            return
+        last[0] = now
+        # 100% ставит только finish_job
+        OptimizationJob.objects.filter(id=job_id, status=OptimizationJob.Status.RUNNING).update(
+            progress=min(99, int(fraction * 100))
+        )
+
+    return report
+
+
+def _run(job_id, key, compute, data, payload, solver):
+    from .models import OptimizationJob
+
+    # У потока пула свое соединение с БД: закрываем его, как после запроса
+    close_old_connections()
+    try:
+        job = OptimizationJob.objects.get(id=job_id)
+        result_cache.get_or_compute(
+            key, lambda: compute(_progress_writer(job_id)), data, payload, solver, job=job
+        )
+    except Exception:
+        logger.exception(f"Optimization job {job_id} failed")
+    finally:
+        with _queued_lock:
+            _queued.discard(job_id)
+        close_old_connections()
+
+
+def submit(key, compute, data, payload, solver):
+    """
+    Queue an optimize request
+
+    Args:
+        key: result_cache.request_hash() of the request
+        compute: callable(progress) -> optimize_routes result
+        data, payload, solver: stored on the OptimizationJob
+
+    Returns:
+        job_status() of the job that will have (or already has) the result
+    """
+    from .models import OptimizationJob
+
+    result, _ = result_cache.lookup(key)
+    if result is not None:
+        done = OptimizationJob.objects.filter(id=result.get('jobId')).first()
+        if done is not None:
+            return job_status(done, include_result=True)
+
+    active = OptimizationJob.objects.filter(
+        request_hash=key,
+        status__in=[OptimizationJob.Status.PENDING, OptimizationJob.Status.RUNNING],
+    ).order_by('-created_at').first()
+    if active is not None:
+        status = job_status(active)
+        if status['status'] != OptimizationJob.Status.FAILED:
+            return status
+
+    job = OptimizationJob.objects.create(
+        depot=result_cache.find_depot(data['depot']),
+        request_hash=key,
+        solver=solver,
+        request_data=data,
+        ors_request=payload,
+        status=OptimizationJob.Status.PENDING,
+    )
+    with _queued_lock:
+        _queued.add(job.id)
+    executor().submit(_run, job.id, key, compute, data, payload, solver)
+    logger.info(f"Optimization job {job.id} queued ({solver}, {len(payload.get('jobs', []))} jobs)")
+    return job_status(job)
@@ -0,0 +1,58 @@
+"""
+Django management command to benchmark the travel matrix cache
+Usage: python manage.py benchmark_route_matrix --sizes 200,1000,3000 [--added 1]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from logistics import matrix
+
+
+class Command(BaseCommand):
+    help = 'Full matrix vs cache hit vs incremental extension when fields are added'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=str, default='200,1000,3000',
+                            help='Comma-separated point counts (depot + fields)')
+        parser.add_argument('--added', type=int, default=1, help='Fields added to the plan')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        import numpy as np
+
+        rng = np.random.default_rng(options['seed'])
+        added = options['added']
+
+        self.stdout.write(f"🗺️ Travel matrix (haversine), {added} field(s) added to a cached plan")
+        for size in [int(x) for x in options['sizes'].split(',') if x.strip()]:
+            points = np.column_stack([
+                68.2517 + rng.uniform(-0.4, 0.4, size + added),
+                43.2973 + rng.uniform(-0.3, 0.3, size + added),
+            ]).tolist()
+            cache = matrix.MatrixCache()
+
+            start = time.perf_counter()
+            cache.get(points[:size])
+            cold = time.perf_counter() - start
+
+            start = time.perf_counter()
+            cache.get(points[:size][::-1])
+            hit = time.perf_counter() - start
+
+            start = time.perf_counter()
+            cache.get(points)
+            extended = time.perf_counter() - start
+
+            start = time.perf_counter()
+            matrix.haversine_matrix(points, points)
+            full = time.perf_counter() - start
+
+            stats = cache.stats()
+            self.stdout.write(
+                f"  {size:>5} points: full {cold * 1000:7.1f} ms, hit {hit * 1000:6.1f} ms, "
+                f"+{added} extended {extended * 1000:6.1f} ms (recompute {full * 1000:7.1f} ms), "
+                f"cells computed {stats['cells_computed']:,}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark complete'))
@@ -0,0 +1,131 @@
+"""
+Django management command to benchmark the local route optimization solver
+Usage: python manage.py benchmark_vrp --sizes 50,200,1000 [--time-limit 10] [--time-windows]
+"""
+import math
+import time
+
+from django.core.management.base import BaseCommand
+
+from logistics import vrp
+from logistics.route_optimization_service import RouteOptimizationService
+
+
+def synthetic_request(fields, fields_per_vehicle=20, time_windows=False, seed=0):
+    """Optimize request (depot/vehicles/fields) with fields scattered around a Turkistan depot"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    depot = {'lat': 43.2973, 'lon': 68.2517}
+    items = []
+    for i in range(fields):
+        field = {
+            'id': i + 1,
+            'lat': depot['lat'] + float(rng.uniform(-0.3, 0.3)),
+            'lon': depot['lon'] + float(rng.uniform(-0.4, 0.4)),
+            'demand': int(rng.integers(1, 6)),
+            'serviceTimeMinutes': int(rng.integers(5, 16)),
+        }
+        if time_windows and i % 3 == 0:
+            start = int(rng.integers(0, 5)) * 60
+            field['timeWindow'] = [start, start + 180]
+        items.append(field)
+
+    count = max(1, math.ceil(fields / fields_per_vehicle))
+    capacity = math.ceil(sum(f['demand'] for f in items) / count * 1.2)
+    vehicles = [
+        {'id': v + 1, 'name': f'Truck {v + 1}', 'capacity': capacity, 'shiftMinutes': 480}
+        for v in range(count)
+    ]
+    return {'solver': 'local', 'depot': depot, 'vehicles': vehicles, 'fields': items}
+
+
+def check_solution(request, solution):
+    """Constraint violations of an ORS-shaped solution (empty list = valid)"""
+    fields = {f['id']: f for f in request['fields']}
+    vehicles = {v['id']: v for v in request['vehicles']}
+    problems, seen = [], []
+    for route in solution['routes']:
+        vehicle = vehicles[route['vehicle']]
+        jobs = [step for step in route['steps'] if step['type'] == 'job']
+        seen += [step['id'] for step in jobs]
+        load = sum(max(1, round(fields[step['id']]['demand'])) for step in jobs)
+        if load > vehicle['capacity']:
+            problems.append(f"vehicle {vehicle['id']}: load {load} > {vehicle['capacity']}")
+        if route['steps'][-1]['arrival'] > vehicle['shiftMinutes'] * 60 + 1:
+            problems.append(f"vehicle {vehicle['id']}: back after the shift")
+        for step in jobs:
+            window = fields[step['id']].get('timeWindow')
+            started = step['arrival'] + step['waiting_time']
+            if window and not (window[0] * 60 - 1 <= started <= window[1] * 60 + 1):
+                problems.append(f"field {step['id']}: served at {started}s outside {window}")
+    if len(seen) != len(set(seen)) or len(seen) + len(solution['unassigned']) != len(fields):
+        problems.append('fields missing or served twice')
+    return problems
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the local CVRPTW solver on synthetic 50/200/1000-field harvests'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='50,200,1000',
+            help='Comma-separated field counts (default: 50,200,1000)',
+        )
+        parser.add_argument(
+            '--fields-per-vehicle',
+            type=int,
+            default=20,
+            help='Fleet size = fields / this (default: 20)',
+        )
+        parser.add_argument(
+            '--time-limit',
+            type=float,
+            default=vrp.DEFAULT_TIME_LIMIT,
+            help=f'Local search budget in seconds (default: {vrp.DEFAULT_TIME_LIMIT})',
+        )
+        parser.add_argument(
+            '--time-windows',
+            action='store_true',
+            help='Give every third field a 3-hour time window',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        from django.test import override_settings
+
+        sizes = [int(x) for x in options['sizes'].split(',') if x.strip()]
+        service = RouteOptimizationService()
+
+        self.stdout.write(
+            f"🚚 Local VRP solver, local search budget {options['time_limit']:.0f}s"
+            f"{', with time windows' if options['time_windows'] else ''}"
+        )
+        for size in sizes:
+            request = synthetic_request(
+                size, options['fields_per_vehicle'], options['time_windows'], options['seed']
+            )
+            start = time.perf_counter()
+            with override_settings(ROUTE_SOLVER_TIME_LIMIT=options['time_limit']):
+                result = service.optimize_routes(request, use_cache=False)
+            elapsed = time.perf_counter() - start
+
+            if 'error' in result:
+                self.stdout.write(self.style.ERROR(f"  {size} fields: {result['error']} {result.get('details', '')}"))
+                continue
+
+            solution = result['orsSolution']
+            summary, stats = solution['summary'], solution['solver']
+            problems = check_solution(request, solution)
+            self.stdout.write(
+                f"  {size:>5} fields, {len(request['vehicles']):>3} vehicles: {elapsed:6.2f}s  "
+                f"routes {summary['routes']}, unassigned {summary['unassigned']}, "
+                f"{summary['distance'] / 1000:,.0f} km, {summary['duration'] / 3600:,.1f} h driving  "
+                f"(construction {stats['construction_cost'] / 3600:,.1f} h, "
+                f"local search -{stats['improvement']:.1%}, moves {stats['moves']})"
+            )
+            if problems:
+                self.stdout.write(self.style.ERROR(f"    ❌ {len(problems)} violations: {problems[:3]}"))
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark complete'))
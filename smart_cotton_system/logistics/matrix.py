@@ -0,0 +1,279 @@
+"""
+Travel duration/distance matrices for route optimization.
+
+Two providers:
+- "haversine": great-circle distance times a road detour factor, driven at
+  an average speed; NumPy over all pairs at once, no network.
+- "ors": the OpenRouteService matrix API (road network), in requests of at
+  most ORS_MAX_CELLS cells; a failed call falls back to haversine for that
+  request. The estimates come from the
+  haversine cache and are never stored as road matrices, so the next
+  request tries ORS again.
+
+Matrices are kept in an in-process LRU (MatrixCache) keyed by the set of
+coordinates. A request whose points are all in a cached matrix is answered
+by indexing into it; when most are (a field was added to the plan), the
+cached matrix is extended with the rows and columns of the new points
+- k x (n + k) + n x k cells instead of (n + k)^2. A request that only shares
+a few points with a cached matrix (another plan from the same depot) gets a
+matrix of its own, so unrelated plans are not merged. Both the local solver
+(vrp.py) and RouteOptimizationService.check_feasibility read from here, so
+the feasibility check warms the cache for the solve.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371000.0
+ROAD_FACTOR = 1.3          # road distance / great-circle distance
+AVERAGE_SPEED_KMH = 40.0   # field roads and rural highways
+
+COORD_DECIMALS = 6         # ~0.1 m: coordinates equal after rounding share a row
+CACHE_SIZE = 32            # matrices kept per provider
+MAX_POINTS = 5000          # a cached matrix is not extended beyond this
+EXTEND_MAX_NEW = 0.25      # extend only if new points are at most this share of the request
+ORS_MAX_CELLS = 3500       # sources x destinations per ORS matrix request
+
+ORS_MATRIX_URL = 'https://api.openrouteservice.org/v2/matrix/driving-car'
+
+
+def haversine_matrix(origins, destinations):
+    """
+    Durations (s) and distances (m) from every origin to every destination.
+
+    Args:
+        origins, destinations: sequences of [lon, lat]
+
+    Returns:
+        (durations, distances): (len(origins), len(destinations)) float arrays
+    """
+    import numpy as np
+
+    a = np.radians(np.asarray(origins, dtype=float).reshape(-1, 2))
+    b = np.radians(np.asarray(destinations, dtype=float).reshape(-1, 2))
+    lat1, lat2 = a[:, 1][:, None], b[:, 1][None, :]
+    dlat = lat2 - lat1
+    dlon = b[:, 0][None, :] - a[:, 0][:, None]
+    h = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    distances = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0))) * ROAD_FACTOR
+    durations = distances / (AVERAGE_SPEED_KMH / 3.6)
+    return durations, distances
+
+
+def ors_matrix(origins, destinations, api_key, timeout=30):
+    """
+    Road-network matrix from the ORS matrix API (same return value as
+    haversine_matrix); unreachable pairs come back as inf. Split into
+    blocks of at most ORS_MAX_CELLS cells, the API's per-request limit.
+    """
+    import numpy as np
+
+    origins, destinations = list(origins), list(destinations)
+    durations = np.empty((len(origins), len(destinations)))
+    distances = np.empty((len(origins), len(destinations)))
+    cols = max(1, min(len(destinations), ORS_MAX_CELLS))
+    rows = max(1, ORS_MAX_CELLS // cols)
+    for i in range(0, len(origins), rows):
+        for j in range(0, len(destinations), cols):
+            block = _ors_request(origins[i:i + rows], destinations[j:j + cols], api_key, timeout)
+            durations[i:i + rows, j:j + cols], distances[i:i + rows, j:j + cols] = block
+    return durations, distances
+
+
+def _ors_request(origins, destinations, api_key, timeout):
+    """One ORS matrix call"""
+    import numpy as np
+    import requests
+
+    locations = [list(p) for p in origins] + [list(p) for p in destinations]
+    response = requests.post(
+        ORS_MATRIX_URL,
+        json={
+            'locations': locations,
+            'sources': list(range(len(origins))),
+            'destinations': list(range(len(origins), len(locations))),
+            'metrics': ['duration', 'distance'],
+        },
+        headers={'Authorization': api_key, 'Content-Type': 'application/json'},
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    def as_array(rows):
+        return np.array([[math.inf if x is None else x for x in row] for row in rows], dtype=float)
+
+    return as_array(data['durations']), as_array(data['distances'])
+
+
+class MatrixCache:
+    """
+    LRU of travel matrices keyed by coordinate set.
+
+    Args:
+        compute: callable(origins, destinations) -> (durations, distances)
+        maxsize (int): matrices kept
+    """
+
+    def __init__(self, compute=haversine_matrix, maxsize=CACHE_SIZE, name='haversine'):
+        self.compute = compute
+        self.maxsize = maxsize
+        self.name = name
+        self._entries = OrderedDict()  # frozenset(coords) -> (coords, index, durations, distances)
+        self._lock = threading.Lock()
+
+        # Counters for monitoring
+        self.hits = 0
+        self.extended = 0
+        self.misses = 0
+        self.cells_computed = 0
+
+    @staticmethod
+    def _keys(locations):
+        """Hashable (lon, lat) of every point, rounded to COORD_DECIMALS"""
+        import numpy as np
+
+        points = np.round(np.asarray(locations, dtype=float).reshape(-1, 2), COORD_DECIMALS)
+        return list(map(tuple, points.tolist()))
+
+    def _best_entry(self, wanted):
+        """(entry key, overlap) of the cached matrix covering most of `wanted`"""
+        best, best_overlap = None, 0
+        for key, (_, index, _, _) in reversed(self._entries.items()):
+            overlap = sum(1 for c in wanted if c in index)
+            if overlap > best_overlap:
+                best, best_overlap = key, overlap
+                if overlap == len(wanted):
+                    break
+        return best, best_overlap
+
+    def _compute(self, origins, destinations):
+        result = self.compute(origins, destinations)
+        self.cells_computed += len(origins) * len(destinations)
+        return result
+
+    def get(self, locations):
+        """
+        Matrices for `locations` ([lon, lat] each), rows/columns in the same order
+
+        Returns:
+            (durations, distances): (N, N) float arrays
+        """
+        import numpy as np
+
+        coords = self._keys(locations)
+        wanted = list(dict.fromkeys(coords))
+        if not wanted:
+            return np.zeros((0, 0)), np.zeros((0, 0))
+
+        with self._lock:
+            key, overlap = self._best_entry(wanted)
+            entry = self._entries[key] if key is not None else None
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is not None and overlap == len(wanted):
+            self.hits += 1
+        elif (entry is not None and len(wanted) - overlap <= EXTEND_MAX_NEW * len(wanted)
+              and len(entry[0]) + len(wanted) - overlap <= MAX_POINTS):
+            # Дописываем к кэшированной матрице строки и столбцы новых точек
+            base, base_index, base_durations, base_distances = entry
+            new = [c for c in wanted if c not in base_index]
+            every = base + new
+            rows = self._compute(new, every)                 # new -> all
+            cols = self._compute(base, new)                  # old -> new
+            m = len(base)
+            durations = np.empty((len(every), len(every)))
+            distances = np.empty((len(every), len(every)))
+            durations[:m, :m], distances[:m, :m] = base_durations, base_distances
+            durations[:m, m:], distances[:m, m:] = cols
+            durations[m:, :], distances[m:, :] = rows
+            entry = (every, {c: i for i, c in enumerate(every)}, durations, distances)
+            self._store(entry, replaces=key)
+            self.extended += 1
+        else:
+            # Другой план (общее у них разве что депо): своя матрица, без слияния
+            durations, distances = self._compute(wanted, wanted)
+            entry = (wanted, {c: i for i, c in enumerate(wanted)}, durations, distances)
+            self._store(entry)
+            self.misses += 1
+
+        _, index, durations, distances = entry
+        order = np.array([index[c] for c in coords])
+        return durations[np.ix_(order, order)], distances[np.ix_(order, order)]
+
+    def _store(self, entry, replaces=None):
+        with self._lock:
+            if replaces is not None:
+                # Новая матрица содержит старую целиком
+                self._entries.pop(replaces, None)
+            self._entries[frozenset(entry[0])] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.extended = self.misses = self.cells_computed = 0
+
+    def stats(self):
+        return {
+            'provider': self.name,
+            'matrices': len(self._entries),
+            'hits': self.hits,
+            'extended': self.extended,
+            'misses': self.misses,
+            'cells_computed': self.cells_computed,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(provider='haversine', api_key=None):
+    """Shared MatrixCache of a provider ("haversine" or "ors")"""
+    with _caches_lock:
+        if provider not in _caches:
+            if provider == 'haversine':
+                compute = haversine_matrix
+            elif provider == 'ors':
+                # Ошибка ORS пробрасывается: в кэш попадают только дорожные матрицы
+                def compute(origins, destinations):
+                    return ors_matrix(origins, destinations, api_key)
+            else:
+                raise ValueError(f'Unknown matrix provider "{provider}"')
+            _caches[provider] = MatrixCache(compute, name=provider)
+        return _caches[provider]
+
+
+def travel_matrix(locations, provider=None, api_key=None, on_fallback=None):
+    """
+    Durations (s) and distances (m) between [lon, lat] points, from the
+    shared cache of `provider` (default settings.ROUTE_MATRIX_PROVIDER)
+
+    Args:
+        on_fallback: optional callable(error), called when ORS failed and
+            haversine estimates are returned instead
+    """
+    if provider is None:
+        from django.conf import settings
+        provider = getattr(settings, 'ROUTE_MATRIX_PROVIDER', 'haversine')
+    started = time.perf_counter()
+    try:
+        result = get_cache(provider, api_key).get(locations)
+    except Exception as e:
+        if provider == 'haversine':
+            raise
+        logger.warning(f"ORS matrix failed ({e}), using haversine estimates")
+        if on_fallback is not None:
+            on_fallback(e)
+        provider = 'haversine'
+        result = get_cache(provider).get(locations)
+    logger.debug(f"Travel matrix {len(locations)}x{len(locations)} ({provider}) "
+                 f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return result
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0006_remove_vehicle_current_load'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='optimizationjob',
+            name='request_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='Canonical hash of depot, fleet and fields', max_length=64, verbose_name='Request hash'),
+        ),
+        migrations.AddField(
+            model_name='optimizationjob',
+            name='solver',
+            field=models.CharField(default='ors', max_length=10, verbose_name='Solver'),
+        ),
+        migrations.AlterField(
+            model_name='optimizationjob',
+            name='depot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='optimization_jobs', to='logistics.depot'),
+        ),
+        migrations.AlterField(
+            model_name='optimizationjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='Status'),
+        ),
+    ]
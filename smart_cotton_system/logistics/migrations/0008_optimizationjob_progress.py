@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0007_optimizationjob_request_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='optimizationjob',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Finished at'),
+        ),
+        migrations.AddField(
+            model_name='optimizationjob',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Progress (%)'),
+        ),
+        migrations.AddField(
+            model_name='optimizationjob',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Started at'),
+        ),
+    ]
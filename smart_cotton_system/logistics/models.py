@@ -94,14 +94,29 @@ class Depot(models.Model):
 class OptimizationJob(models.Model):
     """
     Store route optimization job results
+    (finished jobs double as the shared result cache, see result_cache.py;
+    asynchronous requests are run by jobs.py)
     """
-    depot = models.ForeignKey(Depot, on_delete=models.CASCADE, related_name='optimization_jobs')
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    # Depot of the request when it is one of the saved depots
+    depot = models.ForeignKey(Depot, on_delete=models.CASCADE, related_name='optimization_jobs', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    request_hash = models.CharField(max_length=64, blank=True, db_index=True, verbose_name="Request hash",
+                                    help_text="Canonical hash of depot, fleet and fields")
+    solver = models.CharField(max_length=10, default='ors', verbose_name="Solver")
     request_data = models.JSONField(verbose_name="Request data")
     ors_request = models.JSONField(verbose_name="ORS request payload", null=True, blank=True)
     ors_solution = models.JSONField(verbose_name="ORS solution", null=True, blank=True)
     ai_summary = models.TextField(blank=True, verbose_name="AI Summary", help_text="Gemini AI generated summary")
-    status = models.CharField(max_length=20, default='pending', verbose_name="Status")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, verbose_name="Status")
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name="Progress (%)")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Started at")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Finished at")
     error_message = models.TextField(blank=True, verbose_name="Error message")
     
     def __str__(self):
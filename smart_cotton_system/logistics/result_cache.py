@@ -0,0 +1,270 @@
+"""
+Result cache and request coalescing for optimize_routes.
+
+Requests for the same depot, fleet and fields - in any order, coordinates
+equal to ~1 m - get the same request_hash(). get_or_compute() looks for the
+result:
+1. in the in-process LRU (ROUTE_RESULT_CACHE_SIZE entries);
+2. in the latest DONE OptimizationJob with that hash, shared by all workers
+   and kept across restarts;
+3. otherwise computes it once. Identical requests arriving meanwhile in this
+   process wait for the same computation (single flight); in other processes
+   they see its RUNNING job and poll it for up to ROUTE_RESULT_WAIT seconds
+   before computing themselves.
+Both cache levels expire after ROUTE_RESULT_CACHE_TTL seconds. Only
+successful results are reused; errors (ORS down, timeouts) are recorded as
+FAILED jobs and the next request tries again. So are local solutions built
+on haversine estimates because the ORS matrix failed ("matrixFallback"):
+their job is DONE but loses its request hash.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+COORD_DECIMALS = 5     # ~1 m
+POLL_INTERVAL = 0.5    # seconds between checks of another worker's RUNNING job
+
+_result_cache = None
+_inflight = {}         # request hash -> Future of the computation in progress
+_inflight_lock = threading.Lock()
+
+
+def result_cache():
+    global _result_cache
+    if _result_cache is None:
+        from factory.caching import TTLCache
+
+        _result_cache = TTLCache(
+            maxsize=getattr(settings, 'ROUTE_RESULT_CACHE_SIZE', 256),
+            ttl=getattr(settings, 'ROUTE_RESULT_CACHE_TTL', 3600),
+            name='route_results',
+        )
+    return _result_cache
+
+
+def _rounded(location):
+    return [round(float(x), COORD_DECIMALS) for x in location] if location else location
+
+
+def request_hash(payload, solver, options=None):
+    """
+    SHA-256 of the canonical form of an ORS payload: jobs and vehicles sorted
+    by id, coordinates rounded to COORD_DECIMALS
+
+    Args:
+        payload: ORS optimization payload (jobs, vehicles, options)
+        solver: "ors" | "local"
+        options: anything else the result depends on (local solver settings)
+    """
+    canonical = {
+        'solver': solver,
+        'jobs': sorted(
+            ({**job, 'location': _rounded(job.get('location'))} for job in payload.get('jobs', [])),
+            key=lambda job: str(job.get('id')),
+        ),
+        'vehicles': sorted(
+            ({**vehicle, 'start': _rounded(vehicle.get('start')), 'end': _rounded(vehicle.get('end'))}
+             for vehicle in payload.get('vehicles', [])),
+            key=lambda vehicle: str(vehicle.get('id')),
+        ),
+        'options': payload.get('options'),
+        'solverOptions': options,
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def cacheable(result):
+    """Whether a result may answer later identical requests"""
+    return 'error' not in result and not result.get('matrixFallback')
+
+
+def job_result(job):
+    return {
+        'request': job.request_data,
+        'orsRequest': job.ors_request,
+        'orsSolution': job.ors_solution,
+        'solver': job.solver,
+        'jobId': job.id,
+    }
+
+
+def _fresh_jobs(key, status, max_age):
+    from .models import OptimizationJob
+
+    return OptimizationJob.objects.filter(
+        request_hash=key, status=status, created_at__gte=timezone.now() - timedelta(seconds=max_age)
+    ).order_by('-created_at')
+
+
+def find_depot(depot):
+    """Saved Depot at the request's depot coordinates, if any"""
+    from .models import Depot
+
+    lat, lon = float(depot['lat']), float(depot['lon'])
+    tolerance = 10 ** -COORD_DECIMALS
+    return Depot.objects.filter(
+        latitude__range=(lat - tolerance, lat + tolerance),
+        longitude__range=(lon - tolerance, lon + tolerance),
+    ).first()
+
+
+def _wait_for_other_worker(key, exclude=None):
+    """Result of an identical job another process is running, or None"""
+    from .models import OptimizationJob
+
+    wait = getattr(settings, 'ROUTE_RESULT_WAIT', 60)
+    running = _fresh_jobs(key, OptimizationJob.Status.RUNNING, wait)
+    if exclude is not None:
+        running = running.exclude(id=exclude.id)
+    running = running.first()
+    if running is None:
+        return None
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        running.refresh_from_db(fields=['status', 'ors_solution', 'request_hash'])
+        if running.status == OptimizationJob.Status.DONE:
+            if running.request_hash != key:
+                return {**job_result(running), 'matrixFallback': True}
+            return job_result(running)
+        if running.status != OptimizationJob.Status.RUNNING:
+            return None
+    return None
+
+
+def finish_job(job, result):
+    """Store a result (or error dict) on the job"""
+    from .models import OptimizationJob
+
+    job.finished_at = timezone.now()
+    if 'error' in result:
+        job.status = OptimizationJob.Status.FAILED
+        job.error_message = str(result['error'])
+        job.save(update_fields=['status', 'error_message', 'finished_at'])
+    else:
+        job.ors_solution = result['orsSolution']
+        job.status = OptimizationJob.Status.DONE
+        job.progress = 100
+        update_fields = ['ors_solution', 'status', 'progress', 'finished_at']
+        if not cacheable(result):
+            # Решение по оценкам вместо дорожной матрицы: не выдаем его по хэшу
+            job.request_hash = ''
+            update_fields.append('request_hash')
+        job.save(update_fields=update_fields)
+
+
+def _load_or_compute(key, compute, data, payload, solver, job=None):
+    """(result, source) from the database or by running `job` (a new OptimizationJob if None)"""
+    from .models import OptimizationJob
+
+    ttl = getattr(settings, 'ROUTE_RESULT_CACHE_TTL', 3600)
+    stored = _fresh_jobs(key, OptimizationJob.Status.DONE, ttl).first()
+    if stored is not None:
+        return job_result(stored), 'database'
+
+    result = _wait_for_other_worker(key, exclude=job)
+    if result is not None:
+        return result, 'coalesced'
+
+    if job is None:
+        job = OptimizationJob.objects.create(
+            depot=find_depot(data['depot']),
+            request_hash=key,
+            solver=solver,
+            request_data=data,
+            ors_request=payload,
+            status=OptimizationJob.Status.RUNNING,
+            started_at=timezone.now(),
+        )
+    else:
+        job.status = OptimizationJob.Status.RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+
+    try:
+        result = compute()
+    except Exception as e:
+        finish_job(job, {'error': str(e)})
+        raise
+
+    finish_job(job, result)
+    if 'error' in result:
+        return result, 'computed'
+    return {**result, 'jobId': job.id}, 'computed'
+
+
+def lookup(key):
+    """Cached result of a request without computing it: (result, source) or (None, None)"""
+    from .models import OptimizationJob
+
+    result = result_cache().get(key)
+    if result is not None:
+        return result, 'memory'
+    ttl = getattr(settings, 'ROUTE_RESULT_CACHE_TTL', 3600)
+    stored = _fresh_jobs(key, OptimizationJob.Status.DONE, ttl).first()
+    if stored is not None:
+        result = job_result(stored)
+        result_cache().set(key, result)
+        return result, 'database'
+    return None, None
+
+
+def get_or_compute(key, compute, data, payload, solver, job=None):
+    """
+    Cached or shared result of an optimize request
+
+    Args:
+        key: request_hash() of the request
+        compute: callable() -> optimize_routes result (error dicts are not cached)
+        data, payload, solver: stored on the OptimizationJob
+        job: existing OptimizationJob to run (background jobs); gets the
+            result also when it comes from a cache
+
+    Returns:
+        (result, source): source is "memory", "database", "coalesced" or "computed"
+    """
+    cache = result_cache()
+    result = cache.get(key)
+    if result is not None:
+        if job is not None:
+            finish_job(job, result)
+        return result, 'memory'
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+
+    if not leader:
+        # Тот же запрос уже считается в этом процессе: ждем его результат
+        result = future.result()
+        if job is not None:
+            finish_job(job, result)
+        return result, 'coalesced'
+
+    try:
+        result, source = _load_or_compute(key, compute, data, payload, solver, job)
+        if cacheable(result):
+            cache.set(key, result)
+        if job is not None and source in ('database', 'coalesced'):
+            finish_job(job, result)
+        future.set_result(result)
+        return result, source
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
@@ -1,6 +1,7 @@
 """
 Route Optimization Service for Smart Cotton System
-Integrates OpenRouteService (ORS) API for vehicle routing and Google Gemini for AI insights
+Integrates OpenRouteService (ORS) API for vehicle routing (or the local solver
+in vrp.py) and Google Gemini for AI insights
 """
 
 import os
@@ -8,7 +9,11 @@ import requests
 import json
 from typing import Dict, List, Any, Optional
 from django.conf import settings
-import google.generativeai as genai
+
+from . import matrix, result_cache
+
+# "ors": OpenRouteService optimization API, "local": logistics/vrp.py
+SOLVERS = ('ors', 'local')
 
 
 class RouteOptimizationService:
@@ -21,20 +26,42 @@ class RouteOptimizationService:
         if not self.ors_api_key:
             print("⚠️ Warning: ORS_API_KEY not set in environment")
             
-        if self.gemini_api_key:
-            genai.configure(api_key=self.gemini_api_key)
-            self.gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
-        else:
+        if not self.gemini_api_key:
             print("⚠️ Warning: GEMINI_API_KEY not set - AI summary will be disabled")
-            self.gemini_model = None
+        self._gemini_model = None
+
+    @property
+    def gemini_model(self):
+        """Gemini client, created on first use: route optimization does not need it"""
+        if self._gemini_model is None and self.gemini_api_key:
+            # Imported lazily: the Gemini SDK is slow to import and only needed here
+            import google.generativeai as genai
+
+            genai.configure(api_key=self.gemini_api_key)
+            self._gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        return self._gemini_model
     
-    def check_feasibility(self, fields: List[Dict], vehicles: List[Dict]) -> Dict[str, Any]:
+    def travel_matrix(self, locations: List[List[float]], on_fallback=None):
+        """Cached travel durations (s) and distances (m) between [lon, lat] points"""
+        return matrix.travel_matrix(
+            locations,
+            provider=getattr(settings, 'ROUTE_MATRIX_PROVIDER', 'haversine'),
+            api_key=self.ors_api_key,
+            on_fallback=on_fallback
+        )
+    
+    def check_feasibility(self, fields: List[Dict], vehicles: List[Dict],
+                          depot: Optional[Dict] = None, strict_travel: bool = False) -> Dict[str, Any]:
         """
         Check feasibility of the route optimization problem before calling ORS API
         
         Args:
             fields: List of field dictionaries with demand and service time
             vehicles: List of vehicle dictionaries with capacity and shift time
+            depot: {lat, lon}; when given, travel times from the matrix cache
+                are checked too (and the matrix is ready for the local solver)
+            strict_travel: travel problems are errors rather than warnings;
+                set when the matrix is what the solver will use
             
         Returns:
             Dictionary with ok, errors, and warnings
@@ -94,17 +121,123 @@ class RouteOptimizationService:
                     f'which is longer than any single vehicle shift ({max_shift_minutes:.1f} min).'
                 )
         
+        if depot is not None and max_shift_minutes > 0:
+            self._check_travel(result, fields, depot, total_shift_minutes, max_shift_minutes, strict_travel)
+        
         return result
     
-    def optimize_routes(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    def _check_travel(self, result: Dict[str, Any], fields: List[Dict], depot: Dict,
+                      total_shift_minutes: float, max_shift_minutes: float, strict: bool) -> None:
+        """Travel time checks of check_feasibility, on the cached depot + fields matrix"""
+        try:
+            locations = [[float(depot['lon']), float(depot['lat'])]]
+            located = []
+            for field in fields:
+                locations.append([float(field['lon']), float(field['lat'])])
+                located.append(field)
+        except (KeyError, ValueError, TypeError):
+            # Invalid coordinates are reported by the validation in optimize_routes
+            return
+        
+        import numpy as np
+        
+        durations, _ = self.travel_matrix(locations)
+        minutes = durations / 60.0
+        problems = []
+        
+        # Round trip depot -> field -> depot must fit into the longest shift
+        for i, field in enumerate(located, start=1):
+            service = float(field.get('serviceTimeMinutes', 0))
+            round_trip = minutes[0, i] + service + minutes[i, 0]
+            if round_trip > max_shift_minutes:
+                problems.append(
+                    f'Field #{field.get("id")} needs {round_trip:.1f} min for the round trip from the depot '
+                    f'(incl. service), longer than any single vehicle shift ({max_shift_minutes:.1f} min).'
+                )
+            time_window = field.get('timeWindow')
+            if time_window:
+                try:
+                    end_minutes = float(time_window[1])
+                except (IndexError, ValueError, TypeError):
+                    continue
+                if minutes[0, i] > end_minutes:
+                    problems.append(
+                        f'Field #{field.get("id")} is {minutes[0, i]:.1f} min from the depot, '
+                        f'its time window closes at {end_minutes:.1f} min.'
+                    )
+        
+        # Every field is entered once, at least along its shortest incoming arc
+        incoming = minutes[:, 1:].copy()
+        np.fill_diagonal(incoming[1:], np.inf)
+        min_travel = float(incoming.min(axis=0).sum()) if located else 0.0
+        total_service = sum(float(f.get('serviceTimeMinutes', 0)) for f in located)
+        if total_service <= total_shift_minutes < total_service + min_travel:
+            problems.append(
+                f'Service plus minimum travel time ({total_service + min_travel:.1f} min) exceeds '
+                f'total available vehicle shift time ({total_shift_minutes:.1f} min).'
+            )
+        
+        if strict and problems:
+            result['ok'] = False
+            result['errors'].extend(problems)
+        else:
+            result['warnings'].extend(problems)
+    
+    def optimize_routes(self, data: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
         """
-        Optimize routes using OpenRouteService API
+        Optimize routes using OpenRouteService API or the local solver
         
         Args:
-            data: Dictionary containing depot, vehicles, and fields information
+            data: Dictionary containing depot, vehicles, and fields information;
+                optional "solver": "ors" | "local" (default settings.ROUTE_SOLVER)
+            use_cache: reuse results of identical requests (result_cache.py)
             
         Returns:
-            Dictionary with optimization results or error information
+            Dictionary with optimization results or error information;
+            "cached" tells whether the solution was reused, "jobId" is its OptimizationJob
+        """
+        prepared = self.prepare_optimization(data)
+        if 'error' in prepared:
+            return prepared
+        
+        compute = lambda: self.run_optimization(data, prepared)
+        if not use_cache:
+            return compute()
+        
+        # Same depot/fleet/fields as a recent (or running) request: reuse its result
+        result, source = result_cache.get_or_compute(
+            prepared['key'], compute, data, prepared['orsPayload'], prepared['solver']
+        )
+        if 'error' in result:
+            return result
+        return {**result, 'request': data, 'cached': source != 'computed'}
+    
+    def submit_optimization(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate the request now and solve it on the background pool (jobs.py)
+        
+        Returns:
+            Job status dictionary (jobId, status, progress, ...; "result" once done)
+            or error information
+        """
+        from . import jobs
+        
+        prepared = self.prepare_optimization(data)
+        if 'error' in prepared:
+            return prepared
+        
+        return jobs.submit(
+            prepared['key'],
+            lambda progress: self.run_optimization(data, prepared, progress),
+            data, prepared['orsPayload'], prepared['solver']
+        )
+    
+    def prepare_optimization(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate the request, check feasibility and build the ORS payload
+        
+        Returns:
+            {solver, orsPayload, key (result_cache.request_hash)} or error information
         """
         # Validate input
         if 'depot' not in data or 'fields' not in data:
@@ -123,6 +256,13 @@ class RouteOptimizationService:
         fields = data['fields']
         vehicles = data['vehicles']
         
+        solver = str(data.get('solver') or getattr(settings, 'ROUTE_SOLVER', 'ors')).lower()
+        if solver not in SOLVERS:
+            return {
+                'error': f'Unknown solver "{solver}". Use one of: {", ".join(SOLVERS)}.',
+                'errorType': 'VALIDATION'
+            }
+        
         # Validate depot coordinates
         try:
             depot_lon = float(depot['lon'])
@@ -133,8 +273,10 @@ class RouteOptimizationService:
                 'errorType': 'VALIDATION'
             }
         
-        # Check feasibility
-        feasibility = self.check_feasibility(fields, vehicles)
+        # Check feasibility; travel times are decisive when the solver uses the same
+        # matrix (local) or the matrix comes from the road network
+        strict_travel = solver == 'local' or getattr(settings, 'ROUTE_MATRIX_PROVIDER', 'haversine') == 'ors'
+        feasibility = self.check_feasibility(fields, vehicles, depot=depot, strict_travel=strict_travel)
         if not feasibility['ok']:
             return {
                 'error': 'Feasibility check failed',
@@ -154,12 +296,20 @@ class RouteOptimizationService:
                 demand_units = max(1, round(demand))
                 service_seconds = round(service_minutes * 60)
                 
-                jobs.append({
+                job = {
                     'id': field['id'],
                     'location': [lon, lat],
                     'amount': [demand_units],
                     'service': service_seconds
-                })
+                }
+                
+                # Optional [start, end] in minutes from the shift start
+                time_window = field.get('timeWindow')
+                if time_window:
+                    start_minutes, end_minutes = (float(x) for x in time_window)
+                    job['time_windows'] = [[round(start_minutes * 60), round(end_minutes * 60)]]
+                
+                jobs.append(job)
             except (KeyError, ValueError, TypeError) as e:
                 return {
                     'error': f'Invalid field data: {str(e)}',
@@ -203,6 +353,26 @@ class RouteOptimizationService:
             }
         }
         
+        # The local solution also depends on the matrix and the search budget
+        solver_options = {
+            'matrix': getattr(settings, 'ROUTE_MATRIX_PROVIDER', 'haversine'),
+            'timeLimit': getattr(settings, 'ROUTE_SOLVER_TIME_LIMIT', None),
+        } if solver == 'local' else None
+        
+        return {
+            'solver': solver,
+            'orsPayload': ors_payload,
+            'key': result_cache.request_hash(ors_payload, solver, solver_options)
+        }
+    
+    def run_optimization(self, data: Dict[str, Any], prepared: Dict[str, Any], progress=None) -> Dict[str, Any]:
+        """Solve a prepare_optimization() result with its solver (no caching)"""
+        if prepared['solver'] == 'local':
+            return self.solve_locally(data, prepared['orsPayload'], progress=progress)
+        return self.solve_with_ors(data, prepared['orsPayload'])
+    
+    def solve_with_ors(self, data: Dict[str, Any], ors_payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Solve the payload with the ORS optimization API"""
         # Call ORS API
         if not self.ors_api_key:
             return {
@@ -238,7 +408,8 @@ class RouteOptimizationService:
             return {
                 'request': data,
                 'orsRequest': ors_payload,
-                'orsSolution': ors_solution
+                'orsSolution': ors_solution,
+                'solver': 'ors'
             }
             
         except requests.exceptions.Timeout:
@@ -257,6 +428,46 @@ class RouteOptimizationService:
                 'errorType': 'INTERNAL'
             }
     
+    def solve_locally(self, data: Dict[str, Any], ors_payload: Dict[str, Any], progress=None) -> Dict[str, Any]:
+        """
+        Solve the ORS payload with the in-process solver (logistics/vrp.py);
+        the solution has the same shape as the ORS response.
+        progress: optional callable(fraction 0..1)
+        
+        "matrixFallback" is set when the ORS matrix failed and the solution
+        is based on haversine estimates (such results are not cached).
+        """
+        from . import vrp
+        
+        fallbacks = []
+        try:
+            solution = vrp.solve(
+                ors_payload,
+                time_limit=getattr(settings, 'ROUTE_SOLVER_TIME_LIMIT', vrp.DEFAULT_TIME_LIMIT),
+                matrix=lambda locations: self.travel_matrix(locations, on_fallback=fallbacks.append),
+                progress=progress
+            )
+        except (KeyError, ValueError, TypeError) as e:
+            return {
+                'error': f'Invalid optimization data: {str(e)}',
+                'errorType': 'VALIDATION'
+            }
+        except Exception as e:
+            return {
+                'error': f'Local solver failed: {str(e)}',
+                'errorType': 'INTERNAL'
+            }
+        
+        result = {
+            'request': data,
+            'orsRequest': ors_payload,
+            'orsSolution': solution,
+            'solver': 'local'
+        }
+        if fallbacks:
+            result['matrixFallback'] = True
+        return result
+    
     def generate_ai_summary(self, facts: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generate AI summary using Google Gemini
@@ -22,7 +22,8 @@ class DepotSerializer(serializers.ModelSerializer):
 class OptimizationJobSerializer(serializers.ModelSerializer):
     class Meta:
         model = OptimizationJob
-        fields = ['id', 'depot', 'created_at', 'request_data', 'ors_solution', 'ai_summary', 'status', 'error_message']
+        fields = ['id', 'depot', 'created_at', 'started_at', 'finished_at', 'solver', 'request_data',
+                  'ors_solution', 'ai_summary', 'status', 'progress', 'error_message']
         read_only_fields = ['created_at']
 
 class RouteMapSerializer(serializers.ModelSerializer):
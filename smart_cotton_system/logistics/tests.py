@@ -1,3 +1,106 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import jobs, matrix
+
+
+class MatrixCacheTests(SimpleTestCase):
+    """Cached travel matrices: hits, incremental extension, no merging of unrelated plans"""
+
+    DEPOT = [68.2517, 43.2973]
+
+    def plan(self, offset, fields=20):
+        return [self.DEPOT] + [[68.0 + offset + i * 0.001, 43.0 + offset] for i in range(fields)]
+
+    def assertMatchesFresh(self, cache, locations):
+        durations, distances = cache.get(locations)
+        fresh_durations, fresh_distances = matrix.haversine_matrix(locations, locations)
+        # Coordinates are rounded to COORD_DECIMALS (~0.1 m) in the cache
+        self.assertLess(abs(durations - fresh_durations).max(), 0.1)
+        self.assertLess(abs(distances - fresh_distances).max(), 1.0)
+
+    def test_hit_in_any_order(self):
+        cache = matrix.MatrixCache()
+        locations = self.plan(0)
+        cache.get(locations)
+        self.assertMatchesFresh(cache, locations[::-1])
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['cells_computed'], len(locations) ** 2)
+
+    def test_added_field_extends_cached_matrix(self):
+        cache = matrix.MatrixCache()
+        locations = self.plan(0)
+        cache.get(locations)
+        extended = locations + [[68.5, 43.5]]
+        self.assertMatchesFresh(cache, extended)
+
+        stats = cache.stats()
+        self.assertEqual((stats['extended'], stats['matrices']), (1, 1))
+        n = len(locations)
+        self.assertEqual(stats['cells_computed'], n * n + (n + 1) + n)
+
+    def test_unrelated_plans_from_same_depot_not_merged(self):
+        cache = matrix.MatrixCache()
+        plans = [self.plan(offset) for offset in (0.0, 0.1, 0.2)]
+        for locations in plans:
+            self.assertMatchesFresh(cache, locations)
+
+        stats = cache.stats()
+        self.assertEqual((stats['misses'], stats['extended'], stats['matrices']), (3, 0, 3))
+        self.assertEqual(stats['cells_computed'], sum(len(p) ** 2 for p in plans))
+
+    def test_ors_requests_split_under_cell_limit(self):
+        calls = []
+
+        def fake_request(origins, destinations, api_key, timeout):
+            calls.append(len(origins) * len(destinations))
+            return matrix.haversine_matrix(origins, destinations)
+
+        locations = self.plan(0, fields=99)
+        with mock.patch.object(matrix, 'ORS_MAX_CELLS', 1000), \
+                mock.patch.object(matrix, '_ors_request', side_effect=fake_request):
+            durations, _ = matrix.ors_matrix(locations, locations, api_key='key')
+
+        self.assertTrue(all(cells <= 1000 for cells in calls))
+        self.assertEqual(sum(calls), len(locations) ** 2)
+        self.assertLess(abs(durations - matrix.haversine_matrix(locations, locations)[0]).max(), 1e-9)
+
+
+@override_settings(ROUTE_JOB_TIMEOUT=60)
+class OptimizationJobExpiryTests(TestCase):
+    """Only jobs lost in a restart are reported FAILED"""
+
+    def job(self, status, created_ago, started_ago=None):
+        from .models import OptimizationJob
+
+        now = timezone.now()
+        job = OptimizationJob.objects.create(request_data={}, status=status)
+        OptimizationJob.objects.filter(pk=job.pk).update(
+            created_at=now - timedelta(seconds=created_ago),
+            started_at=now - timedelta(seconds=started_ago) if started_ago is not None else None,
+        )
+        job.refresh_from_db()
+        return job
+
+    def expired(self, job):
+        jobs.expire_stale(job)
+        job.refresh_from_db()
+        return job.status == job.Status.FAILED
+
+    def test_pending_job_waiting_in_this_process_is_kept(self):
+        job = self.job('pending', created_ago=600)
+        with mock.patch.object(jobs, '_queued', {job.id}):
+            self.assertFalse(self.expired(job))
+
+    def test_pending_job_unknown_to_this_process_expires(self):
+        self.assertFalse(self.expired(self.job('pending', created_ago=30)))
+        self.assertTrue(self.expired(self.job('pending', created_ago=600)))
+
+    def test_running_job_expires_by_start_time(self):
+        self.assertFalse(self.expired(self.job('running', created_ago=600, started_ago=30)))
+        self.assertTrue(self.expired(self.job('running', created_ago=600, started_ago=120)))
@@ -1,6 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import LogisticsMapViewSet, VehicleViewSet, optimize_routes, ai_summary
+from .views import (
+    LogisticsMapViewSet, VehicleViewSet, optimize_routes, optimization_job_status,
+    optimization_job_result, ai_summary
+)
 
 router = DefaultRouter()
 
@@ -11,5 +14,7 @@ router.register(r'vehicles', VehicleViewSet, basename='vehicles')
 urlpatterns = [
     path('', include(router.urls)),
     path('optimize/', optimize_routes, name='optimize-routes'),
+    path('optimize/jobs/<int:job_id>/', optimization_job_status, name='optimization-job-status'),
+    path('optimize/jobs/<int:job_id>/result/', optimization_job_result, name='optimization-job-result'),
     path('ai-summary/', ai_summary, name='ai-summary'),
 ]
\ No newline at end of file
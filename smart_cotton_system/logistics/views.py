@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
@@ -5,6 +7,7 @@ from rest_framework.response import Response
 from .models import Route, Vehicle, Field, Depot, OptimizationJob
 from .serializers import RouteMapSerializer, VehicleSerializer
 from .route_optimization_service import RouteOptimizationService
+from . import jobs
 
 
 class LogisticsMapViewSet(viewsets.ReadOnlyModelViewSet):
@@ -26,6 +29,30 @@ class VehicleViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = VehicleSerializer
 
 
+def _optimization_error_response(result):
+    """HTTP status of an optimize error by its errorType"""
+    error_type = result.get('errorType', 'UNKNOWN')
+    status_code = status.HTTP_400_BAD_REQUEST
+    
+    if error_type == 'ORS':
+        status_code = result.get('statusCode', status.HTTP_502_BAD_GATEWAY)
+    elif error_type in ['TIMEOUT', 'NETWORK']:
+        status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    elif error_type == 'INTERNAL':
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    
+    return Response(result, status=status_code)
+
+
+def _wants_async(request):
+    flag = request.data.get('async') if hasattr(request.data, 'get') else None
+    if flag is None:
+        flag = request.query_params.get('async')
+    if flag is None:
+        return getattr(settings, 'ROUTE_OPTIMIZE_ASYNC', False)
+    return str(flag).lower() in ('1', 'true', 'yes')
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def optimize_routes(request):
@@ -33,38 +60,45 @@ def optimize_routes(request):
     POST /api/logistics/optimize/
     
     Optimize cotton harvest routes using OpenRouteService API
+    ("solver": "local" solves in-process, same response shape).
+    A repeated request returns the stored solution ("cached": true).
+    
+    With "async": true (or ?async=1, default settings.ROUTE_OPTIMIZE_ASYNC) the
+    request is validated and queued: 202 {"jobId", "status", "progress", ...};
+    poll /api/logistics/optimize/jobs/<jobId>/ and fetch .../result/
+    (200 with "result" right away if the same request is already solved).
     
     Request body:
     {
+        "solver": "ors",
+        "async": false,
         "depot": {"lat": 43.0, "lon": 68.0},
         "vehicles": [
             {"id": 1, "name": "Truck 1", "capacity": 50, "shiftMinutes": 480}
         ],
         "fields": [
-            {"id": 1, "lat": 43.1, "lon": 68.1, "demand": 10, "serviceTimeMinutes": 30}
+            {"id": 1, "lat": 43.1, "lon": 68.1, "demand": 10, "serviceTimeMinutes": 30,
+             "timeWindow": [0, 240]}
         ]
     }
     """
     try:
         service = RouteOptimizationService()
+        
+        if _wants_async(request):
+            result = service.submit_optimization(request.data)
+            if 'error' in result:
+                return _optimization_error_response(result)
+            done = result['status'] == OptimizationJob.Status.DONE
+            return Response(result, status=status.HTTP_200_OK if done else status.HTTP_202_ACCEPTED)
+        
         result = service.optimize_routes(request.data)
         
         # Check if there's an error in the result
         if 'error' in result:
-            error_type = result.get('errorType', 'UNKNOWN')
-            status_code = status.HTTP_400_BAD_REQUEST
-            
-            if error_type == 'ORS':
-                status_code = result.get('statusCode', status.HTTP_502_BAD_GATEWAY)
-            elif error_type in ['TIMEOUT', 'NETWORK']:
-                status_code = status.HTTP_503_SERVICE_UNAVAILABLE
-            elif error_type == 'INTERNAL':
-                status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
-            
-            return Response(result, status=status_code)
+            return _optimization_error_response(result)
         
-        # Success - optionally save to database
-        # You can create an OptimizationJob record here if needed
+        # Success - the solution is stored as OptimizationJob result["jobId"]
         
         return Response(result, status=status.HTTP_200_OK)
         
@@ -78,6 +112,47 @@ def optimize_routes(request):
         )
 
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def optimization_job_status(request, job_id):
+    """
+    GET /api/logistics/optimize/jobs/<job_id>/
+    
+    Status of an optimization job:
+    {"jobId", "status": "pending|running|done|failed", "progress": 0-100,
+     "solver", "createdAt", "startedAt", "finishedAt", "error"}
+    """
+    job = get_object_or_404(OptimizationJob, id=job_id)
+    return Response(jobs.job_status(job), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def optimization_job_result(request, job_id):
+    """
+    GET /api/logistics/optimize/jobs/<job_id>/result/
+    
+    200 with the optimize response (request, orsRequest, orsSolution, solver,
+    jobId) once the job is done; 202 with the job status while it runs;
+    the job error (502 for ORS, 500 for the local solver) if it failed
+    """
+    job = get_object_or_404(OptimizationJob, id=job_id)
+    job_status = jobs.job_status(job, include_result=True)
+    
+    if job_status['status'] == OptimizationJob.Status.DONE:
+        return Response(job_status['result'], status=status.HTTP_200_OK)
+    if job_status['status'] == OptimizationJob.Status.FAILED:
+        return Response(
+            {
+                'error': job_status['error'],
+                'errorType': 'JOB_FAILED',
+                'jobId': job.id
+            },
+            status=status.HTTP_502_BAD_GATEWAY if job.solver == 'ors' else status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    return Response(job_status, status=status.HTTP_202_ACCEPTED)
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def ai_summary(request):
@@ -0,0 +1,575 @@
+"""
+Local vehicle routing solver (capacitated VRP with time windows).
+
+solve() takes the payload the ORS optimization endpoint gets (jobs with
+location/amount/service/time_windows, vehicles with start/end/capacity/
+time_window) and returns a solution in the ORS (VROOM) response shape, so
+RouteOptimizationService can switch to it with solver='local' and the
+frontend cannot tell the difference.
+
+Travel times come from matrix.travel_matrix() (cached haversine estimates or
+the ORS road matrix, see matrix.py). As in VROOM the objective is the total
+travel time.
+
+1. Construction - parallel cheapest insertion. Every vehicle keeps the cost
+   of the best feasible position of every unrouted job; after an insertion
+   only the route that changed is re-evaluated, vectorised over
+   jobs x positions.
+2. Local search until no move improves or the time limit runs out: 2-opt
+   inside a route, relocate a job to another route, exchange two jobs
+   between routes.
+
+Feasibility (capacity, job time windows, vehicle shift) uses the latest
+allowed start of every stop, so testing an insertion is O(1).
+"""
+import logging
+import math
+import time
+
+from .matrix import travel_matrix
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIME_LIMIT = 5.0   # seconds of local search
+NEIGHBOURS = 15            # nearest jobs considered for exchange moves
+EPS = 1e-6
+
+
+def encode_polyline(points, precision=5):
+    """Google encoded polyline of (lat, lon) points, the format ORS uses for `geometry`"""
+    factor = 10 ** precision
+    result = []
+    prev_lat = prev_lon = 0
+    for lat, lon in points:
+        ilat, ilon = round(lat * factor), round(lon * factor)
+        for delta in (ilat - prev_lat, ilon - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                result.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            result.append(chr(value + 63))
+        prev_lat, prev_lon = ilat, ilon
+    return ''.join(result)
+
+
+class Problem:
+    """
+    ORS payload as arrays.
+
+    Locations are deduplicated; a vehicle without `start` or `end` gets a
+    virtual location that is zero seconds away from everything (an open
+    route, as in VROOM).
+    """
+
+    def __init__(self, payload, matrix=travel_matrix):
+        import numpy as np
+
+        jobs = payload.get('jobs') or []
+        vehicles = payload.get('vehicles') or []
+        if not vehicles:
+            raise ValueError('At least one vehicle is required')
+
+        coords, index = [], {}
+
+        def loc(point):
+            key = (float(point[0]), float(point[1]))
+            if key not in index:
+                index[key] = len(coords)
+                coords.append(key)
+            return index[key]
+
+        self.job_ids = [job['id'] for job in jobs]
+        self.job_loc = np.array([loc(job['location']) for job in jobs], dtype=int)
+        self.service = np.array([float(job.get('service', 0)) for job in jobs])
+        dims = max([len(job.get('amount', ())) for job in jobs]
+                   + [len(v.get('capacity', ())) for v in vehicles] + [1])
+        self.amount = np.zeros((len(jobs), dims))
+        for j, job in enumerate(jobs):
+            amount = job.get('amount') or job.get('delivery') or []
+            self.amount[j, :len(amount)] = amount
+        # Одно окно на заказ: берем самое широкое из time_windows
+        windows = [job.get('time_windows') or [[0, math.inf]] for job in jobs]
+        self.early = np.array([min(w[0] for w in ws) for ws in windows], dtype=float)
+        self.late = np.array([max(w[1] for w in ws) for ws in windows], dtype=float)
+
+        self.vehicle_ids = [v.get('id', i + 1) for i, v in enumerate(vehicles)]
+        self.capacity = np.full((len(vehicles), dims), math.inf)
+        for i, v in enumerate(vehicles):
+            if 'capacity' in v:
+                self.capacity[i, :len(v['capacity'])] = v['capacity']
+                self.capacity[i, len(v['capacity']):] = 0.0
+        self.v_early = np.array([float((v.get('time_window') or [0, math.inf])[0]) for v in vehicles])
+        self.v_late = np.array([float((v.get('time_window') or [0, math.inf])[1]) for v in vehicles])
+
+        starts = [loc(v['start']) if v.get('start') else None for v in vehicles]
+        ends = [loc(v['end']) if v.get('end') else None for v in vehicles]
+        self.coords = coords
+
+        started = time.perf_counter()
+        durations, distances = matrix([list(c) for c in coords]) if coords else (np.zeros((0, 0)),) * 2
+        self.matrix_seconds = time.perf_counter() - started
+
+        # Virtual location for open routes: row/column of zeros
+        virtual = len(coords)
+        size = virtual + 1
+        self.T = np.zeros((size, size))
+        self.D = np.zeros((size, size))
+        self.T[:virtual, :virtual] = durations
+        self.D[:virtual, :virtual] = distances
+        self.v_start = np.array([virtual if s is None else s for s in starts], dtype=int)
+        self.v_end = np.array([virtual if e is None else e for e in ends], dtype=int)
+        self.virtual = virtual
+
+    @property
+    def n_jobs(self):
+        return len(self.job_ids)
+
+    @property
+    def n_vehicles(self):
+        return len(self.vehicle_ids)
+
+    def nodes(self, v, route):
+        """Locations visited by vehicle v: start, jobs, end"""
+        return [int(self.v_start[v])] + [int(self.job_loc[j]) for j in route] + [int(self.v_end[v])]
+
+    def schedule(self, v, route):
+        """
+        Simulate the route.
+
+        Returns:
+            dict or None (infeasible): arrival/start times per job, end
+            time, travel time and waiting time
+        """
+        T = self.T
+        t = self.v_early[v]
+        prev = self.v_start[v]
+        arrivals, starts = [], []
+        travel = waiting = 0.0
+        for j in route:
+            loc = self.job_loc[j]
+            leg = T[prev, loc]
+            arrival = t + leg
+            start = max(arrival, self.early[j])
+            if start > self.late[j] + EPS:
+                return None
+            travel += leg
+            waiting += start - arrival
+            arrivals.append(arrival)
+            starts.append(start)
+            t = start + self.service[j]
+            prev = loc
+        leg = T[prev, self.v_end[v]]
+        end = t + leg
+        if end > self.v_late[v] + EPS:
+            return None
+        travel += leg
+        return {'arrivals': arrivals, 'starts': starts, 'end': end, 'travel': travel, 'waiting': waiting}
+
+    def load(self, route):
+        return self.amount[route].sum(axis=0) if route else self.amount[:0].sum(axis=0)
+
+    def fits(self, v, load):
+        return bool((load <= self.capacity[v] + EPS).all())
+
+    def insertion_costs(self, v, route, jobs):
+        """
+        Cheapest feasible insertion of each job into the route of vehicle v.
+
+        Returns:
+            (cost, position): arrays over `jobs`; cost is the added travel
+            time (inf when no position is feasible)
+        """
+        import numpy as np
+
+        jobs = np.asarray(jobs, dtype=int)
+        if len(jobs) == 0:
+            return np.zeros(0), np.zeros(0, dtype=int)
+
+        T = self.T
+        nodes = np.array(self.nodes(v, route))
+        size = len(route)
+
+        # Departure from every node before the gap, latest start at every node after it
+        depart = np.empty(size + 1)
+        depart[0] = self.v_early[v]
+        latest = np.empty(size + 2)
+        latest[size + 1] = self.v_late[v]
+        early_next = np.full(size + 1, -math.inf)
+        t = self.v_early[v]
+        for k, j in enumerate(route, start=1):
+            t = max(t + T[nodes[k - 1], nodes[k]], self.early[j])
+            t += self.service[j]
+            depart[k] = t
+            early_next[k - 1] = self.early[j]
+        for k in range(size, 0, -1):
+            j = route[k - 1]
+            latest[k] = min(self.late[j], latest[k + 1] - T[nodes[k], nodes[k + 1]] - self.service[j])
+
+        prev, nxt = nodes[:-1], nodes[1:]
+        loc = self.job_loc[jobs]
+        to_job = T[prev[:, None], loc[None, :]]
+        from_job = T[loc[None, :], nxt[:, None]]
+
+        start = np.maximum(depart[:, None] + to_job, self.early[jobs][None, :])
+        ok = start <= self.late[jobs][None, :] + EPS
+        next_start = np.maximum(start + self.service[jobs][None, :] + from_job, early_next[:, None])
+        ok &= next_start <= latest[1:, None] + EPS
+
+        delta = np.where(ok, to_job + from_job - T[prev, nxt][:, None], math.inf)
+        position = delta.argmin(axis=0)
+        cost = delta[position, np.arange(len(jobs))]
+
+        fits = (self.load(route)[None, :] + self.amount[jobs] <= self.capacity[v][None, :] + EPS).all(axis=1)
+        cost[~fits] = math.inf
+        return cost, position
+
+
+class Solver:
+    """Construction + local search over a Problem; routes[v] is a list of job indices"""
+
+    def __init__(self, problem, time_limit=DEFAULT_TIME_LIMIT, progress=None):
+        self.p = problem
+        self.time_limit = time_limit
+        self.progress = progress
+        self.routes = [[] for _ in range(problem.n_vehicles)]
+        self.unassigned = set(range(problem.n_jobs))
+        self.stats = {'moves': {'2opt': 0, 'relocate': 0, 'exchange': 0}}
+
+    def route_cost(self, v, route=None):
+        route = self.routes[v] if route is None else route
+        if not route:
+            return 0.0
+        nodes = self.p.nodes(v, route)
+        return float(self.p.T[nodes[:-1], nodes[1:]].sum())
+
+    def total_cost(self):
+        return sum(self.route_cost(v) for v in range(self.p.n_vehicles))
+
+    # --- Construction ---
+
+    def construct(self):
+        """Parallel cheapest insertion of every unassigned job"""
+        import numpy as np
+
+        p = self.p
+        todo = np.array(sorted(self.unassigned), dtype=int)
+        if len(todo) == 0:
+            return
+        cost = np.full((p.n_vehicles, len(todo)), math.inf)
+        position = np.zeros((p.n_vehicles, len(todo)), dtype=int)
+        for v in range(p.n_vehicles):
+            cost[v], position[v] = p.insertion_costs(v, self.routes[v], todo)
+
+        pending = np.ones(len(todo), dtype=bool)
+        while pending.any():
+            flat = int(cost.argmin())
+            v, c = divmod(flat, len(todo))
+            if not math.isfinite(cost[v, c]):
+                break
+            j = int(todo[c])
+            self.routes[v].insert(int(position[v, c]), j)
+            self.unassigned.discard(j)
+            pending[c] = False
+            cost[:, c] = math.inf
+
+            rest = np.flatnonzero(pending)
+            cost[v, rest], position[v, rest] = p.insertion_costs(v, self.routes[v], todo[rest])
+
+    # --- Local search ---
+
+    def two_opt(self, v):
+        """Reverse route segments while that shortens the route"""
+        import numpy as np
+
+        p = self.p
+        improved = False
+        while True:
+            route = self.routes[v]
+            size = len(route)
+            if size < 3:
+                return improved
+            nodes = np.array(p.nodes(v, route))
+            a, b = nodes[:-1], nodes[1:]
+            edge = p.T[a, b]
+            # Reverse route[i:k]: edges (a_i, b_i) and (a_k, b_k) -> (a_i, a_k) and (b_i, b_k)
+            delta = p.T[a[:, None], a[None, :]] + p.T[b[:, None], b[None, :]] - edge[:, None] - edge[None, :]
+            delta[np.tril_indices(size + 1, 1)] = 0.0
+            candidates = np.argwhere(delta < -EPS)
+            if len(candidates) == 0:
+                return improved
+            order = np.argsort(delta[candidates[:, 0], candidates[:, 1]])
+            current = self.route_cost(v)
+            for i, k in candidates[order[:20]]:
+                new_route = route[:i] + route[i:k][::-1] + route[k:]
+                if p.schedule(v, new_route) and self.route_cost(v, new_route) < current - EPS:
+                    self.routes[v] = new_route
+                    self.stats['moves']['2opt'] += 1
+                    improved = True
+                    break
+            else:
+                return improved
+
+    def _removal_gains(self):
+        """Travel time saved by taking each routed job out of its route -> {job: (v, pos, gain)}"""
+        T = self.p.T
+        gains = {}
+        for v, route in enumerate(self.routes):
+            nodes = self.p.nodes(v, route)
+            for pos, j in enumerate(route):
+                prev, loc, nxt = nodes[pos], nodes[pos + 1], nodes[pos + 2]
+                gains[j] = (v, pos, T[prev, loc] + T[loc, nxt] - T[prev, nxt])
+        return gains
+
+    def relocate(self, deadline):
+        """Move single jobs to the route where they cost less"""
+        import numpy as np
+
+        p = self.p
+        improved = False
+        for target in range(p.n_vehicles):
+            if time.perf_counter() > deadline:
+                break
+            while True:
+                gains = self._removal_gains()
+                movable = [j for j, (v, _, _) in gains.items() if v != target]
+                if not movable:
+                    break
+                cost, position = p.insertion_costs(target, self.routes[target], movable)
+                saving = np.array([gains[j][2] for j in movable]) - cost
+                best = int(saving.argmax())
+                if saving[best] <= EPS:
+                    break
+                j = movable[best]
+                source, pos, _ = gains[j]
+                shorter = self.routes[source][:pos] + self.routes[source][pos + 1:]
+                if not p.schedule(source, shorter):
+                    break
+                self.routes[source] = shorter
+                self.routes[target].insert(int(position[best]), j)
+                self.stats['moves']['relocate'] += 1
+                improved = True
+        return improved
+
+    def exchange(self, deadline):
+        """Swap two jobs of different routes when both routes get cheaper in total"""
+        import numpy as np
+
+        p = self.p
+        T = p.T
+        improved = False
+        where = {j: (v, pos) for v, route in enumerate(self.routes) for pos, j in enumerate(route)}
+        if len(where) < 2:
+            return False
+        routed = np.array(sorted(where), dtype=int)
+        loc = p.job_loc[routed]
+        k = min(NEIGHBOURS, len(routed) - 1)
+        near = np.argpartition(T[loc[:, None], loc[None, :]], k, axis=1)[:, :k + 1]
+
+        for row, j in enumerate(routed):
+            if time.perf_counter() > deadline:
+                break
+            for col in near[row]:
+                other = int(routed[col])
+                va, pa = where[j]
+                vb, pb = where[other]
+                if va == vb:
+                    continue
+                ra, rb = self.routes[va], self.routes[vb]
+                na, nb = p.nodes(va, ra), p.nodes(vb, rb)
+                lj, lo = p.job_loc[j], p.job_loc[other]
+                delta = (T[na[pa], lo] + T[lo, na[pa + 2]] - T[na[pa], lj] - T[lj, na[pa + 2]]
+                         + T[nb[pb], lj] + T[lj, nb[pb + 2]] - T[nb[pb], lo] - T[lo, nb[pb + 2]])
+                if delta >= -EPS:
+                    continue
+                new_a = ra[:pa] + [other] + ra[pa + 1:]
+                new_b = rb[:pb] + [j] + rb[pb + 1:]
+                if not (p.fits(va, p.load(new_a)) and p.fits(vb, p.load(new_b))):
+                    continue
+                if not (p.schedule(va, new_a) and p.schedule(vb, new_b)):
+                    continue
+                self.routes[va], self.routes[vb] = new_a, new_b
+                where[j], where[other] = (vb, pb), (va, pa)
+                self.stats['moves']['exchange'] += 1
+                improved = True
+                break
+        return improved
+
+    def report(self, fraction):
+        if self.progress is not None:
+            self.progress(min(max(fraction, 0.0), 1.0))
+
+    def solve(self):
+        started = time.perf_counter()
+        self.construct()
+        constructed = time.perf_counter()
+        self.stats['construction_cost'] = self.total_cost()
+        # Построение ~ первые 20%, дальше доля израсходованного времени поиска
+        self.report(0.2)
+
+        deadline = started + self.time_limit
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for v in range(self.p.n_vehicles):
+                improved |= self.two_opt(v)
+            improved |= self.relocate(deadline)
+            improved |= self.exchange(deadline)
+            if self.unassigned:
+                before = len(self.unassigned)
+                self.construct()
+                improved |= len(self.unassigned) < before
+            self.report(0.2 + 0.8 * (time.perf_counter() - started) / max(self.time_limit, EPS))
+
+        self.stats['construction_seconds'] = constructed - started
+        self.stats['search_seconds'] = time.perf_counter() - constructed
+        self.stats['cost'] = self.total_cost()
+        return self.routes
+
+
+def build_solution(problem, routes, unassigned, computing_times):
+    """Routes -> ORS/VROOM optimization response"""
+    p = problem
+    dims = p.amount.shape[1]
+    zero = [0] * dims
+
+    def location(loc):
+        return list(p.coords[loc]) if loc != p.virtual else None
+
+    def as_int(values):
+        return [int(round(x)) for x in values]
+
+    solution_routes = []
+    for v, route in enumerate(routes):
+        if not route:
+            continue
+        plan = p.schedule(v, route)
+        delivery = as_int(p.load(route))
+        nodes = p.nodes(v, route)
+        load = list(delivery)
+        duration = distance = 0.0
+        steps = []
+
+        start_loc = nodes[0]
+        step = {'type': 'start', 'setup': 0, 'service': 0, 'waiting_time': 0, 'load': list(load),
+                'arrival': int(round(p.v_early[v])), 'duration': 0, 'distance': 0, 'violations': []}
+        if location(start_loc):
+            step['location'] = location(start_loc)
+        steps.append(step)
+
+        for pos, j in enumerate(route):
+            prev, loc = nodes[pos], nodes[pos + 1]
+            duration += p.T[prev, loc]
+            distance += p.D[prev, loc]
+            load = [a - b for a, b in zip(load, as_int(p.amount[j]))]
+            steps.append({
+                'type': 'job',
+                'location': location(loc),
+                'id': p.job_ids[j],
+                'job': p.job_ids[j],
+                'setup': 0,
+                'service': int(round(p.service[j])),
+                'waiting_time': int(round(plan['starts'][pos] - plan['arrivals'][pos])),
+                'load': list(load),
+                'arrival': int(round(plan['arrivals'][pos])),
+                'duration': int(round(duration)),
+                'distance': int(round(distance)),
+                'violations': [],
+            })
+
+        duration += p.T[nodes[-2], nodes[-1]]
+        distance += p.D[nodes[-2], nodes[-1]]
+        step = {'type': 'end', 'setup': 0, 'service': 0, 'waiting_time': 0, 'load': list(load),
+                'arrival': int(round(plan['end'])), 'duration': int(round(duration)),
+                'distance': int(round(distance)), 'violations': []}
+        if location(nodes[-1]):
+            step['location'] = location(nodes[-1])
+        steps.append(step)
+
+        points = [(s['location'][1], s['location'][0]) for s in steps if s.get('location')]
+        solution_routes.append({
+            'vehicle': p.vehicle_ids[v],
+            'cost': int(round(duration)),
+            'delivery': delivery,
+            'amount': delivery,
+            'pickup': list(zero),
+            'setup': 0,
+            'service': int(round(p.service[route].sum())),
+            'duration': int(round(duration)),
+            'waiting_time': int(round(plan['waiting'])),
+            'priority': 0,
+            'distance': int(round(distance)),
+            'steps': steps,
+            'violations': [],
+            'geometry': encode_polyline(points),
+        })
+
+    def total(key):
+        return sum(r[key] for r in solution_routes)
+
+    delivered = [sum(r['delivery'][d] for r in solution_routes) for d in range(dims)]
+    return {
+        'code': 0,
+        'summary': {
+            'cost': total('cost'),
+            'routes': len(solution_routes),
+            'unassigned': len(unassigned),
+            'delivery': delivered,
+            'amount': delivered,
+            'pickup': list(zero),
+            'setup': 0,
+            'service': total('service'),
+            'duration': total('duration'),
+            'waiting_time': total('waiting_time'),
+            'priority': 0,
+            'distance': total('distance'),
+            'violations': [],
+            'computing_times': computing_times,
+        },
+        'unassigned': [
+            {'id': p.job_ids[j], 'location': location(p.job_loc[j]), 'type': 'job'}
+            for j in sorted(unassigned)
+        ],
+        'routes': solution_routes,
+    }
+
+
+def solve(payload, time_limit=DEFAULT_TIME_LIMIT, matrix=travel_matrix, progress=None):
+    """
+    Solve an ORS optimization payload locally.
+
+    Args:
+        payload: {'jobs': [...], 'vehicles': [...]} as sent to ORS /optimization
+        time_limit: seconds of local search on top of the construction
+        matrix: callable([[lon, lat], ...]) -> (durations, distances)
+        progress: optional callable(fraction 0..1), called after construction
+            and after every local search round
+
+    Returns:
+        dict: solution in the ORS response shape, plus `solver` stats
+    """
+    started = time.perf_counter()
+    problem = Problem(payload, matrix=matrix)
+    loaded = time.perf_counter()
+
+    solver = Solver(problem, time_limit=time_limit, progress=progress)
+    routes = solver.solve()
+    solved = time.perf_counter()
+
+    solution = build_solution(problem, routes, solver.unassigned, {
+        'loading': int((loaded - started) * 1000),
+        'solving': int((solved - loaded) * 1000),
+        'routing': int(problem.matrix_seconds * 1000),
+    })
+    construction = solver.stats['construction_cost']
+    solution['solver'] = {
+        'name': 'local',
+        'construction_cost': int(round(construction)),
+        'improvement': round(1 - solver.stats['cost'] / construction, 4) if construction else 0.0,
+        'moves': solver.stats['moves'],
+    }
+    logger.info(
+        f"Local VRP: {problem.n_jobs} jobs, {problem.n_vehicles} vehicles -> "
+        f"{solution['summary']['routes']} routes, {len(solver.unassigned)} unassigned, "
+        f"{solution['summary']['computing_times']['solving']} ms"
+    )
+    return solution
@@ -1,7 +1,5 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
 from datetime import datetime, timedelta
 
 class MarketAnalyzer:
@@ -15,6 +13,10 @@ class MarketAnalyzer:
     def get_data_with_forecast(self, asset_type='cotton', days_forecast=30):
         ticker = self.tickers.get(asset_type, 'CT=F')
         
+        # yfinance и sklearn импортируем лениво: они тяжелые и нужны только этому запросу
+        import yfinance as yf
+        from sklearn.linear_model import LinearRegression
+
         # 1. Скачиваем данные
         # multi_level_index=False помогает избежать сложных заголовков в новых версиях yf
         try:
@@ -1,21 +1,59 @@
 """
 Real-time Sensor Data Simulation
-Continuously generates and stores sensor data for factory machines
-Run this script in the background while the Django server is running
+Continuously generates and stores sensor data for factory machines, field
+sensors, workers and GPS-tracked vehicles. Run it next to the Django server
+to watch the dashboards move, or with thousands of entities to load-test the
+ingest path before harvest season.
+
+Usage:
+    python realtime_simulation.py
+        existing machines, one reading every 3 seconds (the classic demo)
+    python realtime_simulation.py --machines 2000 --fields 500 --workers 300 --vehicles 100 \\
+        --machine-interval 1 --duration 300
+        simulated fleet written through the ORM (same code paths as the APIs)
+    python realtime_simulation.py --http http://localhost:8000 --token <token> --machines 2000 --concurrency 16
+        the same load posted over HTTP with a pooled session
+
+Entities named LoadGen-* are created in the configured database on first use
+(so for --http the script must point at the server's database);
+--cleanup removes them and everything they wrote.
 """
 
+import argparse
 import os
-import django
-import time
 import random
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 
+import django
+
 # Setup Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
-from factory.models import Machine
-from factory.ml_service import analyze_machine_health
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from agronomy.models import Field, SensorLog
+from agronomy.signals import run_water_ai
+from factory.models import Machine, MachineHealthState
+from factory.services import ingest_telemetry
+from logistics.models import GPSLog, Vehicle
+from safety.models import Worker, WorkerHealthMetrics
+
+LOADGEN_PREFIX = 'LoadGen'
+# Worker IDs of simulated workers start here so they never clash with real badges
+LOADGEN_WORKER_ID = 900000
+# Depot of the cotton cluster; vehicles wander around it
+DEPOT = (43.0, 68.0)
+# Machine status table is printed for small fleets only
+STATUS_TABLE_MAX = 20
+
+STREAMS = ('machines', 'sensors', 'workers', 'vehicles')
+
 
 def simulate_sensor_reading(machine):
     """Generate realistic sensor readings with slight variations"""
@@ -24,12 +62,12 @@ def simulate_sensor_reading(machine):
     vibration_base = 0.15 + random.uniform(-0.05, 0.15)
     motor_load_base = 45 + random.uniform(-10, 20)
     humidity_base = 60 + random.uniform(-10, 15)
-    
+
     # Add occasional anomalies (5% chance)
     if random.random() < 0.05:
         temp_base += random.uniform(10, 20)  # Overheat
         vibration_base += random.uniform(0.1, 0.3)  # High vibration
-    
+
     return {
         'temperature': round(temp_base, 2),
         'vibration': round(vibration_base, 3),
@@ -37,64 +75,396 @@ def simulate_sensor_reading(machine):
         'humidity': round(humidity_base, 1)
     }
 
-def update_machine_data(machine, sensor_data):
-    """Update machine with new sensor readings"""
-    machine.last_temp = sensor_data['temperature']
-    machine.last_vibration = sensor_data['vibration']
-    machine.last_motor_load = sensor_data['motor_load']
-    machine.last_humidity = sensor_data['humidity']
-    machine.timestamp = datetime.now()
-    machine.save()
-    
-    # Analyze health and create maintenance log if needed
-    analyze_machine_health(machine)
 
-def main():
-    """Main simulation loop"""
-    print("🚀 Starting real-time factory sensor simulation...")
-    print("Press Ctrl+C to stop")
-    
-    # Get all machines
-    machines = list(Machine.objects.all())
-    
-    if not machines:
-        print("⚠️  No machines found in database. Run migrations and create machines first.")
+def simulate_field_reading(field):
+    """Soil/weather probe of a field"""
+    return {
+        'field': field.pk,
+        'soil_moisture': round(random.uniform(15, 45), 1),
+        'weather_temp': round(random.uniform(18, 38), 1),
+        'air_humidity': round(random.uniform(20, 70), 1),
+        'rain_probability': round(random.uniform(0, 40), 1),
+    }
+
+
+def simulate_worker_reading(worker):
+    """Wearable snapshot of a worker"""
+    return {
+        'worker': worker.pk,
+        'heart_rate': round(random.gauss(80, 8), 1),
+        'spo2': random.randint(95, 99),
+        'temp_c': round(random.gauss(36.7, 0.2), 1),
+        'hrv': round(random.gauss(50, 8), 1),
+        'steps': random.randint(0, 12000),
+        'activity_level': random.randint(0, 10),
+        'noise_level': round(random.uniform(55, 90), 1),
+        'latitude': round(random.uniform(0, 100), 2),
+        'longitude': round(random.uniform(0, 100), 2),
+        'altitude': round(random.uniform(0, 3), 2),
+    }
+
+
+class VehicleTracker:
+    """Random-walk GPS positions around the depot"""
+
+    def __init__(self, vehicles):
+        self.positions = {
+            v.pk: (DEPOT[0] + random.uniform(-0.3, 0.3), DEPOT[1] + random.uniform(-0.3, 0.3))
+            for v in vehicles
+        }
+
+    def reading(self, vehicle):
+        lat, lon = self.positions[vehicle.pk]
+        lat, lon = lat + random.uniform(-0.001, 0.001), lon + random.uniform(-0.001, 0.001)
+        self.positions[vehicle.pk] = (lat, lon)
+        return {
+            'vehicle': vehicle.pk,
+            'latitude': round(lat, 6),
+            'longitude': round(lon, 6),
+            'speed': round(random.uniform(0, 60), 1),
+        }
+
+
+def ensure_entities(options):
+    """Existing machines for the classic run, LoadGen-* entities when counts are given"""
+    entities = {}
+
+    if options.machines is None:
+        entities['machines'] = list(Machine.objects.all())
+    else:
+        entities['machines'] = _ensure(
+            Machine.objects.filter(name__startswith=LOADGEN_PREFIX), options.machines,
+            lambda i: Machine(name=f'{LOADGEN_PREFIX}-{i}', machine_type='Gin'),
+        )
+
+    owner = None
+    if options.fields:
+        owner, _ = get_user_model().objects.get_or_create(username=LOADGEN_PREFIX.lower())
+    entities['sensors'] = _ensure(
+        Field.objects.filter(name__startswith=LOADGEN_PREFIX), options.fields,
+        lambda i: Field(name=f'{LOADGEN_PREFIX}-{i}', owner=owner),
+    )
+    entities['workers'] = _ensure(
+        Worker.objects.filter(worker_id__gte=LOADGEN_WORKER_ID), options.workers,
+        lambda i: Worker(worker_id=LOADGEN_WORKER_ID + i, name=f'{LOADGEN_PREFIX}-{i}', role='Operator'),
+    )
+    entities['vehicles'] = _ensure(
+        Vehicle.objects.filter(plate_number__startswith='LG-'), options.vehicles,
+        lambda i: Vehicle(plate_number=f'LG-{i:05d}'),
+    )
+    return entities
+
+
+def _ensure(queryset, count, make):
+    """First `count` objects of queryset, creating the missing ones in bulk"""
+    if not count:
+        return []
+    existing = list(queryset.order_by('pk')[:count])
+    missing = [make(i) for i in range(len(existing), count)]
+    if missing:
+        queryset.model.objects.bulk_create(missing, batch_size=1000)
+        existing = list(queryset.order_by('pk')[:count])
+    return existing
+
+
+def cleanup():
+    """Delete LoadGen-* entities; their readings go with them (CASCADE)"""
+    deleted = Counter()
+    for queryset in (
+        Machine.objects.filter(name__startswith=LOADGEN_PREFIX),
+        Field.objects.filter(name__startswith=LOADGEN_PREFIX),
+        Worker.objects.filter(worker_id__gte=LOADGEN_WORKER_ID),
+        Vehicle.objects.filter(plate_number__startswith='LG-'),
+        get_user_model().objects.filter(username=LOADGEN_PREFIX.lower()),
+    ):
+        deleted.update(queryset.delete()[1])
+    return {model: count for model, count in deleted.items() if count}
+
+
+class OrmSink:
+    """
+    Writes through the ORM: the same service functions/tables the APIs use.
+    Rows are stored with bulk_create, so the per-row work the API gets from
+    model signals (the SensorLog watering analysis) is called explicitly.
+    """
+
+    transport = 'orm'
+
+    def supports(self, stream):
+        return True
+
+    def send(self, stream, records):
+        """Store one request's worth of records; returns the number of alerts raised"""
+        if stream == 'machines':
+            _, _, errors, alerts = ingest_telemetry(records)
+            if errors:
+                raise ValueError(errors[0])
+            return len(alerts)
+        if stream == 'sensors':
+            logs = [SensorLog(field_id=r['field'], **{k: v for k, v in r.items() if k != 'field'}) for r in records]
+            # bulk_create skips pre_save: run the API's per-reading watering analysis here
+            for log in logs:
+                run_water_ai(SensorLog, log)
+            SensorLog.objects.bulk_create(logs)
+        elif stream == 'workers':
+            WorkerHealthMetrics.objects.bulk_create([
+                WorkerHealthMetrics(worker_id=r['worker'], **{k: v for k, v in r.items() if k != 'worker'})
+                for r in records
+            ])
+        elif stream == 'vehicles':
+            GPSLog.objects.bulk_create([
+                GPSLog(vehicle_id=r['vehicle'], **{k: v for k, v in r.items() if k != 'vehicle'}) for r in records
+            ])
+        return 0
+
+
+class HttpSink:
+    """
+    Posts to the running server over one pooled keep-alive session.
+
+    Machine telemetry goes through the bulk endpoint; field sensors and worker
+    metrics only have per-object create endpoints (one request per reading).
+    GPS logs have no write API, so that stream is not available over HTTP.
+    """
+
+    transport = 'http'
+    BULK_ENDPOINTS = {
+        'machines': '/api/factory/machines/telemetry/bulk/',
+    }
+    OBJECT_ENDPOINTS = {
+        'sensors': '/api/agronomy/sensors/',
+        'workers': '/api/safety/health-metrics/',
+    }
+
+    def __init__(self, base_url, token=None, pool_size=10, timeout=30):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if token:
+            self.session.headers['Authorization'] = f'Token {token}'
+
+    def supports(self, stream):
+        return stream in self.BULK_ENDPOINTS or stream in self.OBJECT_ENDPOINTS
+
+    def send(self, stream, records):
+        if stream in self.BULK_ENDPOINTS:
+            response = self.session.post(self.base_url + self.BULK_ENDPOINTS[stream], json=records,
+                                         timeout=self.timeout)
+            response.raise_for_status()
+            return len(response.json().get('alerts') or [])
+        for record in records:
+            response = self.session.post(self.base_url + self.OBJECT_ENDPOINTS[stream], json=record,
+                                         timeout=self.timeout)
+            response.raise_for_status()
+        return 0
+
+    def request_size(self, stream, batch_size):
+        return batch_size if stream in self.BULK_ENDPOINTS else 1
+
+
+class Stats:
+    """Thread-safe per-stream counters and request latencies"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency_ms = defaultdict(list)
+        self.records = Counter()
+        self.requests = Counter()
+        self.errors = Counter()
+        self.alerts = Counter()
+        self.late_rounds = Counter()
+        self.last_error = {}
+
+    def record(self, stream, records, seconds, alerts=0, error=None):
+        with self.lock:
+            self.requests[stream] += 1
+            self.latency_ms[stream].append(seconds * 1000)
+            if error is None:
+                self.records[stream] += records
+                self.alerts[stream] += alerts
+            else:
+                self.errors[stream] += 1
+                self.last_error[stream] = error
+
+    def snapshot(self):
+        with self.lock:
+            return Counter(self.records), Counter(self.requests)
+
+    def report(self, elapsed):
+        import numpy as np
+
+        lines = []
+        with self.lock:
+            for stream in STREAMS:
+                if not self.requests[stream]:
+                    continue
+                p50, p95, p99 = np.percentile(self.latency_ms[stream], [50, 95, 99])
+                lines.append(
+                    f"  {stream:<9} {self.records[stream]:>9,} records {self.records[stream] / elapsed:>9,.0f}/s | "
+                    f"{self.requests[stream]:>6,} requests p50 {p50:7.1f} ms p95 {p95:7.1f} ms p99 {p99:7.1f} ms | "
+                    f"{self.errors[stream]} errors, {self.alerts[stream]} alerts, {self.late_rounds[stream]} late rounds"
+                )
+                if stream in self.last_error:
+                    lines.append(f"            last error: {self.last_error[stream]}")
+        return lines
+
+
+def timed_send(sink, stats, stream, records):
+    start = time.perf_counter()
+    try:
+        alerts = sink.send(stream, records)
+    except Exception as e:
+        stats.record(stream, len(records), time.perf_counter() - start, error=str(e)[:200])
+    else:
+        stats.record(stream, len(records), time.perf_counter() - start, alerts=alerts)
+
+
+def build_round(stream, entities, tracker):
+    """One reading per entity of the stream"""
+    now = timezone.now().isoformat()
+    if stream == 'machines':
+        return [{'machine_id': m.pk, 'timestamp': now, **simulate_sensor_reading(m)} for m in entities]
+    if stream == 'sensors':
+        return [simulate_field_reading(f) for f in entities]
+    if stream == 'workers':
+        return [simulate_worker_reading(w) for w in entities]
+    return [tracker.reading(v) for v in entities]
+
+
+def print_status_table(machines, records):
+    """Status per machine (classic demo output), for small fleets"""
+    health = MachineHealthState.objects.in_bulk([m.pk for m in machines])
+    print(f"\n[{datetime.now():%H:%M:%S}]")
+    print("-" * 60)
+    for machine, sensor_data in zip(machines, records):
+        state = health.get(machine.pk)
+        status_emoji = "🔴" if state and state.alarm else "🟡" if state and state.probability_failure >= 25 else "🟢"
+        print(f"{status_emoji} {machine.name:<20} | "
+              f"T: {sensor_data['temperature']:6.2f}°C | "
+              f"V: {sensor_data['vibration']:5.3f}G | "
+              f"L: {sensor_data['motor_load']:5.1f}% | "
+              f"H: {sensor_data['humidity']:5.1f}%")
+
+
+def run(options):
+    entities = ensure_entities(options)
+    if options.http:
+        sink = HttpSink(options.http, options.token, pool_size=options.concurrency)
+    else:
+        sink = OrmSink()
+
+    intervals = {
+        'machines': options.machine_interval,
+        'sensors': options.sensor_interval,
+        'workers': options.worker_interval,
+        'vehicles': options.vehicle_interval,
+    }
+    streams = []
+    for stream in STREAMS:
+        if not entities[stream]:
+            continue
+        if not sink.supports(stream):
+            print(f"⚠️  {stream}: no write API for {sink.transport}, stream skipped")
+            continue
+        streams.append(stream)
+    if not streams:
+        print("⚠️  Nothing to simulate. Create machines first or pass --machines/--fields/--workers/--vehicles.")
         return
-    
-    print(f"✅ Found {len(machines)} machines")
-    print(f"📊 Generating sensor data every 3 seconds...\n")
-    
-    iteration = 0
-    
+
+    for stream in streams:
+        print(f"✅ {len(entities[stream])} {stream}, one reading each every {intervals[stream]:g}s")
+    print(f"📡 Writing through {sink.transport.upper()} with {options.concurrency} concurrent requests "
+          f"(Ctrl+C to stop)\n")
+
+    tracker = VehicleTracker(entities['vehicles'])
+    stats = Stats()
+    executor = ThreadPoolExecutor(max_workers=options.concurrency)
+    in_flight = {stream: [] for stream in streams}
+    start = time.monotonic()
+    next_due = {stream: start for stream in streams}
+    next_report = start + options.report_every
+    last_records = Counter()
+    machine_rounds = 0
+
     try:
-        while True:
-            iteration += 1
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            
-            print(f"\n[{timestamp}] Iteration #{iteration}")
-            print("-" * 60)
-            
-            for machine in machines:
-                # Generate sensor readings
-                sensor_data = simulate_sensor_reading(machine)
-                
-                # Update machine
-                update_machine_data(machine, sensor_data)
-                
-                # Display status
-                status_emoji = "🟢" if machine.status == "ONLINE" else "🟡" if machine.status == "WARNING" else "🔴"
-                print(f"{status_emoji} {machine.name:<20} | "
-                      f"T: {sensor_data['temperature']:6.2f}°C | "
-                      f"V: {sensor_data['vibration']:5.3f}G | "
-                      f"L: {sensor_data['motor_load']:5.1f}% | "
-                      f"H: {sensor_data['humidity']:5.1f}%")
-            
-            # Wait before next iteration
-            time.sleep(3)
-            
+        while not options.duration or time.monotonic() - start < options.duration:
+            stream = min(streams, key=next_due.get)
+            time.sleep(max(0.0, next_due[stream] - time.monotonic()))
+
+            # Back-pressure: the previous round must finish before the next one starts
+            if not all(f.done() for f in in_flight[stream]):
+                stats.late_rounds[stream] += 1
+                wait(in_flight[stream])
+            next_due[stream] = max(next_due[stream] + intervals[stream], time.monotonic())
+
+            records = build_round(stream, entities[stream], tracker)
+            size = sink.request_size(stream, options.batch_size) if sink.transport == 'http' else options.batch_size
+            in_flight[stream] = [
+                executor.submit(timed_send, sink, stats, stream, records[i:i + size])
+                for i in range(0, len(records), size)
+            ]
+
+            if stream == 'machines':
+                machine_rounds += 1
+                if len(entities['machines']) <= STATUS_TABLE_MAX and sink.transport == 'orm':
+                    wait(in_flight[stream])
+                    print_status_table(entities['machines'], records)
+
+            now = time.monotonic()
+            if now >= next_report:
+                totals, _ = stats.snapshot()
+                rates = ", ".join(
+                    f"{s} {(totals[s] - last_records[s]) / options.report_every:,.0f}/s" for s in streams
+                )
+                print(f"[{datetime.now():%H:%M:%S}] {rates}")
+                last_records = totals
+                next_report = now + options.report_every
     except KeyboardInterrupt:
         print("\n\n⏹️  Simulation stopped by user")
-        print(f"✅ Generated {iteration} iterations of sensor data")
+
+    for futures in in_flight.values():
+        wait(futures)
+    executor.shutdown()
+    elapsed = time.monotonic() - start
+
+    print(f"\n✅ Generated {machine_rounds} rounds of machine data in {elapsed:.0f}s")
+    for line in stats.report(elapsed):
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Factory/field sensor simulation and load generator")
+    parser.add_argument('--machines', type=int, default=None,
+                        help='Simulated LoadGen machines (default: all existing machines)')
+    parser.add_argument('--fields', type=int, default=0, help='Simulated field sensor probes')
+    parser.add_argument('--workers', type=int, default=0, help='Simulated workers with wearables')
+    parser.add_argument('--vehicles', type=int, default=0, help='Simulated GPS-tracked vehicles')
+    parser.add_argument('--machine-interval', type=float, default=3, help='Seconds between machine readings')
+    parser.add_argument('--sensor-interval', type=float, default=60, help='Seconds between field sensor readings')
+    parser.add_argument('--worker-interval', type=float, default=5, help='Seconds between worker readings')
+    parser.add_argument('--vehicle-interval', type=float, default=5, help='Seconds between GPS fixes')
+    parser.add_argument('--duration', type=float, default=0, help='Stop after N seconds (default: run until Ctrl+C)')
+    parser.add_argument('--http', metavar='URL', help='Post to this server instead of writing through the ORM')
+    parser.add_argument('--token', help='API token for --http (Authorization: Token ...)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight at once')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Records per bulk request')
+    parser.add_argument('--report-every', type=float, default=10, help='Seconds between throughput lines')
+    parser.add_argument('--cleanup', action='store_true', help='Delete LoadGen-* entities and their data, then exit')
+    options = parser.parse_args()
+
+    if options.cleanup:
+        print(f"🗑️  Deleted {cleanup()}")
+        return
+
+    print("🚀 Starting real-time factory sensor simulation...")
+    run(options)
+
 
 if __name__ == '__main__':
     main()
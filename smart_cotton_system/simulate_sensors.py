@@ -1,24 +1,54 @@
+"""
+Replay of a telemetry export (Excel/CSV) into the factory bulk API.
+
+Usage: python simulate_sensors.py [telemetry.xlsx|telemetry.csv]
+
+The file is parsed column-wise with pandas (no per-row Python loop), machine
+names are resolved once per distinct name, and the records are posted in
+bounded batches over a pooled HTTP session from several threads, so a 1M-row
+export replays in minutes instead of hours.
+"""
 import os
-import django
-import pandas as pd
+import re
+import sys
 import time
-from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
 
 # --- НАСТРОЙКИ ---
 BASE_URL = "http://127.0.0.1:8000"
 LOGIN_URL = f"{BASE_URL}/auth/token/login/"
 API_URL = f"{BASE_URL}/api/factory/machines/telemetry/bulk/"
 MACHINES_API_URL = f"{BASE_URL}/api/factory/machines/"
-EXCEL_FILE = "telemetry_new.xlsx"
+EXCEL_FILE = "telemetry.xlsx"
 
 USERNAME = "admin"
 PASSWORD = "2031"
 
+# Записей в одном bulk запросе и одновременных запросов
+BATCH_SIZE = 5000
+WORKERS = 4
+DEFAULT_MACHINE_ID = 1
 
-def get_auth_token():
+# Каноническое имя колонки -> варианты в выгрузках (после strip().lower())
+COLUMN_ALIASES = {
+    "machine_id": ("machine_id", "machine id", "machine"),
+    "temperature": ("temperature", "temp"),
+    "vibration": ("vibration", "vib"),
+    "humidity": ("humidity", "hum"),
+    "motor_load": ("motor_load", "motor load", "load"),
+    "timestamp": ("timestamp", "time"),
+}
+NUMERIC_COLUMNS = ("temperature", "vibration", "humidity", "motor_load")
+
+
+def get_auth_token(session):
     """Получаем токен доступа, чтобы система нас пустила"""
     try:
-        response = requests.post(LOGIN_URL, json={"username": USERNAME, "password": PASSWORD})
+        response = session.post(LOGIN_URL, json={"username": USERNAME, "password": PASSWORD})
         if response.status_code == 200:
             token = response.json().get("auth_token")
             print(f"🔑 Успешный вход! Токен: {token[:10]}...")
@@ -31,21 +61,31 @@ def get_auth_token():
         return None
 
 
-def get_machine_mapping(headers):
-    """Fetch all machines and create name-to-id mapping"""
+def make_session(pool_size=WORKERS):
+    """Одна keep-alive сессия на все запросы (пул соединений на каждый поток)"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def normalize_name(name):
+    """'GIN-10 ' / 'Gin 10' -> 'gin10': case, spaces and punctuation don't matter"""
+    return re.sub(r"[\W_]+", "", str(name).lower())
+
+
+def get_machine_mapping(session):
+    """Fetch all machines and create normalized name-to-id mapping"""
     try:
-        response = requests.get(MACHINES_API_URL, headers=headers)
+        response = session.get(MACHINES_API_URL)
         if response.status_code == 200:
             machines = response.json()
-            # Create mapping: machine name -> machine id
-            mapping = {}
-            for machine in machines:
-                name = machine.get('name', '')
-                machine_id = machine.get('id')
-                if name and machine_id:
-                    mapping[name] = machine_id
+            mapping = {
+                normalize_name(machine['name']): machine['id']
+                for machine in machines if machine.get('name') and machine.get('id')
+            }
             print(f"🔧 Загружено {len(mapping)} машин из базы")
-            print(f"📋 Машины: {list(mapping.keys())}")
             return mapping
         else:
             print(f"⚠️ Не удалось загрузить список машин: {response.status_code}")
@@ -55,126 +95,190 @@ def get_machine_mapping(headers):
         return {}
 
 
-def parse_machine_id(value, machine_mapping):
-    """Parse machine_id - handle both numeric IDs and machine names"""
-    if pd.isna(value):
-        return 1  # default
-    
-    # Try as numeric ID first
-    try:
-        return int(value)
-    except (ValueError, TypeError):
-        pass
-    
-    # Try as machine name
-    machine_name = str(value).strip()
-    if machine_name in machine_mapping:
-        return machine_mapping[machine_name]
-    
-    # Try partial match (e.g., "GIN-10" matches "Gin Machine 10")
-    for name, mid in machine_mapping.items():
-        if machine_name.lower() in name.lower() or name.lower() in machine_name.lower():
-            return mid
-    
-    # Default fallback
-    print(f"⚠️ Машина '{value}' не найдена, используем ID=1")
-    return 1
+def resolve_machine_name(value, machine_mapping):
+    """Machine id for one distinct name: exact match, then partial ("GIN-10" ~ "Gin Machine 10")"""
+    key = normalize_name(value)
+    if key in machine_mapping:
+        return machine_mapping[key]
+    if key:
+        for name, machine_id in machine_mapping.items():
+            if key in name or name in key:
+                return machine_id
+    return None
+
+
+def normalize_columns(df):
+    """Rename known column variants to canonical names, once per file"""
+    df = df.rename(columns=lambda c: str(c).strip().lower())
+    renames = {}
+    for canonical, aliases in COLUMN_ALIASES.items():
+        found = next((alias for alias in aliases if alias in df.columns), None)
+        if found is not None:
+            renames[found] = canonical
+    return df.rename(columns=renames)
+
+
+def parse_machine_ids(column, machine_mapping):
+    """Numeric ids as-is; names resolved once per distinct value instead of once per row"""
+    numeric = pd.to_numeric(column, errors='coerce')
+    ids = numeric.where(numeric == numeric.round())
+
+    names = column[ids.isna() & column.notna()]
+    if not names.empty:
+        resolved = {name: resolve_machine_name(name, machine_mapping) for name in names.unique()}
+        for name, machine_id in resolved.items():
+            if machine_id is None:
+                print(f"⚠️ Машина '{name}' не найдена ({(names == name).sum()} строк), используем ID={DEFAULT_MACHINE_ID}")
+        ids = ids.fillna(pd.to_numeric(names.map(resolved)))
+
+    return ids.fillna(DEFAULT_MACHINE_ID).astype('int64')
 
 
 def parse_excel_data(df, machine_mapping):
-    """Parse and validate Excel data"""
+    """
+    Parse and validate Excel/CSV data column-wise
+
+    Returns:
+        DataFrame: machine_id, timestamp (str or None) and numeric columns,
+        one row per valid record
+    """
+    df = normalize_columns(df)
     print(f"📊 Столбцы в файле: {df.columns.tolist()}")
-    print(f"📊 Первые строки данных:\n{df.head()}\n")
-    
-    # Clean and prepare data
-    payload = []
-    skipped = 0
-    
-    for idx, row in df.iterrows():
-        try:
-            # Get machine_id from various possible column names
-            machine_id_raw = row.get("machine_id", row.get("Machine ID", row.get("machine", row.get("Machine", None))))
-            
-            record = {
-                "machine_id": parse_machine_id(machine_id_raw, machine_mapping),
-                "temperature": float(row.get("temperature", row.get("Temperature", row.get("temp", 0)))),
-                "vibration": float(row.get("vibration", row.get("Vibration", row.get("vib", 0)))),
-                "humidity": float(row.get("humidity", row.get("Humidity", row.get("hum", 0)))),
-                "motor_load": float(row.get("motor_load", row.get("Motor Load", row.get("load", 0)))),
-            }
-            
-            # Handle timestamp if present
-            timestamp_col = row.get("timestamp", row.get("Timestamp", row.get("time", row.get("Time", None))))
-            if timestamp_col is not None and pd.notna(timestamp_col):
-                if isinstance(timestamp_col, str):
-                    record["timestamp"] = timestamp_col
-                else:
-                    record["timestamp"] = timestamp_col.isoformat()
-            
-            payload.append(record)
-            
-        except Exception as e:
-            print(f"⚠️ Ошибка в строке {idx}: {e}")
-            skipped += 1
+
+    out = pd.DataFrame(index=df.index)
+    out["machine_id"] = (
+        parse_machine_ids(df["machine_id"], machine_mapping) if "machine_id" in df.columns
+        else DEFAULT_MACHINE_ID
+    )
+
+    # Пустые ячейки -> 0 (как и на сервере), нечисловой текст -> строка с ошибкой
+    invalid = pd.Series(False, index=df.index)
+    for column in NUMERIC_COLUMNS:
+        if column not in df.columns:
+            out[column] = 0.0
             continue
-    
+        values = pd.to_numeric(df[column], errors='coerce')
+        invalid |= values.isna() & df[column].notna()
+        out[column] = values.fillna(0.0)
+
+    # Время как строка ISO; без времени сервер ставит текущее
+    if "timestamp" in df.columns:
+        timestamps = df["timestamp"]
+        out["timestamp"] = timestamps.astype(str).where(timestamps.notna(), None)
+
+    skipped = int(invalid.sum())
     if skipped > 0:
-        print(f"⚠️ Пропущено строк с ошибками: {skipped}")
-    
-    return payload
+        print(f"⚠️ Пропущено строк с ошибками: {skipped} (например, строка {invalid.idxmax()})")
+
+    return out[~invalid]
+
+
+def iter_batches(frame, batch_size=BATCH_SIZE):
+    """Records for one bulk request at a time: only the batches in flight are in memory as dicts"""
+    for start in range(0, len(frame), batch_size):
+        chunk = frame.iloc[start:start + batch_size].astype(object)
+        yield chunk.where(chunk.notna(), None).to_dict('records')
+
+
+def post_batches(session, frame, batch_size=BATCH_SIZE, workers=WORKERS):
+    """
+    Post the records in batches from `workers` threads; at most 2 x workers
+    batches are built ahead of the responses
+
+    Returns:
+        dict: created, failed_requests, errors (first few server-side row errors)
+    """
+    totals = {"created": 0, "failed_requests": 0, "errors": []}
+
+    def post(batch):
+        response = session.post(API_URL, json=batch, timeout=300)
+        response.raise_for_status()
+        return response.json()
+
+    batches = iter_batches(frame, batch_size)
+    sent = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        while True:
+            for batch in batches:
+                in_flight.add(executor.submit(post, batch))
+                if len(in_flight) >= 2 * workers:
+                    break
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    totals["failed_requests"] += 1
+                    print(f"❌ Ошибка запроса: {e}")
+                    continue
+                totals["created"] += result.get("created", 0)
+                totals["errors"].extend((result.get("errors") or [])[:10 - len(totals["errors"])])
+                sent += 1
+                print(f"  ✅ пакет {sent}: всего создано {totals['created']}")
+    return totals
+
+
+def read_telemetry(path):
+    if path.lower().endswith(".csv"):
+        return pd.read_csv(path)
+    return pd.read_excel(path)
 
 
 def run_simulation():
-    excel_file = 'telemetry.xlsx'
+    excel_file = sys.argv[1] if len(sys.argv) > 1 else EXCEL_FILE
 
     if not os.path.exists(excel_file):
         print(f"❌ Файл {excel_file} не найден.")
         return
 
-    headers = {"Authorization": f"Token {token}"}
+    # 1. Авторизация
+    session = make_session()
+    token = get_auth_token(session)
+    if not token:
+        return
+    session.headers["Authorization"] = f"Token {token}"
 
     # 2. Загружаем маппинг машин
-    machine_mapping = get_machine_mapping(headers)
+    machine_mapping = get_machine_mapping(session)
 
-    # 3. Читаем Excel
+    # 3. Читаем Excel/CSV
+    start = time.perf_counter()
     try:
-        df = pd.read_excel(excel_file)
-        # Чистим названия колонок (убираем пробелы, делаем маленькими)
-        df.columns = df.columns.str.strip().str.lower()
+        df = read_telemetry(excel_file)
     except Exception as e:
-        print(f"❌ Не могу найти файл {EXCEL_FILE}: {e}")
+        print(f"❌ Не могу прочитать файл {excel_file}: {e}")
         return
+    read = time.perf_counter()
 
     # 4. Парсим данные
-    payload = parse_excel_data(df, machine_mapping)
-    
-    if not payload:
+    records = parse_excel_data(df, machine_mapping)
+    parsed = time.perf_counter()
+
+    if records.empty:
         print("❌ Нет валидных данных для отправки")
         return
-    
-    print(f"\n📦 Подготовлено {len(payload)} записей для отправки")
-    print(f"📝 Пример первой записи: {payload[0]}\n")
 
-    # 5. Отправляем данные в bulk
-    print("🚀 Отправляем данные в bulk...\n")
+    print(f"\n📦 Подготовлено {len(records)} записей для отправки "
+          f"(чтение {read - start:.1f}s, разбор {parsed - read:.1f}s)")
+    print(f"📝 Пример первой записи: {next(iter_batches(records.head(1)))[0]}\n")
 
-    try:
-        response = requests.post(API_URL, json=payload, headers=headers)
-
-        if response.status_code in [200, 201]:
-            result = response.json()
-            print(f"✅ Данные успешно отправлены!")
-            print(f"📊 Создано записей: {result.get('created', 0)}")
-            if result.get('errors'):
-                print(f"⚠️ Ошибки: {result.get('errors')}")
-        else:
-            print(f"❌ Ошибка API ({response.status_code}): {response.text}")
+    # 5. Отправляем данные пакетами
+    print(f"🚀 Отправляем данные в bulk пакетами по {BATCH_SIZE} ({WORKERS} потока)...\n")
+    totals = post_batches(session, records)
+    elapsed = time.perf_counter() - parsed
 
-    except Exception as e:
-        print(f"❌ Ошибка соединения: {e}")
+    print(f"\n📊 Создано записей: {totals['created']} за {elapsed:.1f}s "
+          f"({totals['created'] / max(elapsed, 1e-9):,.0f} записей/s)")
+    if totals["failed_requests"]:
+        print(f"❌ Неудачных запросов: {totals['failed_requests']}")
+    if totals["errors"]:
+        print(f"⚠️ Ошибки: {totals['errors']}")
 
     print("\n✅ Симуляция завершена!")
 
 
 if __name__ == '__main__':
-    run_simulation()
\ No newline at end of file
+    run_simulation()